@@ -5,4 +5,15 @@ Exposes core functionality like database management.
 This allows imports like: `from app.core import init_db`
 """
 
-from .database import init_db, save_message, get_history
+from .database import (
+    init_db,
+    close_db,
+    save_message,
+    get_history,
+    get_session_history,
+    get_history_between,
+    init_db_async,
+    save_message_async,
+    get_history_async,
+    get_session_history_async
+)
@@ -0,0 +1,74 @@
+import re
+from config.settings import CONTEXT_TOKEN_BUDGETS, CONTEXT_RESPONSE_RESERVE
+
+"""
+==============================================================================
+FILE: app/core/context.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Bygger konversationskontext som ryms i modellens token-budget.
+==============================================================================
+"""
+
+# Ord, siffror och enskilda skiljetecken. BPE-tokenizers delar långa ord,
+# så varje ord räknas som ungefär en token per fyra tecken.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Extra tokens per meddelande för roll och formatering hos leverantörerna
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """Snabb lokal uppskattning av antalet tokens i en text."""
+    if not text:
+        return 0
+    count = 0
+    for piece in _TOKEN_RE.findall(text):
+        count += (len(piece) + 3) // 4
+    return count
+
+
+def message_tokens(msg):
+    """
+    Returnerar token-antalet för ett meddelande.
+    Värdet cachas i meddelandet (och i databasen) så att varje rad bara räknas en gång.
+    """
+    tokens = msg.get("tokens")
+    if tokens is None:
+        tokens = estimate_tokens(msg.get("content"))
+        msg["tokens"] = tokens
+    return tokens
+
+
+def get_token_budget(model_id):
+    """Hämtar token-budgeten för en modell (längsta matchande nyckel vinner)."""
+    model_id = (model_id or "").lower()
+    best_key = None
+    for key in CONTEXT_TOKEN_BUDGETS:
+        if key != "default" and key in model_id:
+            if best_key is None or len(key) > len(best_key):
+                best_key = key
+    if best_key:
+        return CONTEXT_TOKEN_BUDGETS[best_key]
+    return CONTEXT_TOKEN_BUDGETS.get("default", 6000)
+
+
+def build_context(history, model_id, reserved_tokens=0, after_id=0):
+    """
+    Väljer de senaste meddelandena ur historiken som ryms i modellens budget.
+    'reserved_tokens' är det som redan är upptaget (system-prompt, nytt meddelande).
+    'after_id' hoppar över rader som redan täcks av en sammanfattning.
+    Det senaste meddelandet tas alltid med.
+    """
+    budget = get_token_budget(model_id) - reserved_tokens - CONTEXT_RESPONSE_RESERVE
+    selected = []
+    used = 0
+    for msg in reversed(history):
+        if after_id and msg.get("id", after_id + 1) <= after_id:
+            break
+        cost = message_tokens(msg) + MESSAGE_OVERHEAD
+        if selected and used + cost > budget:
+            break
+        selected.append(msg)
+        used += cost
+    selected.reverse()
+    return selected
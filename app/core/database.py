@@ -1,38 +1,304 @@
 import sqlite3
 import os
-from config.settings import DB_PATH, HISTORY_LIMIT
+import queue
+import asyncio
+import threading
+import functools
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (
+    DB_PATH,
+    HISTORY_LIMIT,
+    DB_POOL_SIZE,
+    DB_CACHE_SIZE_KB,
+    DB_BUSY_TIMEOUT_MS,
+    HISTORY_SESSION_CACHE
+)
+from app.core.context import estimate_tokens
+
+# SQL-satserna hålls som konstanter så att sqlite3:s statement-cache
+# (per anslutning) återanvänder de förberedda satserna mellan anrop.
+SQL_INSERT_MESSAGE = "INSERT INTO history (session_id, role, content, image, tokens) VALUES (?, ?, ?, ?, ?)"
+SQL_SELECT_HISTORY = """
+    SELECT id, role, content, image, tokens
+    FROM (
+        SELECT * FROM history
+        ORDER BY id DESC
+        LIMIT ?
+    )
+    ORDER BY id ASC
+"""
+SQL_SELECT_SESSION_HISTORY = """
+    SELECT id, role, content, image, tokens
+    FROM (
+        SELECT * FROM history
+        WHERE session_id = ?
+        ORDER BY id DESC
+        LIMIT ?
+    )
+    ORDER BY id ASC
+"""
+SQL_SELECT_HISTORY_RANGE = """
+    SELECT id, session_id, role, content, image, tokens, timestamp
+    FROM history
+    WHERE timestamp >= ? AND timestamp < ?
+    ORDER BY id ASC
+"""
+SQL_SELECT_AFTER = """
+    SELECT id, role, content, image, tokens, timestamp
+    FROM history
+    WHERE id > ?
+    ORDER BY id ASC
+    LIMIT ?
+"""
+SQL_INSERT_SUMMARY = "INSERT INTO history_summary (start_id, end_id, content, tokens) VALUES (?, ?, ?, ?)"
+SQL_SELECT_SUMMARIES = "SELECT id, start_id, end_id, content, tokens, created FROM history_summary ORDER BY end_id ASC"
+SQL_SELECT_CHECKPOINT = "SELECT COALESCE(MAX(end_id), 0) FROM history_summary"
+SQL_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_history_session ON history (session_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)",
+)
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+)
+
+
+class ConnectionPool:
+    """
+    Liten trådsäker pool av långlivade SQLite-anslutningar.
+    Skrivningar serialiseras med ett lås så att vi aldrig slåss om
+    skrivlåset i samma process ("database is locked").
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # RLock så att en anropare kan hålla skrivlåset runt en hel transaktion
+        self.write_lock = threading.RLock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Poolen är full, vänta på en ledig anslutning
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """Lånar en anslutning för läsning."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Lånar en anslutning för skrivning och committar vid lyckat block."""
+        with self.write_lock, self.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+
+
+def _row_to_message(row):
+    msg = {"id": row["id"], "role": row["role"], "content": row["content"]}
+    # Cachat token-antal (saknas för rader sparade innan kolumnen fanns)
+    if row["tokens"] is not None:
+        msg["tokens"] = row["tokens"]
+    # Inkludera bild om det finns (för framtida bruk)
+    if row["image"]:
+        msg["image"] = row["image"]
+    return msg
+
+
+class HistoryBuffer:
+    """
+    Ringbuffertar med de senaste meddelandena, dels globalt och dels per session.
+    Hålls i synk av save_message så att databasen bara behövs vid kallstart.
+    Listorna som returneras delar dict-objekt med bufferten och ska ses som skrivskyddade.
+    """
+
+    def __init__(self, size=HISTORY_LIMIT, max_sessions=HISTORY_SESSION_CACHE):
+        self.size = size
+        self.max_sessions = max_sessions
+        self._global = deque(maxlen=size)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load_global(self, messages):
+        with self._lock:
+            self._global.clear()
+            self._global.extend(messages)
+            self.loaded = True
+
+    def load_session(self, session_id, messages):
+        with self._lock:
+            self._sessions[session_id] = deque(messages, maxlen=self.size)
+            self._evict()
+
+    def append(self, session_id, msg):
+        with self._lock:
+            if self.loaded:
+                self._global.append(msg)
+            # Sessioner som inte är laddade läses in från DB vid behov
+            buf = self._sessions.get(session_id)
+            if buf is not None:
+                buf.append(msg)
+                self._sessions.move_to_end(session_id)
+
+    def recent(self, limit, session_id=None):
+        """Returnerar de senaste 'limit' meddelandena, eller None om bufferten inte räcker."""
+        if limit > self.size:
+            return None
+        with self._lock:
+            if session_id is None:
+                if not self.loaded:
+                    return None
+                buf = self._global
+            else:
+                buf = self._sessions.get(session_id)
+                if buf is None:
+                    return None
+                self._sessions.move_to_end(session_id)
+            if limit >= len(buf):
+                return list(buf)
+            return list(buf)[-limit:] if limit > 0 else []
+
+    def clear(self):
+        with self._lock:
+            self._global.clear()
+            self._sessions.clear()
+            self.loaded = False
+
+    def _evict(self):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+_history_buffer = HistoryBuffer()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Egen trådpool för DB-arbete så att event-loopen i FastAPI aldrig blockeras
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="daa-db")
+
+
+def get_pool():
+    """Returnerar den delade anslutningspoolen (skapas vid första anrop)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def close_db():
+    """Stänger alla anslutningar i poolen (anropas vid nedstängning)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    _history_buffer.clear()
+
 
 def init_db():
     """Skapar databasen och tabellen om de inte finns."""
     try:
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT,
-                role TEXT,
-                content TEXT,
-                image TEXT, 
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        conn.close()
-        print(f"✅ Databas initierad: {DB_PATH}")
+        with get_pool().transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT,
+                    role TEXT,
+                    content TEXT,
+                    image TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    tokens INTEGER
+                )
+            ''')
+            # Sammanfattningar av äldre historik (se app/core/summarizer.py)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS history_summary (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    start_id INTEGER NOT NULL,
+                    end_id INTEGER NOT NULL,
+                    content TEXT,
+                    tokens INTEGER,
+                    created DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Migrering: äldre databaser saknar kolumnen för cachade token-antal
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(history)")]
+            if "tokens" not in columns:
+                conn.execute("ALTER TABLE history ADD COLUMN tokens INTEGER")
+            for sql in SQL_INDEXES:
+                conn.execute(sql)
+        print(f"✅ Databas initierad (WAL): {DB_PATH}")
     except Exception as e:
         print(f"❌ Databasfel vid initiering: {e}")
 
 def save_message(session_id, role, content, image=None):
-    """Sparar ett meddelande i historiken."""
+    """Sparar ett meddelande i historiken och i minnesbufferten."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("INSERT INTO history (session_id, role, content, image) VALUES (?, ?, ?, ?)",
-                  (session_id, role, content, image))
-        conn.commit()
-        conn.close()
+        pool = get_pool()
+        tokens = estimate_tokens(content)
+        # Skrivlåset hålls även runt buffert-uppdateringen så att ordningen
+        # i bufferten alltid följer radernas id.
+        with pool.write_lock:
+            with pool.transaction() as conn:
+                row_id = conn.execute(SQL_INSERT_MESSAGE, (session_id, role, content, image, tokens)).lastrowid
+            msg = {"id": row_id, "role": role, "content": content, "tokens": tokens}
+            if image:
+                msg["image"] = image
+            _history_buffer.append(session_id, msg)
     except Exception as e:
         print(f"⚠️ Kunde inte spara till DB: {e}")
 
@@ -40,37 +306,135 @@ def get_history(session_id=None, limit=HISTORY_LIMIT):
     """
     Hämtar konversationshistorik.
     OBS: Ignorerar session_id för att ge 'globalt minne' över alla sessioner.
+    Använd get_session_history för en enskild session.
     """
+    cached = _history_buffer.recent(limit)
+    if cached is not None:
+        return cached
+
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # Hämtar de senaste 'limit' raderna från HELA historiken (oavsett session)
+        # Kallstart: hämtar de senaste raderna från HELA historiken (oavsett session)
         # Vi sorterar DESC för att få de senaste, och sen ASC för att få dem i rätt tidsordning.
-        query = f"""
-            SELECT role, content, image 
-            FROM (
-                SELECT * FROM history 
-                ORDER BY id DESC 
-                LIMIT ?
-            ) 
-            ORDER BY id ASC
-        """
-        
-        c.execute(query, (limit,))
-        rows = c.fetchall()
-        conn.close()
-        
-        history = []
-        for row in rows:
-            msg = {"role": row["role"], "content": row["content"]}
-            # Inkludera bild om det finns (för framtida bruk)
-            if row["image"]: 
-                msg["image"] = row["image"]
-            history.append(msg)
-            
-        return history
+        pool = get_pool()
+        with pool.write_lock:
+            with pool.connection() as conn:
+                rows = conn.execute(SQL_SELECT_HISTORY, (max(limit, _history_buffer.size),)).fetchall()
+            history = [_row_to_message(row) for row in rows]
+            _history_buffer.load_global(history)
+
+        return history[-limit:] if limit > 0 else []
     except Exception as e:
         print(f"⚠️ Kunde inte hämta historik: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def get_session_history(session_id, limit=HISTORY_LIMIT):
+    """Hämtar historiken för en enskild session (via index på session_id, id)."""
+    cached = _history_buffer.recent(limit, session_id)
+    if cached is not None:
+        return cached
+
+    try:
+        pool = get_pool()
+        with pool.write_lock:
+            with pool.connection() as conn:
+                rows = conn.execute(
+                    SQL_SELECT_SESSION_HISTORY, (session_id, max(limit, _history_buffer.size))
+                ).fetchall()
+            history = [_row_to_message(row) for row in rows]
+            _history_buffer.load_session(session_id, history)
+
+        return history[-limit:] if limit > 0 else []
+    except Exception as e:
+        print(f"⚠️ Kunde inte hämta sessionshistorik: {e}")
+        return []
+
+def get_history_between(start, end):
+    """
+    Hämtar alla meddelanden med tidsstämpel i intervallet [start, end).
+    Tiderna anges i UTC som 'YYYY-MM-DD HH:MM:SS' (samma format som CURRENT_TIMESTAMP).
+    """
+    try:
+        with get_pool().connection() as conn:
+            rows = conn.execute(SQL_SELECT_HISTORY_RANGE, (str(start), str(end))).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"⚠️ Kunde inte hämta historik för intervall: {e}")
+        return []
+
+def get_messages_after(after_id, limit=1000):
+    """Hämtar meddelanden med id större än 'after_id' i stigande ordning."""
+    try:
+        with get_pool().connection() as conn:
+            rows = conn.execute(SQL_SELECT_AFTER, (after_id, limit)).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"⚠️ Kunde inte hämta meddelanden: {e}")
+        return []
+
+def save_summary(start_id, end_id, content):
+    """Sparar en sammanfattning av historikraderna start_id..end_id."""
+    try:
+        with get_pool().transaction() as conn:
+            conn.execute(SQL_INSERT_SUMMARY, (start_id, end_id, content, estimate_tokens(content)))
+        return True
+    except Exception as e:
+        print(f"⚠️ Kunde inte spara sammanfattning: {e}")
+        return False
+
+def get_summaries():
+    """Hämtar alla sammanfattningar i kronologisk ordning."""
+    try:
+        with get_pool().connection() as conn:
+            rows = conn.execute(SQL_SELECT_SUMMARIES).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"⚠️ Kunde inte hämta sammanfattningar: {e}")
+        return []
+
+def get_summary_checkpoint():
+    """Returnerar id för den senaste sammanfattade historikraden (0 om ingen)."""
+    try:
+        with get_pool().connection() as conn:
+            return conn.execute(SQL_SELECT_CHECKPOINT).fetchone()[0]
+    except Exception as e:
+        print(f"⚠️ Kunde inte läsa checkpoint: {e}")
+        return 0
+
+
+# --- ASYNC-VARIANTER (körs i DB-trådpoolen) ---
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Kör en blockerande DB-funktion i DB-trådpoolen."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+async def init_db_async():
+    return await run_in_db_thread(init_db)
+
+async def save_message_async(session_id, role, content, image=None):
+    return await run_in_db_thread(save_message, session_id, role, content, image)
+
+async def get_history_async(session_id=None, limit=HISTORY_LIMIT):
+    # Varm buffert: ingen anledning att byta tråd
+    cached = _history_buffer.recent(limit)
+    if cached is not None:
+        return cached
+    return await run_in_db_thread(get_history, session_id, limit)
+
+async def get_session_history_async(session_id, limit=HISTORY_LIMIT):
+    cached = _history_buffer.recent(limit, session_id)
+    if cached is not None:
+        return cached
+    return await run_in_db_thread(get_session_history, session_id, limit)
+
+async def get_messages_after_async(after_id, limit=1000):
+    return await run_in_db_thread(get_messages_after, after_id, limit)
+
+async def save_summary_async(start_id, end_id, content):
+    return await run_in_db_thread(save_summary, start_id, end_id, content)
+
+async def get_summaries_async():
+    return await run_in_db_thread(get_summaries)
+
+async def get_summary_checkpoint_async():
+    return await run_in_db_thread(get_summary_checkpoint)
\ No newline at end of file
@@ -0,0 +1,152 @@
+import math
+import re
+from collections import Counter
+
+"""
+==============================================================================
+FILE: app/core/intents.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Snabb lokal avsiktsklassning. Avgör vilka kontextkällor (hälsa,
+             träning, trender, väder, hemmet, kalender) som ska bifogas till
+             prompten. Ett kompilerat regex-uttryck går igenom texten en gång;
+             ett litet tecken-trigram-lager fångar omskrivningar som saknar
+             nyckelord. Testdata och mätning: test/verify_intents.py
+==============================================================================
+"""
+
+HEALTH = "health"
+TRAINING = "training"
+TRENDS = "trends"
+WEATHER = "weather"
+HOME = "home"
+CALENDAR = "calendar"
+
+INTENTS = (HEALTH, TRAINING, TRENDS, WEATHER, HOME, CALENDAR)
+
+# Ordstammar per avsikt. \b i början och \w* i slutet täcker böjningar
+# ("sömnen", "löpturen", "lamporna"). Ord som är för allmänna ("status",
+# "pass", "hur mår") undviks eller kräver sammanhang.
+PATTERNS = {
+    HEALTH: [
+        r"s[öo]mn\w*", r"sov(it|er)?", r"vilopuls\w*", r"puls\w*", r"hj[äa]rtfrekvens\w*",
+        r"stress\w*", r"body ?battery", r"garmin\w*", r"hrv",
+        r"mår jag", r"hur mår (jag|min kropp)", r"återhämtning\w*", r"utvilad\w*", r"trött\w*",
+        r"kropp(en|sstatus)", r"steg(en)? (idag|igår)", r"antal steg", r"hälsa\w*",
+    ],
+    TRAINING: [
+        r"strava\w*", r"löp\w*", r"spring\w*", r"sprang", r"jogg\w*", r"cykl\w*", r"cykel\w*",
+        r"simm\w*", r"träning(en|ar|arna)?", r"träna\w*", r"tränade", r"träningspass\w*",
+        r"(senaste|dagens|gårdagens|hårt|lugnt|långt) pass\w*", r"pass(et|en) (idag|igår)",
+        r"aktivitet(er|en|erna)?", r"workout\w*", r"intervall\w*", r"distans\w*", r"tempo",
+        r"km i (dag|går)", r"mil(en)? (i dag|idag|igår)",
+    ],
+    TRENDS: [
+        r"trend\w*", r"utveckl\w*", r"senaste (veckan|veckorna|månaden|28 dagarna|7 dagarna)",
+        r"jämfört", r"jämför\w*", r"över tid", r"formkurva\w*", r"\w*belastning\w*",
+        r"snitt\w*", r"genomsnitt\w*", r"förbättra(t|ts|s)", r"bättre form", r"sämre form",
+    ],
+    WEATHER: [
+        r"väd(er|ret)\w*", r"regn\w*", r"snö\w*", r"sol(en|igt|sken)?", r"blås\w*", r"vind\w*",
+        r"temperatur\w*", r"grader", r"kallt", r"varmt", r"paraply", r"prognos\w*", r"smhi",
+        r"ska jag ha jacka", r"molnig\w*", r"storm\w*", r"frost\w*", r"halka\w*",
+    ],
+    HOME: [
+        r"lamp(a|an|or|orna)", r"ljus(et|en)", r"tänd\w*", r"släck\w*", r"termostat\w*",
+        r"värme(n)?", r"dammsugar\w*", r"robot(en|dammsugaren)", r"roborock", r"hemma",
+        r"home assistant", r"sensor\w*", r"inomhus\w*", r"luftfuktighet\w*",
+        r"dörr(en|ar|arna)", r"fönst(er|ret|ren)", r"larm(et)?", r"uttag(et)?", r"zigbee\w*",
+        r"(i|på) (vardagsrummet|köket|sovrummet|hallen|badrummet|kontoret|garaget)",
+    ],
+    CALENDAR: [
+        r"kalend\w*", r"möte\w*", r"bokning\w*", r"boka\w*", r"inbokad\w*", r"schema\w*",
+        r"agenda", r"händer (idag|imorgon|i morgon)", r"planerat", r"upptagen", r"ledig\w*",
+        r"påminn\w*", r"tid hos", r"event\w*", r"vad gör jag (idag|imorgon|i morgon)",
+        r"(idag|imorgon|i morgon|på måndag|på tisdag|på onsdag|på torsdag|på fredag) kl",
+    ],
+}
+
+
+def _compile(patterns):
+    """Ett enda uttryck med en namngiven grupp per avsikt (en genomläsning av texten)."""
+    groups = []
+    for intent, words in patterns.items():
+        groups.append(f"(?P<{intent}>\\b(?:{'|'.join(words)})\\b)")
+    return re.compile("|".join(groups), re.IGNORECASE)
+
+
+_MATCHER = _compile(PATTERNS)
+
+
+# --- TRIGRAM-LAGER ---
+# Korta exempelfraser per avsikt. Används bara när regex inte hittar något,
+# t.ex. "ligger jag efter i formen" eller felstavningar som "sömmen".
+EXAMPLES = {
+    HEALTH: [
+        "hur har jag sovit", "hur mycket sömn fick jag", "är jag utvilad", "hur är min vilopuls",
+        "hur stressad har jag varit", "hur mår kroppen", "hur återhämtad är jag",
+    ],
+    TRAINING: [
+        "hur gick löprundan", "hur långt sprang jag", "vilket träningspass gjorde jag",
+        "hur gick cykelturen", "hur mycket har jag tränat", "mitt senaste träningspass",
+    ],
+    TRENDS: [
+        "hur har formen utvecklats", "blir jag bättre", "jämfört med förra månaden",
+        "hur ser utvecklingen ut", "har jag tränat mer än vanligt",
+    ],
+    WEATHER: [
+        "hur blir vädret", "kommer det regna", "behöver jag paraply", "hur kallt är det ute",
+        "blir det sol i helgen", "vad säger prognosen",
+    ],
+    HOME: [
+        "tänd lampan i vardagsrummet", "släck ljuset", "starta dammsugaren",
+        "hur varmt är det inne", "är dörren låst", "sätt på värmen",
+    ],
+    CALENDAR: [
+        "vad har jag för möten idag", "vad står i kalendern", "boka ett möte",
+        "är jag ledig imorgon", "vad händer i helgen", "påminn mig om tandläkaren",
+    ],
+}
+
+NGRAM_THRESHOLD = 0.42
+
+
+def _trigrams(text):
+    padded = f"  {text.lower()} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _normalize(counter):
+    norm = math.sqrt(sum(v * v for v in counter.values())) or 1.0
+    return {k: v / norm for k, v in counter.items()}
+
+
+# En normaliserad trigram-vektor per exempelfras, beräknad en gång vid import
+_EXAMPLE_VECTORS = [
+    (intent, _normalize(_trigrams(phrase)))
+    for intent, phrases in EXAMPLES.items()
+    for phrase in phrases
+]
+
+
+def _ngram_intents(text, threshold=NGRAM_THRESHOLD):
+    """Avsikter vars närmaste exempelfras har cosinuslikhet över tröskeln."""
+    vec = _normalize(_trigrams(text))
+    best = {}
+    for intent, example in _EXAMPLE_VECTORS:
+        score = sum(w * example.get(g, 0.0) for g, w in vec.items())
+        if score > best.get(intent, 0.0):
+            best[intent] = score
+    return {intent for intent, score in best.items() if score >= threshold}
+
+
+def classify(text, use_ngrams=True):
+    """
+    Returnerar mängden avsikter för ett användarmeddelande, t.ex. {"health", "trends"}.
+    Tom mängd betyder att ingen extra kontext behövs.
+    """
+    if not text:
+        return set()
+    found = {m.lastgroup for m in _MATCHER.finditer(text)}
+    if not found and use_ngrams:
+        found = _ngram_intents(text)
+    return found
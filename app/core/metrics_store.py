@@ -0,0 +1,305 @@
+import datetime
+import json
+import time
+import numpy as np
+from app.core.database import get_pool
+
+"""
+==============================================================================
+FILE: app/core/metrics_store.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Lokal tidsserie för Garmin-dagar och Strava-aktiviteter i SQLite.
+             Data synkas inkrementellt i bakgrunden och trender (7/28 dagar)
+             räknas vektoriserat med NumPy utan externa API-anrop.
+==============================================================================
+"""
+
+SQL_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS garmin_daily (
+        date TEXT PRIMARY KEY,
+        steps INTEGER,
+        resting_hr REAL,
+        stress_avg REAL,
+        sleep_hours REAL,
+        body_battery REAL,
+        fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS strava_activities (
+        id INTEGER PRIMARY KEY,
+        start_epoch INTEGER NOT NULL,
+        start_date_local TEXT,
+        type TEXT,
+        distance_km REAL,
+        moving_min REAL,
+        suffer_score REAL,
+        raw TEXT
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_strava_start ON strava_activities (start_epoch)",
+)
+
+SQL_UPSERT_GARMIN = '''
+    INSERT OR REPLACE INTO garmin_daily (date, steps, resting_hr, stress_avg, sleep_hours, body_battery, fetched_at)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+'''
+SQL_UPSERT_STRAVA = '''
+    INSERT OR REPLACE INTO strava_activities
+        (id, start_epoch, start_date_local, type, distance_km, moving_min, suffer_score, raw)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_GARMIN_DATES = "SELECT date FROM garmin_daily WHERE date >= ?"
+SQL_GARMIN_RANGE = '''
+    SELECT date, resting_hr, stress_avg, sleep_hours, steps
+    FROM garmin_daily WHERE date >= ? ORDER BY date
+'''
+SQL_STRAVA_RANGE = '''
+    SELECT substr(start_date_local, 1, 10) AS day, suffer_score, moving_min, distance_km
+    FROM strava_activities WHERE start_epoch >= ?
+'''
+SQL_STRAVA_RECENT = '''
+    SELECT type, start_date_local, distance_km, moving_min, suffer_score
+    FROM strava_activities ORDER BY start_epoch DESC LIMIT ?
+'''
+SQL_STRAVA_LATEST = "SELECT COALESCE(MAX(start_epoch), 0) FROM strava_activities"
+
+
+_initialized = False
+
+
+def init_metrics():
+    """Skapar tabellerna för tidsserien (en gång per process)."""
+    global _initialized
+    if _initialized:
+        return
+    try:
+        with get_pool().transaction() as conn:
+            for sql in SQL_TABLES:
+                conn.execute(sql)
+        _initialized = True
+    except Exception as e:
+        print(f"❌ Kunde inte skapa tabeller för tidsserie: {e}")
+
+
+def _number(value):
+    # Garmin svarar "Ingen data" eller None när värdet saknas
+    return value if isinstance(value, (int, float)) else None
+
+
+# --- INSAMLING ---
+
+def upsert_garmin_day(summary):
+    """Sparar en dag från GarminCoach.get_daily_summary."""
+    with get_pool().transaction() as conn:
+        conn.execute(SQL_UPSERT_GARMIN, (
+            summary["datum"][:10],
+            _number(summary.get("steg")),
+            _number(summary.get("vilopuls")),
+            _number(summary.get("stress_snitt")),
+            _number(summary.get("sömn_timmar")),
+            _number(summary.get("body_battery")),
+        ))
+
+
+def upsert_strava_activities(activities):
+    """Sparar råa Strava-aktiviteter (dubbletter skrivs över via id)."""
+    rows = []
+    for act in activities:
+        start = datetime.datetime.strptime(act["start_date"], "%Y-%m-%dT%H:%M:%SZ")
+        start = start.replace(tzinfo=datetime.timezone.utc)
+        rows.append((
+            act["id"],
+            int(start.timestamp()),
+            act.get("start_date_local"),
+            act.get("type"),
+            round((act.get("distance") or 0) / 1000, 2),
+            round((act.get("moving_time") or 0) / 60, 1),
+            act.get("suffer_score"),
+            json.dumps(act),
+        ))
+    if rows:
+        with get_pool().transaction() as conn:
+            conn.executemany(SQL_UPSERT_STRAVA, rows)
+    return len(rows)
+
+
+def latest_strava_epoch():
+    """Starttid (epoch) för senaste sparade aktivitet, 0 om inga finns."""
+    with get_pool().connection() as conn:
+        return conn.execute(SQL_STRAVA_LATEST).fetchone()[0]
+
+
+def missing_garmin_days(days):
+    """Datum de senaste 'days' dagarna som saknas i databasen. Idag och igår hämtas alltid om."""
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=days - 1)
+    with get_pool().connection() as conn:
+        stored = {row[0] for row in conn.execute(SQL_GARMIN_DATES, (start.isoformat(),))}
+    wanted = [(start + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+    recent = {today.isoformat(), (today - datetime.timedelta(days=1)).isoformat()}
+    return [d for d in wanted if d not in stored or d in recent]
+
+
+def mark_garmin_day_empty(day):
+    """Sparar en rad utan mätvärden för en dag utan data (klockan inte buren)."""
+    with get_pool().transaction() as conn:
+        conn.execute(SQL_UPSERT_GARMIN, (day, None, None, None, None, None))
+
+
+def sync_garmin(coach, days):
+    """
+    Hämtar bara de dagar som saknas. Dagar utan data sparas som tomma rader så
+    att de inte hämtas igen vid nästa synk. Returnerar antal dagar med data.
+    """
+    saved = 0
+    for day in missing_garmin_days(days):
+        try:
+            summary = coach.get_daily_summary(day)
+        except Exception as e:
+            print(f">> [Garmin] Kunde inte hämta {day}: {e}")
+            continue
+        if summary:
+            upsert_garmin_day(summary)
+            saved += 1
+        elif coach.client is None:
+            # Inloggningen misslyckades: dagen är inte tom, bara okänd
+            break
+        else:
+            mark_garmin_day_empty(day)
+    return saved
+
+
+def sync_strava(tool, days):
+    """
+    Inkrementell synk: bara aktiviteter efter den senast sparade (första gången
+    'days' dagar bakåt). Varje sida sparas direkt så att ett avbrott vid rate
+    limit inte förlorar det som redan hämtats.
+    """
+    after = latest_strava_epoch() or int(time.time()) - days * 86400
+    saved = 0
+    for batch in tool.iter_activity_pages(after):
+        saved += upsert_strava_activities(batch)
+    return saved
+
+
+def get_recent_activities(limit=3):
+    """Senaste passen ur den lokala tabellen, i samma format som StravaTool.get_health_report."""
+    with get_pool().connection() as conn:
+        rows = conn.execute(SQL_STRAVA_RECENT, (limit,)).fetchall()
+    return [
+        {
+            "typ": row["type"],
+            "datum": (row["start_date_local"] or "")[:10],
+            "distans_km": round(row["distance_km"] or 0, 1),
+            "tid_min": round(row["moving_min"] or 0, 0),
+            "ansträngning": row["suffer_score"] if row["suffer_score"] is not None else "Ej angivet",
+        }
+        for row in rows
+    ]
+
+
+# --- TRENDER (NumPy) ---
+
+def rolling_mean(values, window):
+    """
+    Glidande medelvärde som ignorerar NaN (saknade dagar).
+    Returnerar en array lika lång som 'values'; fönster utan data ger NaN.
+    De första 'window'-1 fönstren är kortare och räknas på de dagar som finns.
+    """
+    values = np.asarray(values, dtype=float)
+    mask = ~np.isnan(values)
+    filled = np.where(mask, values, 0.0)
+    sums = np.cumsum(np.concatenate(([0.0], filled)))
+    counts = np.cumsum(np.concatenate(([0], mask.astype(np.int64))))
+    idx = np.arange(1, len(values) + 1)
+    lo = np.maximum(idx - window, 0)
+    window_sums = sums[idx] - sums[lo]
+    window_counts = counts[idx] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, window_sums / np.maximum(window_counts, 1), np.nan)
+
+
+def rolling_sum(values, window):
+    """Glidande summa där NaN räknas som 0 (ingen träning den dagen)."""
+    filled = np.nan_to_num(np.asarray(values, dtype=float))
+    sums = np.cumsum(np.concatenate(([0.0], filled)))
+    idx = np.arange(1, len(values) + 1)
+    return sums[idx] - sums[np.maximum(idx - window, 0)]
+
+
+def _daily_grid(days):
+    """Datumaxel för de senaste 'days' dagarna (äldst först)."""
+    today = np.datetime64(datetime.date.today(), "D")
+    return today - np.arange(days - 1, -1, -1)
+
+
+def get_trends(days=56):
+    """
+    Beräknar 7- och 28-dagarstrender för vilopuls, sömn, stress och träningsbelastning.
+    Träningsbelastning = Strava suffer score per dag (rörelsetid i minuter om det saknas).
+    """
+    grid = _daily_grid(days)
+    start = str(grid[0])
+    index = {str(d): i for i, d in enumerate(grid)}
+
+    resting_hr = np.full(days, np.nan)
+    sleep = np.full(days, np.nan)
+    stress = np.full(days, np.nan)
+    load = np.zeros(days)
+
+    with get_pool().connection() as conn:
+        garmin_rows = conn.execute(SQL_GARMIN_RANGE, (start,)).fetchall()
+        start_epoch = int(datetime.datetime.combine(
+            datetime.date.fromisoformat(start), datetime.time()
+        ).timestamp())
+        strava_rows = conn.execute(SQL_STRAVA_RANGE, (start_epoch,)).fetchall()
+
+    for row in garmin_rows:
+        i = index.get(row["date"])
+        if i is None:
+            continue
+        resting_hr[i] = row["resting_hr"] if row["resting_hr"] is not None else np.nan
+        stress[i] = row["stress_avg"] if row["stress_avg"] is not None else np.nan
+        sleep[i] = row["sleep_hours"] if row["sleep_hours"] else np.nan
+
+    for row in strava_rows:
+        i = index.get(row["day"])
+        if i is None:
+            continue
+        load[i] += row["suffer_score"] if row["suffer_score"] is not None else (row["moving_min"] or 0)
+
+    def last(arr):
+        value = arr[-1]
+        return None if np.isnan(value) else round(float(value), 1)
+
+    acute = rolling_sum(load, 7) / 7
+    chronic = rolling_sum(load, 28) / 28
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acwr = np.where(chronic > 0, acute / np.maximum(chronic, 1e-9), np.nan)
+
+    return {
+        "dagar_med_data": int(np.count_nonzero(~np.isnan(resting_hr))),
+        "vilopuls_7d": last(rolling_mean(resting_hr, 7)),
+        "vilopuls_28d": last(rolling_mean(resting_hr, 28)),
+        "sömn_7d": last(rolling_mean(sleep, 7)),
+        "sömn_28d": last(rolling_mean(sleep, 28)),
+        "stress_7d": last(rolling_mean(stress, 7)),
+        "stress_28d": last(rolling_mean(stress, 28)),
+        "belastning_7d": last(acute),
+        "belastning_28d": last(chronic),
+        "belastningskvot": last(acwr),
+        "pass_28d": int(np.count_nonzero(load[-28:])),
+    }
+
+
+def format_trends(t):
+    """Textblock för system-prompten."""
+    return (
+        f"   - ❤️ Vilopuls snitt 7d: {t['vilopuls_7d']} bpm (28d: {t['vilopuls_28d']})\n"
+        f"   - 💤 Sömn snitt 7d: {t['sömn_7d']} h (28d: {t['sömn_28d']})\n"
+        f"   - ⚡ Stress snitt 7d: {t['stress_7d']} (28d: {t['stress_28d']})\n"
+        f"   - 🏃 Träningsbelastning/dag 7d: {t['belastning_7d']} (28d: {t['belastning_28d']}, kvot: {t['belastningskvot']})\n"
+        f"   - 📅 Dagar med pass senaste 28d: {t['pass_28d']}"
+    )
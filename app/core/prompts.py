@@ -5,36 +5,17 @@ from datetime import datetime
 FILE: app/core/prompts.py
 PROJECT: DAA Digital Advanced Assistant
 DESCRIPTION: Dynamisk system-prompt som ger AI:n personlighet och kontext.
+             Prompten består av en statisk del (personlighet, TTS-regler,
+             verktyg) som är identisk mellan anropen och därför kan cachas hos
+             leverantörerna, och en liten föränderlig del (tid, kontextdata).
 ==============================================================================
 """
 
-def get_system_prompt():
-    """
-    Genererar den kompletta system-prompten med realtidsinformation.
-    Detta gör att DAA vet exakt vilken tid, dag och vecka det är.
-    """
-    now = datetime.now()
-    current_time = now.strftime("%H:%M:%S")
-    current_date = now.strftime("%Y-%m-%d")
-    day_of_week = now.strftime("%A")
-    week_number = now.strftime("%V")
-    
-    # Svenska översättningar för en mer personlig touch
-    days_se = {
-        "Monday": "måndag", "Tuesday": "tisdag", "Wednesday": "onsdag",
-        "Thursday": "torsdag", "Friday": "fredag", "Saturday": "lördag", "Sunday": "söndag"
-    }
-    swe_day = days_se.get(day_of_week, day_of_week)
-
-    return f"""Du är DAA (Digital Advanced Assistant), en mycket kapabel och lojal AI-assistent.
+# Statisk del: ändras bara vid omstart. Allt som varierar per anrop hör hemma
+# i den föränderliga delen, annars slutar leverantörernas prompt-cache att träffa.
+STATIC_PROMPT = """Du är DAA (Digital Advanced Assistant), en mycket kapabel och lojal AI-assistent.
 Du agerar som Anders butler och högra hand – en blandning av en professionell assistent och en superdator.
 
-DIN AKTUELLA KONTEXT:
-- Tid: {current_time}
-- Datum: {current_date}
-- Veckodag: {swe_day}
-- Vecka: {week_number}
-
 VIKTIG REGEL FÖR TALSYNTES (TTS):
 - Skriv ALDRIG temperatursymboler som "°C". 
 - Skriv istället ut allt i klartext precis som det ska sägas. 
@@ -60,8 +41,9 @@ När systemet bifogar hälsodata i konversationen, följ dessa regler:
 Du har tillgång till följande verktyg som du ska använda automatiskt vid behov:
 
 1. VÄDER (get_weather):
-   - Hämtar väder nu, prognos för imorgon och veckans trend via SMHI.
+   - Hämtar väder nu, prognos för imorgon, veckans trend och sol upp/ned via SMHI.
    - Använd detta när Anders frågar om väder, temperatur eller kläder för dagen.
+   - Andra platser: ange location med platsens namn, t.ex. get_weather(location="stugan").
 
 2. DAMMSUGARE (control_vacuum):
    - ID: "vacuum.roborock_s5_f528_robot_cleaner"
@@ -69,9 +51,13 @@ Du har tillgång till följande verktyg som du ska använda automatiskt vid beho
 
 3. BELYSNING (control_light):
    - Kontoret: "light.kontor_2"
+   - Flera enheter eller hela rum på en gång (control_devices): skicka alla entity_ids
+     (eller area_ids) i ETT anrop, t.ex. "släck alla lampor". Svaret anger resultat per enhet.
 
 4. SENSORER (get_ha_state):
    - Temperatur Ute: "sensor.ute_temperature_2"
+   - Historik för Zigbee-sensorer (get_sensor_history): lägsta/högsta/snitt senaste X timmar,
+     t.ex. "hur kallt blev det i natt".
 
 5. KALENDER (get_calendar_events):
    - Används för att kolla Anders schema i Google Kalender.
@@ -79,9 +65,57 @@ Du har tillgång till följande verktyg som du ska använda automatiskt vid beho
 --- DATORSTYRNING (WINDOWS) ---
 Om Anders ber dig göra något med datorn, inkludera dessa taggar i ditt svar:
 - [DO:SYS|lock] (Lås), [DO:SYS|calc] (Kalkylator), [DO:SYS|screenshot] (Skärmdump), [DO:BROWSER|URL] (Öppna sida).
-
-Nu startar sessionen. Det är {swe_day} vecka {week_number}. Vänta på input från Anders.
 """
 
+
+class SystemPrompt(str):
+    """
+    Hela prompten som vanlig text (för leverantörer utan prompt-cache och för
+    token-räkning), med den statiska och den föränderliga delen åtkomliga var för sig.
+    """
+
+    def __new__(cls, static, dynamic=""):
+        prompt = super().__new__(cls, f"{static}\n\n{dynamic}" if dynamic else static)
+        prompt.static = static
+        prompt.dynamic = dynamic
+        return prompt
+
+    def extend(self, block):
+        """Ny prompt med 'block' tillagt sist i den föränderliga delen."""
+        dynamic = f"{self.dynamic}\n\n{block}" if self.dynamic else block
+        return SystemPrompt(self.static, dynamic)
+
+
+def get_volatile_prompt():
+    """
+    Realtidsinformationen som skickas efter den statiska delen.
+    Detta gör att DAA vet exakt vilken tid, dag och vecka det är.
+    """
+    now = datetime.now()
+    current_time = now.strftime("%H:%M:%S")
+    current_date = now.strftime("%Y-%m-%d")
+    day_of_week = now.strftime("%A")
+    week_number = now.strftime("%V")
+    
+    # Svenska översättningar för en mer personlig touch
+    days_se = {
+        "Monday": "måndag", "Tuesday": "tisdag", "Wednesday": "onsdag",
+        "Thursday": "torsdag", "Friday": "fredag", "Saturday": "lördag", "Sunday": "söndag"
+    }
+    swe_day = days_se.get(day_of_week, day_of_week)
+
+    return f"""DIN AKTUELLA KONTEXT:
+- Tid: {current_time}
+- Datum: {current_date}
+- Veckodag: {swe_day}
+- Vecka: {week_number}
+
+Nu startar sessionen. Det är {swe_day} vecka {week_number}. Vänta på input från Anders."""
+
+
+def get_system_prompt():
+    """Genererar den kompletta system-prompten: statisk del följd av realtidsinformation."""
+    return SystemPrompt(STATIC_PROMPT, get_volatile_prompt())
+
 # Behåll variabeln för kompatibilitet, men anropa alltid funktionen i llm_handler.
 SYSTEM_PROMPT = get_system_prompt()
\ No newline at end of file
@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config.settings import get_config
+from app.core.database import get_pool, run_in_db_thread
+
+"""
+==============================================================================
+FILE: app/core/sensor_history.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Sensorhistorik från Zigbee2MQTT. Varje (enhet, mätvärde) får en
+             ringbuffert med fast storlek i NumPy-arrayer. Med jämna mellanrum
+             komprimeras färdiga minuter till minut- och timsammanställningar
+             i SQLite så att frågor som "hur kallt blev det i natt" kan besvaras.
+             Antalet serier är begränsat (LRU) så minnet hålls konstant.
+==============================================================================
+"""
+
+cfg = get_config()
+
+MINUTE = 60
+HOUR = 3600
+
+# Numeriska fält som inte är mätvärden
+IGNORED_METRICS = {"linkquality", "voltage", "update_available"}
+
+SQL_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS sensor_rollup (
+        device TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        resolution INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        min REAL,
+        max REAL,
+        avg REAL,
+        PRIMARY KEY (device, metric, resolution, bucket)
+    ) WITHOUT ROWID
+    ''',
+)
+
+SQL_UPSERT_ROLLUP = '''
+    INSERT OR REPLACE INTO sensor_rollup (device, metric, resolution, bucket, n, min, max, avg)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+# Timmar räknas om från minutraderna (viktat snitt)
+SQL_ROLLUP_HOURS = '''
+    INSERT OR REPLACE INTO sensor_rollup (device, metric, resolution, bucket, n, min, max, avg)
+    SELECT device, metric, 3600, (bucket / 3600) * 3600,
+           SUM(n), MIN(min), MAX(max), SUM(avg * n) / SUM(n)
+    FROM sensor_rollup
+    WHERE device = ? AND metric = ? AND resolution = 60 AND bucket >= ?
+    GROUP BY device, metric, bucket / 3600
+'''
+SQL_SELECT_ROLLUP = '''
+    SELECT bucket, n, min, max, avg FROM sensor_rollup
+    WHERE device = ? AND metric = ? AND resolution = ? AND bucket >= ?
+    ORDER BY bucket
+'''
+SQL_PRUNE = "DELETE FROM sensor_rollup WHERE resolution = ? AND bucket < ?"
+
+
+class RingBuffer:
+    """Fast antal (tid, värde)-par i två förallokerade arrayer."""
+
+    __slots__ = ("ts", "values", "pos", "count", "flushed_until")
+
+    def __init__(self, capacity):
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float32)
+        self.pos = 0
+        self.count = 0
+        # Minuter före denna tidpunkt är redan sparade i databasen
+        self.flushed_until = 0
+
+    def append(self, ts, value):
+        self.ts[self.pos] = ts
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % len(self.ts)
+        self.count = min(self.count + 1, len(self.ts))
+
+    def window(self, since=0.0, until=None):
+        """Värden i tidsordning med since <= t < until."""
+        if self.count < len(self.ts):
+            ts, values = self.ts[:self.count], self.values[:self.count]
+        else:
+            ts = np.roll(self.ts, -self.pos)
+            values = np.roll(self.values, -self.pos)
+        mask = ts >= since
+        if until is not None:
+            mask &= ts < until
+        return ts[mask], values[mask]
+
+
+def downsample(ts, values, resolution):
+    """Grupperar sorterade mätpunkter per hink: (hinkstart, antal, min, max, snitt)."""
+    if len(ts) == 0:
+        return []
+    buckets = (ts // resolution).astype(np.int64) * resolution
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(ts)])
+    values = values.astype(np.float64)
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+    avgs = np.add.reduceat(values, starts) / counts
+    return list(zip(buckets[starts].tolist(), counts.tolist(), mins.tolist(), maxs.tolist(), avgs.tolist()))
+
+
+class SensorHistory:
+    """Ringbuffertar per (enhet, mätvärde), matade av MQTT-cachen."""
+
+    def __init__(self, capacity=None, max_series=None):
+        self.capacity = capacity or cfg["SENSOR_BUFFER_SIZE"]
+        self.max_series = max_series or cfg["SENSOR_MAX_SERIES"]
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, device, data, ts):
+        """Lyssnare för SensorCache: sparar alla numeriska fält i payloaden."""
+        with self._lock:
+            for metric, value in data.items():
+                # bool är en int i Python men inget mätvärde
+                if metric in IGNORED_METRICS or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                key = (device, metric)
+                buf = self._series.get(key)
+                if buf is None:
+                    buf = RingBuffer(self.capacity)
+                    self._series[key] = buf
+                    while len(self._series) > self.max_series:
+                        self._series.popitem(last=False)
+                else:
+                    self._series.move_to_end(key)
+                buf.append(ts, value)
+
+    def series(self):
+        with self._lock:
+            return list(self._series)
+
+    def recent(self, device, metric, since):
+        """Mätpunkter ur minnet som ännu inte sparats som minuter."""
+        with self._lock:
+            buf = self._series.get((device, metric))
+            if buf is None:
+                return np.empty(0), np.empty(0)
+            return buf.window(max(since, buf.flushed_until))
+
+    def flush(self, now=None):
+        """Sparar alla färdiga minuter till databasen och räknar om timmarna. Körs i DB-tråden."""
+        now = now or time.time()
+        current_minute = (int(now) // MINUTE) * MINUTE
+        pending = []
+        with self._lock:
+            for (device, metric), buf in self._series.items():
+                ts, values = buf.window(buf.flushed_until, current_minute)
+                if len(ts):
+                    pending.append((buf, device, metric, downsample(ts, values, MINUTE)))
+
+        if not pending:
+            return 0
+        rows = 0
+        with get_pool().transaction() as conn:
+            for _, device, metric, minutes in pending:
+                conn.executemany(SQL_UPSERT_ROLLUP, [
+                    (device, metric, MINUTE, bucket, n, mn, mx, avg)
+                    for bucket, n, mn, mx, avg in minutes
+                ])
+                first_hour = (minutes[0][0] // HOUR) * HOUR
+                conn.execute(SQL_ROLLUP_HOURS, (device, metric, first_hour))
+                rows += len(minutes)
+        # Markeras först när raderna verkligen är sparade
+        with self._lock:
+            for buf, *_ in pending:
+                buf.flushed_until = current_minute
+        return rows
+
+    def prune(self, now=None):
+        """Rensar minutrader och timrader äldre än sina gränser."""
+        now = now or time.time()
+        with get_pool().transaction() as conn:
+            conn.execute(SQL_PRUNE, (MINUTE, now - cfg["SENSOR_MINUTE_RETENTION_DAYS"] * 86400))
+            conn.execute(SQL_PRUNE, (HOUR, now - cfg["SENSOR_HOUR_RETENTION_DAYS"] * 86400))
+
+
+sensor_history = SensorHistory()
+
+
+def init_sensor_history():
+    with get_pool().transaction() as conn:
+        for sql in SQL_TABLES:
+            conn.execute(sql)
+
+
+def get_history_stats(device, metric, hours, history=None):
+    """
+    Min/max/snitt för senaste 'hours' timmar: minutrader (eller timrader för
+    långa perioder) från databasen plus det som ännu bara finns i minnet.
+    Returnerar None om data saknas.
+    """
+    history = history or sensor_history
+    since = time.time() - hours * HOUR
+    resolution = MINUTE if hours <= 48 else HOUR
+    with get_pool().connection() as conn:
+        rows = conn.execute(SQL_SELECT_ROLLUP, (device, metric, resolution, int(since))).fetchall()
+
+    buckets = [(r["bucket"], r["n"], r["min"], r["max"], r["avg"]) for r in rows]
+    ts, values = history.recent(device, metric, since)
+    buckets += downsample(ts, values, MINUTE)
+    if not buckets:
+        return None
+
+    arr = np.array([b[1:] for b in buckets], dtype=np.float64)
+    n, mins, maxs, avgs = arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3]
+    return {
+        "min": round(float(mins.min()), 1),
+        "min_at": buckets[int(mins.argmin())][0],
+        "max": round(float(maxs.max()), 1),
+        "max_at": buckets[int(maxs.argmax())][0],
+        "avg": round(float((avgs * n).sum() / n.sum()), 1),
+        "samples": int(n.sum()),
+    }
+
+
+async def rollup_loop():
+    """Bakgrundsjobb: sparar färdiga minuter och rensar gamla rader."""
+    await run_in_db_thread(init_sensor_history)
+    last_prune = 0.0
+    while True:
+        await asyncio.sleep(cfg["SENSOR_ROLLUP_INTERVAL"])
+        try:
+            await run_in_db_thread(sensor_history.flush)
+            if time.time() - last_prune > HOUR:
+                await run_in_db_thread(sensor_history.prune)
+                last_prune = time.time()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f">> [Sensorer] Sammanställning misslyckades: {e}")
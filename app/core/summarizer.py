@@ -0,0 +1,132 @@
+import asyncio
+from config.settings import get_config
+from app.core.context import get_token_budget
+from app.core.database import (
+    get_messages_after_async,
+    save_summary_async,
+    get_summaries_async,
+    get_summary_checkpoint_async
+)
+from app.services.clients import get_http_client
+
+"""
+==============================================================================
+FILE: app/core/summarizer.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Rullande sammanfattning av äldre historik. Äldre rader komprimeras
+             till sammanfattningar så att prompten bara behöver dessa plus en
+             kort svans av de senaste meddelandena.
+==============================================================================
+"""
+
+cfg = get_config()
+
+SUMMARY_PROMPT = (
+    "Sammanfatta följande konversation mellan Anders och DAA kortfattat på svenska. "
+    "Behåll fakta, beslut, preferenser och öppna frågor. Max 150 ord.\n\n"
+)
+
+# Sammanfattningarna hålls i minnet så att chatten aldrig behöver läsa DB
+_summaries = []
+_run_lock = asyncio.Lock()
+
+
+def format_transcript(rows):
+    """Gör om historikrader till en läsbar dialog för sammanfattaren."""
+    lines = []
+    for row in rows:
+        who = "Anders" if row["role"] == "user" else "DAA"
+        lines.append(f"{who}: {row['content']}")
+    return "\n".join(lines)
+
+
+async def summarize_with_ollama(transcript):
+    """Standard-sammanfattare: kör lokalt via Ollama (ingen kostnad per token)."""
+    model_id = cfg.get("SUMMARY_MODEL") or cfg["OLLAMA_DEFAULT_MODEL"]
+    payload = {
+        "model": model_id,
+        "messages": [{"role": "user", "content": SUMMARY_PROMPT + transcript}],
+        "stream": False
+    }
+    r = await get_http_client(cfg['OLLAMA_URL']).post(f"{cfg['OLLAMA_URL']}/api/chat", json=payload, timeout=120.0)
+    r.raise_for_status()
+    return r.json().get("message", {}).get("content", "")
+
+
+async def refresh_summary_cache():
+    """Läser in alla sammanfattningar från DB till minnet."""
+    global _summaries
+    _summaries = await get_summaries_async()
+    return len(_summaries)
+
+
+async def summarize_pending(summarize_fn=None):
+    """
+    Sammanfattar nya rader sedan senaste checkpoint, ett block om
+    SUMMARY_CHUNK_SIZE rader i taget. De SUMMARY_KEEP_RECENT senaste raderna
+    lämnas alltid orörda. 'summarize_fn' är en async funktion text -> text
+    (kan bytas mot en stubbe i tester). Returnerar antal nya sammanfattningar.
+    """
+    summarize_fn = summarize_fn or summarize_with_ollama
+    chunk_size = cfg["SUMMARY_CHUNK_SIZE"]
+    keep_recent = cfg["SUMMARY_KEEP_RECENT"]
+    created = 0
+
+    async with _run_lock:
+        checkpoint = await get_summary_checkpoint_async()
+        while True:
+            rows = await get_messages_after_async(checkpoint, chunk_size + keep_recent)
+            # Bara hela block, och bara om svansen fortfarande blir kvar
+            if len(rows) < chunk_size + keep_recent:
+                break
+
+            chunk = rows[:chunk_size]
+            summary = (await summarize_fn(format_transcript(chunk)) or "").strip()
+            if not summary:
+                break
+            if not await save_summary_async(chunk[0]["id"], chunk[-1]["id"], summary):
+                break
+            checkpoint = chunk[-1]["id"]
+            created += 1
+
+        if created:
+            await refresh_summary_cache()
+
+    return created
+
+
+def get_summary_context(model_id):
+    """
+    Returnerar (text, checkpoint) för prompten: de senaste sammanfattningarna som
+    ryms i SUMMARY_TOKEN_SHARE av modellens budget, samt id för sista sammanfattade
+    raden. Historik med id <= checkpoint ska inte skickas ordagrant.
+    """
+    if not _summaries:
+        return "", 0
+
+    budget = int(get_token_budget(model_id) * cfg["SUMMARY_TOKEN_SHARE"])
+    selected = []
+    used = 0
+    for summary in reversed(_summaries):
+        cost = summary.get("tokens") or 0
+        if selected and used + cost > budget:
+            break
+        selected.append(summary["content"])
+        used += cost
+    selected.reverse()
+    return "\n".join(f"- {text}" for text in selected), _summaries[-1]["end_id"]
+
+
+async def summary_loop():
+    """Bakgrundsjobb som kör sammanfattaren med jämna mellanrum."""
+    await refresh_summary_cache()
+    while True:
+        try:
+            created = await summarize_pending()
+            if created:
+                print(f">> [Minne] {created} nya sammanfattningar skapade.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f">> [Minne] Sammanfattning misslyckades: {e}")
+        await asyncio.sleep(cfg["SUMMARY_INTERVAL"])
@@ -1,70 +1,37 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel
-import google.generativeai as genai
-import requests
-import json
-import time
 from typing import List, Optional
 
 # Importera databasfunktioner
-from app.core.database import save_message, get_history
+from app.core.database import save_message_async, get_history_async
 # Importera System Prompt
 from app.core.prompts import get_system_prompt
-
-# Importera inställningar
-try:
-    from config.settings import (
-        GOOGLE_API_KEY, 
-        OPENAI_API_KEY, 
-        OLLAMA_URL, 
-        GARMIN_EMAIL, 
-        GARMIN_PASSWORD,
-        STRAVA_CLIENT_ID,
-        STRAVA_REFRESH_TOKEN
-    )
-except ImportError:
-    GOOGLE_API_KEY = None
-    OPENAI_API_KEY = None
-    OLLAMA_URL = "http://127.0.0.1:11434"
-    GARMIN_EMAIL = None
-    GARMIN_PASSWORD = None
-    STRAVA_CLIENT_ID = None
-    STRAVA_REFRESH_TOKEN = None
-
-# Verktyg
-from app.tools.garmin_core import GarminCoach
-from app.tools.strava_core import StravaTool
+# Avsiktsklassning (vilken kontext som ska bifogas)
+from app.core import intents
+# Importera kontextbyggare (token-budget)
+from app.core.context import build_context, estimate_tokens
+# Importera sammanfattningar av äldre historik
+from app.core.summarizer import get_summary_context
+# Leverantörsval med reservkedja, hedging och circuit breakers
+from app.services.failover import stream_with_failover, get_provider_status
+# Cachad modellista
+from app.services.model_catalog import catalog
+# Kontextkällor (hälsa, träning, väder, hemmet, kalender)
+from app.services.context_providers import gather_context, get_context_stats
+# Statistik för verktygsanrop (cacheträffar, timeouts)
+from app.services.tool_runner import get_tool_stats
+# Förhämtat väder per plats (strukturerade timvärden)
+from app.services.weather_service import weather_service
 
 router = APIRouter()
 
 # --- KONFIGURATION AV AI ---
-has_google = False
-if GOOGLE_API_KEY:
-    try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        has_google = True
-    except: pass
-
-# --- GARMIN INIT ---
-garmin_tool = None
-if GARMIN_EMAIL and GARMIN_PASSWORD:
-    try:
-        garmin_tool = GarminCoach()
-    except: pass
-
-last_garmin_fetch = 0
-cached_garmin_data = None
-
-# --- STRAVA INIT ---
-strava_tool = None
-if STRAVA_CLIENT_ID and STRAVA_REFRESH_TOKEN:
-    try:
-        strava_tool = StravaTool()
-    except: pass
-
-last_strava_fetch = 0
-cached_strava_data = None
+# Leverantörerna konfigureras i app/services (llm_handler, providers, clients).
 
+# --- KONTEXT ---
+# Garmin, Strava, väder, Home Assistant och kalender hämtas via
+# app/services/context_providers.py (bakgrundsloopar startas i main.py).
 
 # --- MODELLER ---
 class Message(BaseModel):
@@ -80,177 +47,90 @@ class ChatRequest(BaseModel):
 # --- ENDPOINTS ---
 
 @router.get("/api/models")
-async def get_models():
-    """Hämtar tillgängliga modeller dynamiskt."""
-    models = []
-    
-    # 1. Google
-    if has_google:
-        try:
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    clean_id = m.name.replace("models/", "")
-                    d_name = getattr(m, "display_name", clean_id)
-                    models.append({"id": clean_id, "name": f"Google: {d_name}"})
-        except: pass
-    
-    # 2. OpenAI
-    if OPENAI_API_KEY:
-        try:
-            h = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-            r = requests.get("https://api.openai.com/v1/models", headers=h, timeout=5)
-            if r.status_code == 200:
-                data = r.json().get('data', [])
-                data.sort(key=lambda x: x.get('created', 0), reverse=True)
-                for m in data:
-                    if m['id'].startswith(("gpt", "o1")):
-                        models.append({"id": m['id'], "name": f"OpenAI: {m['id']}"})
-        except: pass
-
-    # 3. Ollama
-    try:
-        r = requests.get(f"{OLLAMA_URL}/api/tags", timeout=2)
-        if r.status_code == 200:
-            for m in r.json().get('models', []):
-                models.append({"id": m['name'], "name": f"Ollama: {m['name']}"})
-    except: pass
-
-    return {"data": models}
+async def get_models(request: Request):
+    """Hämtar tillgängliga modeller (cachat, stöd för If-None-Match)."""
+    models, etag = await catalog.get()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse({"data": models}, headers=headers)
+
+@router.get("/api/stats")
+async def get_stats():
+    """Latens per kontextkälla, status för AI-leverantörerna och verktygsstatistik."""
+    return {"context": get_context_stats(), "providers": get_provider_status(), "tools": get_tool_stats()}
+
+@router.get("/api/weather")
+@router.get("/api/weather/{location}")
+async def get_weather_data(location: Optional[str] = None, hours: int = 48):
+    """Förhämtat väder som arrayer (för t.ex. HA-automationer). Väntar aldrig på SMHI."""
+    data = weather_service.get(location)
+    if data is None:
+        return JSONResponse({"error": "ingen prognos för platsen ännu", "locations": list(weather_service.locations)}, status_code=404)
+    return data.as_dict(hours)
 
 @router.post("/chat")
 @router.post("/api/chat")
 async def chat(request: ChatRequest):
-    global last_garmin_fetch, cached_garmin_data
-    global last_strava_fetch, cached_strava_data
-    
     # 1. Hämta data
     user_msg = request.messages[-1].content
     session_id = request.session_id
-    model_id = request.model.lower()
+    model_id = request.model
 
-    # 2. SPARA ANVÄNDARENS MEDDELANDE
-    # Vi sparar fortfarande med session_id för ordningens skull, 
-    # men get_history hämtar nu allt.
-    save_message(session_id, "user", user_msg)
+    # 2. Hämta historik (innan det nya meddelandet sparas)
+    # Bufferten ger upp till HISTORY_LIMIT meddelanden, sedan trimmas de
+    # till modellens token-budget när system-prompten är klar (se nedan).
+    db_history = await get_history_async(session_id)
 
-    # 3. Hämta historik
-    # Nu utan 'limit=20', så den använder default från settings.py (oftast 600)
-    # Detta ger AI:n ett mycket längre minne.
-    db_history = get_history(session_id)
+    # 3. SPARA ANVÄNDARENS MEDDELANDE
+    # Vi sparar fortfarande med session_id för ordningens skull, 
+    # men get_history hämtar allt.
+    await save_message_async(session_id, "user", user_msg)
 
     # 4. Hämta System Prompt
     system_prompt = get_system_prompt()
 
-    # --- HÄMTA GARMIN-DATA ---
-    garmin_triggers = ["puls", "sömn", "stress", "garmin", "mår jag", "status", "kropp"]
-    if garmin_tool and any(t in user_msg.lower() for t in garmin_triggers):
-        now = time.time()
-        if (now - last_garmin_fetch > 900) or not cached_garmin_data:
-            try:
-                report = garmin_tool.get_health_report()
-                if report:
-                    cached_garmin_data = report
-                    last_garmin_fetch = now
-            except: pass
-        
-        if cached_garmin_data:
-            d = cached_garmin_data
-            data_block = (
-                f"   - 💤 Sömn: {d.get('sömn_timmar')} timmar\n"
-                f"   - ❤️ Vilopuls: {d.get('vilopuls')} bpm\n"
-                f"   - ⚡ Stressnivå: {d.get('stress_snitt')}/100\n"
-                f"   - 🔋 Body Battery: {d.get('body_battery', 'N/A')}"
-            )
-            system_prompt += f"\n\n[HÄLSODATA FRÅN GARMIN IDAG]:\n{data_block}\n\nINSTRUKTION: Analysera ovanstående data. Ge konkreta råd baserat på värdena."
-
-    # --- HÄMTA STRAVA-DATA ---
-    strava_triggers = ["strava", "löpning", "cykling", "pass", "träning", "aktivitet"]
-    if strava_tool and any(t in user_msg.lower() for t in strava_triggers):
-        now = time.time()
-        if (now - last_strava_fetch > 300) or not cached_strava_data:
-            try:
-                activities = strava_tool.get_health_report(limit=3)
-                if activities:
-                    cached_strava_data = activities
-                    last_strava_fetch = now
-            except: pass
-
-        if cached_strava_data:
-            strava_text = ""
-            for act in cached_strava_data:
-                strava_text += (
-                    f"   - 📅 {act['datum']}: {act['typ']}\n"
-                    f"     Distans: {act['distans_km']} km | Tid: {act['tid_min']} min | Ansträngning: {act['ansträngning']}\n"
-                )
-            system_prompt += f"\n\n[SENASTE TRÄNINGSPASS]:\n{strava_text}\nINSTRUKTION: Kommentera träningen kortfattat och uppmuntrande."
-
-    response_text = ""
+    # Vilka kontextkällor behövs? (lokal klassning, under en millisekund)
+    user_intents = intents.classify(user_msg)
 
-    # 5. ANROPA AI
-    
-    # --- GOOGLE GEMINI ---
-    if "gemini" in model_id:
-        try:
-            gemini_history = []
-            gemini_history.append({"role": "user", "parts": [system_prompt]})
-            gemini_history.append({"role": "model", "parts": ["Uppfattat. Jag svarar strukturerat."]})\
+    # Kontextkällor hämtas parallellt med gemensam deadline. De hamnar i promptens
+    # föränderliga del så att den statiska delen kan cachas hos leverantören.
+    for block in await gather_context(user_intents):
+        system_prompt = system_prompt.extend(block)
 
-            for msg in db_history:
-                role = "model" if msg['role'] == "assistant" else "user"
-                gemini_history.append({"role": role, "parts": [msg['content']]})
-            
-            # Lägg till nuvarande meddelande om det inte hann sparas/hämtas
-            if not db_history or db_history[-1]['content'] != user_msg:
-                 gemini_history.append({"role": "user", "parts": [user_msg]})
+    # Äldre historik skickas som sammanfattningar, resten ordagrant
+    summary_block, summary_checkpoint = get_summary_context(model_id)
+    if summary_block:
+        system_prompt = system_prompt.extend(f"[SAMMANFATTNING AV TIDIGARE SAMTAL]:\n{summary_block}")
 
-            gmodel = genai.GenerativeModel(model_id)
-            final_response = gmodel.generate_content(gemini_history)
-            response_text = final_response.text
-
-        except Exception as e:
-            response_text = f"Gemini Error: {e}"
+    # Välj de senaste meddelandena som ryms i modellens token-budget
+    db_history = build_context(
+        db_history, model_id,
+        reserved_tokens=estimate_tokens(system_prompt) + estimate_tokens(user_msg),
+        after_id=summary_checkpoint
+    )
 
-    # --- OPENAI / OTHERS ---
-    elif "gpt" in model_id or "o1" in model_id:
-        try:
-            messages = [{"role": "system", "content": system_prompt}]
-            for msg in db_history:
-                messages.append({"role": msg['role'], "content": msg['content']})
-            
-            if not db_history or db_history[-1]['content'] != user_msg:
-                 messages.append({"role": "user", "content": user_msg})
+    # 5. ANROPA AI (strömmande)
+    # Det nya meddelandet skickas separat, historiken innehåller bara tidigare rader.
+    chunks = stream_with_failover(model_id, db_history, user_msg, system_prompt=system_prompt)
 
-            payload = {"model": model_id, "messages": messages}
-            h = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-            r = requests.post("https://api.openai.com/v1/chat/completions", json=payload, headers=h)
-            if r.status_code == 200:
-                response_text = r.json()["choices"][0]["message"]["content"]
-            else:
-                response_text = f"OpenAI Error: {r.text}"
-        except Exception as e:
-            response_text = f"Error: {e}"
+    # 6. SPARA SVAR när strömmen är klar
+    return StreamingResponse(
+        stream_and_save(chunks, session_id),
+        media_type="text/plain; charset=utf-8"
+    )
 
-    # --- OLLAMA ---
-    else:
-        try:
-            messages = [{"role": "system", "content": system_prompt}]
-            for msg in db_history:
-                messages.append({"role": msg['role'], "content": msg['content']})
-            
-            if not db_history or db_history[-1]['content'] != user_msg:
-                 messages.append({"role": "user", "content": user_msg})
 
-            payload = {"model": model_id, "messages": messages, "stream": False}
-            r = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=60)
-            if r.status_code == 200:
-                response_text = r.json().get("message", {}).get("content", "")
-            else:
-                response_text = f"Ollama Error: {r.text}"
-        except Exception as e:
-            response_text = f"Error: {e}"
+async def stream_and_save(chunks, session_id):
+    """Skickar vidare varje bit direkt till klienten och sparar hela svaret på slutet."""
+    parts = []
+    async for chunk in chunks:
+        if chunk:
+            parts.append(chunk)
+            yield chunk
 
-    # 6. SPARA SVAR
+    response_text = "".join(parts)
     if response_text:
-        save_message(session_id, "assistant", response_text)
-
-    return response_text
\ No newline at end of file
+        await save_message_async(session_id, "assistant", response_text)
@@ -0,0 +1,5 @@
+"""
+app/services/__init__.py
+------------------------
+Services for talking to the AI providers (LLM streaming, shared clients).
+"""
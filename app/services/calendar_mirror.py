@@ -0,0 +1,158 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config.settings import get_config
+from app.services.clients import run_blocking
+
+"""
+==============================================================================
+FILE: app/services/calendar_mirror.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Lokal spegel av Google Kalender. Första synken hämtar alla
+             händelser från CALENDAR_SYNC_PAST_DAYS bakåt; därefter hämtas
+             bara ändringar med Calendars syncToken. Schemafrågor besvaras
+             ur minnet utan API-anrop.
+==============================================================================
+"""
+
+cfg = get_config()
+
+
+def _status(error):
+    """HTTP-status ur googleapiclients HttpError (utan att importera paketet)."""
+    resp = getattr(error, "resp", None)
+    return getattr(resp, "status", None) or getattr(error, "status_code", None)
+
+
+def _timestamp(when):
+    """start/end från API:t -> unix-tid. Heldagshändelser räknas från lokal midnatt."""
+    if "dateTime" in when:
+        return datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00")).timestamp()
+    return datetime.strptime(when["date"], "%Y-%m-%d").timestamp()
+
+
+class CalendarMirror:
+    """Händelser per id, uppdaterade inkrementellt via syncToken."""
+
+    def __init__(self, calendar_id=None, service_factory=None, interval=None, past_days=None):
+        self.calendar_id = calendar_id or cfg["CALENDAR_ID"]
+        self.interval = interval or cfg["CALENDAR_SYNC_INTERVAL"]
+        self.past_days = cfg["CALENDAR_SYNC_PAST_DAYS"] if past_days is None else past_days
+        # Standard: den cachade tjänsten i gcal_core (hämtas sent, se _service)
+        self.service_factory = service_factory
+        self.events = {}
+        self.sync_token = None
+        self.synced_at = 0.0
+        # Sorterat på start: (start, slut, händelse)
+        self._index = []
+        # googleapiclient (httplib2) är inte trådsäkert; en synk åt gången
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return os.path.exists(cfg["SERVICE_ACCOUNT_FILE"])
+
+    @property
+    def ready(self):
+        return self.sync_token is not None
+
+    # --- SYNK (blockerande, körs i trådpoolen) ---
+
+    def _service(self):
+        if self.service_factory is None:
+            from app.tools.gcal_core import get_service
+            self.service_factory = get_service
+        return self.service_factory()
+
+    def _list(self, **params):
+        """Alla sidor för en list-förfrågan. Returnerar (händelser, nextSyncToken)."""
+        events = self._service().events()
+        params = dict(params, calendarId=self.calendar_id, singleEvents=True, maxResults=250)
+        items = []
+        while True:
+            result = events.list(**params).execute()
+            items.extend(result.get("items", []))
+            # nextSyncToken kommer först på sista sidan
+            if not result.get("nextPageToken"):
+                return items, result.get("nextSyncToken")
+            params["pageToken"] = result["nextPageToken"]
+
+    def sync(self):
+        """Hämtar ändringar sedan förra synken (eller allt om token saknas/gått ut)."""
+        with self._lock:
+            items = None
+            if self.sync_token:
+                try:
+                    items, token = self._list(syncToken=self.sync_token)
+                except Exception as e:
+                    # 410 Gone: token ogiltig, Google kräver en ny full synk
+                    if _status(e) != 410:
+                        raise
+                    print(">> [Kalender] ⚠️ syncToken har gått ut, gör full synk.")
+
+            full = items is None
+            if full:
+                time_min = datetime.now(timezone.utc) - timedelta(days=self.past_days)
+                items, token = self._list(timeMin=time_min.isoformat().replace("+00:00", "Z"))
+
+            events = {} if full else dict(self.events)
+            for event in items:
+                if event.get("status") == "cancelled":
+                    events.pop(event["id"], None)
+                else:
+                    events[event["id"]] = event
+            self.events = events
+            self._index = self._build_index(events)
+            self.sync_token = token
+            self.synced_at = time.time()
+            return len(items)
+
+    @staticmethod
+    def _build_index(events):
+        index = []
+        for event in events.values():
+            try:
+                index.append((_timestamp(event["start"]), _timestamp(event["end"]), event))
+            except (KeyError, ValueError):
+                continue
+        index.sort(key=lambda row: row[0])
+        return index
+
+    # --- BAKGRUNDSLOOP ---
+
+    async def run(self):
+        while True:
+            try:
+                changed = await run_blocking(self.sync)
+                if changed:
+                    print(f">> [Kalender] {changed} ändringar synkade ({len(self.events)} händelser).")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f">> [Kalender] Synk misslyckades: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        return asyncio.create_task(self.run())
+
+    # --- LÄSNING ---
+
+    def upcoming(self, limit=5, now=None):
+        """Pågående och kommande händelser i startordning (som timeMin=nu i API:t)."""
+        now = now or time.time()
+        result = []
+        for start, end, event in self._index:
+            if end > now:
+                result.append(event)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def between(self, start, end):
+        """Händelser som överlappar [start, end) (unix-tid)."""
+        return [event for s, e, event in self._index if s < end and e > start]
+
+
+calendar_mirror = CalendarMirror()
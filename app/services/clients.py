@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+from config.settings import get_config
+
+"""
+==============================================================================
+FILE: app/services/clients.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Register över långlivade klienter mot AI-leverantörerna. Klienterna
+             skapas vid uppstart (main.py), återanvänds per leverantör/bas-URL
+             så att TLS-handskakning och anslutningar delas mellan anrop, och
+             stängs vid nedstängning. Här finns även trådpoolen för SDK:er som
+             bara finns i synkron form.
+==============================================================================
+"""
+
+cfg = get_config()
+
+# HTTP/2 kräver paketet 'h2' (httpx[http2]). Saknas det kör vi HTTP/1.1 med keep-alive.
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=120.0
+)
+TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Blockerande anrop (Gemini SDK, Garmin, Strava) körs här i stället för på event-loopen
+_executor = ThreadPoolExecutor(
+    max_workers=cfg["BLOCKING_POOL_SIZE"],
+    thread_name_prefix="daa-io"
+)
+
+
+class ClientRegistry:
+    """Håller en klient per (leverantör, bas-URL, nyckel)."""
+
+    def __init__(self):
+        self._clients = {}
+
+    def _new_http(self, base_url=None):
+        # HTTP/2 ger bara något över TLS, lokala tjänster (Ollama) kör HTTP/1.1
+        use_http2 = HTTP2_AVAILABLE and (base_url is None or base_url.startswith("https://"))
+        return httpx.AsyncClient(http2=use_http2, limits=LIMITS, timeout=TIMEOUT)
+
+    def http(self, base_url=None):
+        """Delad httpx-klient, en per bas-URL (None = allmän klient)."""
+        key = ("http", base_url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._new_http(base_url)
+            self._clients[key] = client
+        return client
+
+    def openai(self, api_key, base_url=None):
+        """OpenAI-kompatibel klient (OpenAI, Groq, DeepSeek)."""
+        key = ("openai", base_url, api_key)
+        client = self._clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self._new_http(base_url or "https://api.openai.com")
+            )
+            self._clients[key] = client
+        return client
+
+    def anthropic(self, api_key):
+        key = ("anthropic", None, api_key)
+        client = self._clients.get(key)
+        if client is None:
+            client = AsyncAnthropic(
+                api_key=api_key,
+                http_client=self._new_http("https://api.anthropic.com")
+            )
+            self._clients[key] = client
+        return client
+
+    def startup(self):
+        """Skapar klienter för alla konfigurerade leverantörer i förväg."""
+        if cfg.get("OPENAI_API_KEY"):
+            self.openai(cfg["OPENAI_API_KEY"])
+        if cfg.get("GROQ_API_KEY"):
+            self.openai(cfg["GROQ_API_KEY"], cfg["GROQ_BASE_URL"])
+        if cfg.get("DEEPSEEK_API_KEY"):
+            self.openai(cfg["DEEPSEEK_API_KEY"], cfg["DEEPSEEK_BASE_URL"])
+        if cfg.get("ANTHROPIC_API_KEY"):
+            self.anthropic(cfg["ANTHROPIC_API_KEY"])
+        self.http(cfg["OLLAMA_URL"])
+        self.http()
+        print(f">> [Klienter] {len(self._clients)} leverantörsklienter redo (HTTP/2: {HTTP2_AVAILABLE}).")
+
+    async def shutdown(self):
+        """Stänger alla klienter och deras anslutningar."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                if isinstance(client, httpx.AsyncClient):
+                    await client.aclose()
+                else:
+                    await client.close()
+            except Exception as e:
+                print(f">> [Klienter] Fel vid stängning: {e}")
+
+
+registry = ClientRegistry()
+
+
+def get_http_client(base_url=None):
+    """Genväg till registrets delade httpx-klient."""
+    return registry.http(base_url)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Kör en blockerande funktion i den begränsade trådpoolen."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
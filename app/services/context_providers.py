@@ -0,0 +1,207 @@
+import asyncio
+import os
+import time
+from collections import deque
+from config.settings import get_config
+from app.core import intents
+from app.core.metrics_store import format_trends
+from app.services.clients import run_blocking
+from app.services.snapshots import (
+    garmin_snapshot,
+    metrics_snapshot,
+    get_recent_strava,
+    format_age,
+    STRAVA_ENABLED
+)
+
+"""
+==============================================================================
+FILE: app/services/context_providers.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Kontextkällor som berikar system-prompten (hälsa, träning,
+             trender, väder, hemmet, kalender). Varje källa har egen timeout
+             och cache; alla relevanta källor hämtas parallellt och de som
+             inte hunnit klart vid den gemensamma deadlinen hoppas över.
+==============================================================================
+"""
+
+cfg = get_config()
+
+
+class ContextProvider:
+    """En kontextkälla. 'fetch' är en async-funktion som returnerar ett textblock (eller None)."""
+
+    def __init__(self, name, intent, fetch, enabled=True):
+        self.name = name
+        self.intent = intent
+        self.fetch = fetch
+        self.enabled = enabled
+        timeouts = cfg["CONTEXT_PROVIDER_TIMEOUTS"]
+        self.timeout = timeouts.get(name, timeouts.get("default", 2.0))
+        self.ttl = cfg["CONTEXT_CACHE_TTL"].get(name, 0)
+        self._cached = None
+        self._cached_at = 0.0
+        self._inflight = None
+        # Latensstatistik
+        self.calls = 0
+        self.cache_hits = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.late = 0
+        self.latencies = deque(maxlen=200)
+
+    def _cache_valid(self):
+        return self.ttl and self._cached is not None and time.time() - self._cached_at < self.ttl
+
+    async def _run(self):
+        start = time.perf_counter()
+        try:
+            block = await asyncio.wait_for(self.fetch(), timeout=self.timeout)
+            if block and self.ttl:
+                self._cached = block
+                self._cached_at = time.time()
+            return block
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f">> [Kontext] {self.name} svarade inte inom {self.timeout}s.")
+        except Exception as e:
+            self.errors += 1
+            print(f">> [Kontext] {self.name} misslyckades: {e}")
+        finally:
+            self.latencies.append((time.perf_counter() - start) * 1000)
+        return None
+
+    async def get(self):
+        self.calls += 1
+        if self._cache_valid():
+            self.cache_hits += 1
+            return self._cached
+        # Samtidiga förfrågningar delar på samma hämtning
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._run())
+        return await asyncio.shield(self._inflight)
+
+    def stats(self):
+        samples = sorted(self.latencies)
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 1) if samples else None
+
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "late": self.late,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "max_ms": round(samples[-1], 1) if samples else None,
+        }
+
+
+# --- KÄLLOR ---
+
+async def _garmin_block():
+    # Läses direkt ur minnet, bakgrundsloopen håller datan färsk
+    d, age = garmin_snapshot.get()
+    if not d:
+        return None
+    data_block = (
+        f"   - 💤 Sömn: {d.get('sömn_timmar')} timmar\n"
+        f"   - ❤️ Vilopuls: {d.get('vilopuls')} bpm\n"
+        f"   - ⚡ Stressnivå: {d.get('stress_snitt')}/100\n"
+        f"   - 🔋 Body Battery: {d.get('body_battery', 'N/A')}"
+    )
+    if garmin_snapshot.is_stale():
+        data_block += f"\n   - ⏱️ OBS: Datan hämtades {format_age(age)}"
+    return f"[HÄLSODATA FRÅN GARMIN IDAG]:\n{data_block}\n\nINSTRUKTION: Analysera ovanstående data. Ge konkreta råd baserat på värdena."
+
+
+async def _strava_block():
+    # Bara nya pass hämtas (after-markör), resten läses lokalt
+    activities = await run_blocking(get_recent_strava, limit=3)
+    if not activities:
+        return None
+    strava_text = ""
+    for act in activities:
+        strava_text += (
+            f"   - 📅 {act['datum']}: {act['typ']}\n"
+            f"     Distans: {act['distans_km']} km | Tid: {act['tid_min']} min | Ansträngning: {act['ansträngning']}\n"
+        )
+    return f"[SENASTE TRÄNINGSPASS]:\n{strava_text}\nINSTRUKTION: Kommentera träningen kortfattat och uppmuntrande."
+
+
+async def _trend_block():
+    # Lokal tidsserie, inga API-anrop
+    trends, age = metrics_snapshot.get()
+    if not trends:
+        return None
+    trend_block = format_trends(trends)
+    if metrics_snapshot.is_stale():
+        trend_block += f"\n   - ⏱️ OBS: Senast synkad {format_age(age)}"
+    return f"[TRENDER 7 OCH 28 DAGAR]:\n{trend_block}\nINSTRUKTION: Jämför 7-dagarssnittet med 28-dagarssnittet. En belastningskvot över 1.5 tyder på snabb ökning."
+
+
+async def _weather_block():
+    from app.tools.weather_core import get_weather
+    report = await run_blocking(get_weather)
+    return f"[VÄDER (SMHI)]:\n{report}" if report else None
+
+
+async def _home_block():
+    from app.tools.ha_core import get_ha_state
+    states = await asyncio.gather(*(
+        run_blocking(get_ha_state, entity_id) for entity_id in cfg["HA_CONTEXT_ENTITIES"]
+    ))
+    lines = "\n".join(f"   - {s}" for s in states if s)
+    return f"[STATUS I HEMMET]:\n{lines}" if lines else None
+
+
+async def _calendar_block():
+    from app.tools.gcal_core import get_calendar_events
+    events = await run_blocking(get_calendar_events)
+    return f"[KALENDER]:\n{events}" if events else None
+
+
+# Ordningen avgör i vilken ordning blocken hamnar i prompten
+PROVIDERS = [
+    ContextProvider("health", intents.HEALTH, _garmin_block, enabled=garmin_snapshot.enabled),
+    ContextProvider("training", intents.TRAINING, _strava_block, enabled=STRAVA_ENABLED),
+    ContextProvider("trends", intents.TRENDS, _trend_block, enabled=metrics_snapshot.enabled),
+    ContextProvider("weather", intents.WEATHER, _weather_block),
+    ContextProvider("home", intents.HOME, _home_block,
+                    enabled=bool(cfg.get("HA_BASE_URL") and cfg.get("HA_TOKEN"))),
+    ContextProvider("calendar", intents.CALENDAR, _calendar_block,
+                    enabled=os.path.exists(cfg["SERVICE_ACCOUNT_FILE"])),
+]
+
+
+async def gather_context(user_intents, deadline=None):
+    """
+    Hämtar alla relevanta källor parallellt och returnerar deras textblock i
+    PROVIDERS-ordning. Källor som inte hunnit klart vid deadline utelämnas; de
+    får köra klart i bakgrunden så att cachen är varm till nästa fråga.
+    """
+    selected = [p for p in PROVIDERS if p.enabled and p.intent in user_intents]
+    if not selected:
+        return []
+
+    deadline = cfg["CONTEXT_DEADLINE"] if deadline is None else deadline
+    tasks = {p: asyncio.ensure_future(p.get()) for p in selected}
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+
+    blocks = []
+    for provider, task in tasks.items():
+        if task in done:
+            block = task.result()
+            if block:
+                blocks.append(block)
+        else:
+            provider.late += 1
+            print(f">> [Kontext] {provider.name} hann inte klart inom {deadline}s, hoppas över.")
+    return blocks
+
+
+def get_context_stats():
+    """Latens och träffar per källa, för att se vilken källa som dominerar."""
+    return {p.name: p.stats() for p in PROVIDERS}
@@ -0,0 +1,209 @@
+import asyncio
+import time
+from config.settings import get_config
+from app.services import router
+
+"""
+==============================================================================
+FILE: app/services/failover.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Reservkedja av leverantörer med tidsgränser till första token,
+             valfri hedging (nästa leverantör startas parallellt om den första
+             dröjer) och circuit breakers som hoppar över leverantörer som
+             fallerat upprepade gånger.
+==============================================================================
+"""
+
+cfg = get_config()
+
+NO_PROVIDER_MESSAGE = "⚠️ Ingen AI-leverantör svarade just nu. Försök igen om en stund."
+
+
+class CircuitBreaker:
+    """Öppnas efter 'threshold' fel i rad. Efter 'reset_seconds' släpps ett provförsök igenom."""
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = 0.0
+
+    @property
+    def is_open(self):
+        return self.failures >= self.threshold
+
+    def allow(self):
+        if not self.is_open:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_seconds:
+            # Halvöppen: ett provförsök, övriga väntar en ny period
+            self.opened_at = now
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.is_open:
+            self.opened_at = time.monotonic()
+
+
+_breakers = {}
+
+
+def get_breaker(provider_name):
+    breaker = _breakers.get(provider_name)
+    if breaker is None:
+        breaker = CircuitBreaker(cfg["CIRCUIT_FAILURE_THRESHOLD"], cfg["CIRCUIT_RESET_SECONDS"])
+        _breakers[provider_name] = breaker
+    return breaker
+
+
+def get_provider_status():
+    """Status per leverantör för övervakning."""
+    return {
+        name: {"failures": b.failures, "open": b.is_open}
+        for name, b in _breakers.items()
+    }
+
+
+def first_token_timeout(provider_name):
+    timeouts = cfg["PROVIDER_FIRST_TOKEN_TIMEOUT"]
+    return timeouts.get(provider_name, timeouts.get("default", 10.0))
+
+
+def build_chain(model_id):
+    """Vald modell först, sedan FALLBACK_CHAIN. Dubbletter och okonfigurerade leverantörer hoppas över."""
+    chain = []
+    seen = set()
+    for candidate in [model_id] + list(cfg["FALLBACK_CHAIN"]):
+        provider, provider_model = router.resolve(candidate)
+        key = (provider.name, provider_model)
+        if key in seen or not provider.available():
+            continue
+        seen.add(key)
+        chain.append((provider, provider_model))
+    return chain
+
+
+class _Attempt:
+    """Ett pågående anrop till en leverantör, fram till första token."""
+
+    def __init__(self, provider, model_id, gen):
+        self.provider = provider
+        self.model_id = model_id
+        self.gen = gen
+        self.deadline = time.monotonic() + first_token_timeout(provider.name)
+        self.task = asyncio.create_task(gen.__anext__())
+
+    async def close(self):
+        if not self.task.done():
+            self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            pass
+        try:
+            await self.gen.aclose()
+        except Exception:
+            pass
+
+
+async def stream_with_failover(model_id, history, new_message, system_prompt=None):
+    """
+    Strömmar svaret från första leverantör i kedjan som levererar en token i tid.
+    När svaret väl har börjat byts leverantör inte längre (texten är redan skickad).
+    """
+    pending = build_chain(model_id)
+    hedge_after = cfg["HEDGE_AFTER_MS"] / 1000
+    active = []
+    winner = None
+    first_chunk = None
+
+    def start_next():
+        while pending:
+            provider, provider_model = pending.pop(0)
+            if not get_breaker(provider.name).allow():
+                print(f">> [Failover] Hoppar över {provider.name} (circuit breaker öppen).")
+                continue
+            gen = provider.stream(
+                provider_model, history, new_message, system_prompt=system_prompt, strict=True
+            )
+            active.append(_Attempt(provider, provider_model, gen))
+            return True
+        return False
+
+    def fail(attempt, reason):
+        get_breaker(attempt.provider.name).record_failure()
+        print(f">> [Failover] {attempt.provider.name}/{attempt.model_id} misslyckades: {reason}")
+
+    start_next()
+    last_start = time.monotonic()
+
+    try:
+        while active and winner is None:
+            wake = min(a.deadline for a in active)
+            if hedge_after and pending:
+                wake = min(wake, last_start + hedge_after)
+            done, _ = await asyncio.wait(
+                [a.task for a in active],
+                timeout=max(0.0, wake - time.monotonic()),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            now = time.monotonic()
+            for attempt in list(active):
+                if attempt.task in done:
+                    active.remove(attempt)
+                    error = attempt.task.exception()
+                    if error is None:
+                        winner = attempt
+                        first_chunk = attempt.task.result()
+                        break
+                    if isinstance(error, StopAsyncIteration):
+                        error = "tomt svar"
+                    fail(attempt, error)
+                elif now >= attempt.deadline:
+                    active.remove(attempt)
+                    fail(attempt, "ingen token inom tidsgränsen")
+                    await attempt.close()
+
+            if winner is None:
+                # Nästa i kedjan: när inget försök pågår, eller när hedge-tiden gått ut
+                if not active or (hedge_after and now - last_start >= hedge_after):
+                    if start_next():
+                        last_start = now
+    finally:
+        # Avbryt förlorarna (även om klienten kopplat ner under väntan)
+        for attempt in active:
+            await attempt.close()
+
+    if winner is None:
+        yield NO_PROVIDER_MESSAGE
+        return
+
+    breaker = get_breaker(winner.provider.name)
+    try:
+        yield first_chunk
+        while True:
+            try:
+                chunk = await asyncio.wait_for(winner.gen.__anext__(), timeout=cfg["PROVIDER_IDLE_TIMEOUT"])
+            except StopAsyncIteration:
+                break
+            yield chunk
+        breaker.record_success()
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        yield f"\n⚠️ Svaret från {winner.provider.name} avbröts (ingen data)."
+    except Exception as e:
+        breaker.record_failure()
+        yield f"\n⚠️ Svaret från {winner.provider.name} avbröts: {e}"
+    finally:
+        try:
+            await winner.gen.aclose()
+        except Exception:
+            pass
@@ -0,0 +1,227 @@
+import asyncio
+import itertools
+import json
+from config.settings import get_config
+
+# websockets är valfritt: utan paketet används REST-anropen i ha_core
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+"""
+==============================================================================
+FILE: app/services/ha_client.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Långlivad WebSocket-anslutning till Home Assistant. Prenumererar
+             på state_changed och håller en spegel av alla entiteters status
+             i minnet, så att läsningar blir lokala uppslag. Tjänsteanrop
+             (call_service) skickas över samma anslutning.
+==============================================================================
+"""
+
+cfg = get_config()
+
+
+class HAError(Exception):
+    """Fel från Home Assistant (svar med success=false eller tappad anslutning)."""
+
+
+class HomeAssistantClient:
+    """Spegel av Home Assistants tillstånd via WebSocket-API:t."""
+
+    def __init__(self, base_url, token, reconnect_max=None, call_timeout=None):
+        self.base_url = (base_url or "").rstrip("/")
+        self.token = token
+        self.reconnect_max = reconnect_max if reconnect_max is not None else cfg["HA_WS_RECONNECT_MAX"]
+        self.call_timeout = call_timeout if call_timeout is not None else cfg["HA_WS_CALL_TIMEOUT"]
+        self.states = {}
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        # Väntande bekräftelser: (entity_id, förväntade tillstånd, future)
+        self._waiters = []
+        self._ready = asyncio.Event()
+        self._loop = None
+        self._task = None
+
+    @property
+    def enabled(self):
+        return bool(self.base_url and self.token)
+
+    @property
+    def ws_url(self):
+        url = self.base_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        return f"{url}/api/websocket"
+
+    @property
+    def ready(self):
+        """Sant när spegeln är laddad och anslutningen är uppe."""
+        return self._ready.is_set()
+
+    # --- ANSLUTNING ---
+
+    async def _authenticate(self, ws):
+        msg = json.loads(await ws.recv())
+        if msg.get("type") == "auth_required":
+            await ws.send(json.dumps({"type": "auth", "access_token": self.token}))
+            msg = json.loads(await ws.recv())
+        if msg.get("type") != "auth_ok":
+            raise HAError(f"autentisering misslyckades: {msg.get('message', msg.get('type'))}")
+
+    async def _connect_once(self):
+        async with websockets.connect(self.ws_url, max_size=None, ping_interval=30) as ws:
+            await self._authenticate(ws)
+            self._ws = ws
+            reader = asyncio.create_task(self._read_loop(ws))
+            try:
+                # Prenumerera först så att inga ändringar mellan get_states och
+                # prenumerationen går förlorade
+                await self._command({"type": "subscribe_events", "event_type": "state_changed"})
+                states = await self._command({"type": "get_states"})
+                self.states = {s["entity_id"]: s for s in states}
+                self._ready.set()
+                print(f">> [HA] ✅ WebSocket ansluten, {len(self.states)} entiteter speglade.")
+                await reader
+            finally:
+                self._ready.clear()
+                self._ws = None
+                reader.cancel()
+                self._fail_pending(HAError("anslutningen till Home Assistant bröts"))
+
+    async def _read_loop(self, ws):
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get("type") == "event":
+                data = msg.get("event", {}).get("data", {})
+                entity_id = data.get("entity_id")
+                if entity_id:
+                    new_state = data.get("new_state")
+                    if new_state is None:
+                        self.states.pop(entity_id, None)
+                    else:
+                        self.states[entity_id] = new_state
+                        self._notify(entity_id, new_state.get("state"))
+            elif msg.get("type") == "result":
+                future = self._pending.pop(msg.get("id"), None)
+                if future and not future.done():
+                    if msg.get("success"):
+                        future.set_result(msg.get("result"))
+                    else:
+                        error = msg.get("error") or {}
+                        future.set_exception(HAError(error.get("message", "okänt fel")))
+
+    def _fail_pending(self, error):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    def _notify(self, entity_id, state):
+        for waiter in list(self._waiters):
+            waiter_entity, expected, future = waiter
+            if waiter_entity == entity_id and state in expected and not future.done():
+                future.set_result(True)
+
+    async def run(self):
+        """Håller anslutningen uppe med exponentiell backoff vid fel."""
+        if websockets is None:
+            print(">> [HA] ⚠️ Paketet websockets saknas, använder REST mot Home Assistant.")
+            return
+        delay = 1
+        while True:
+            try:
+                await self._connect_once()
+                delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f">> [HA] WebSocket nere ({e}), nytt försök om {delay}s.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max)
+
+    def start(self):
+        # Loopen sparas även utan WebSocket, verktygen i trådpoolen kör sina anrop här
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._ws is not None:
+            # Stäng snyggt så att HA inte loggar en avbruten anslutning
+            try:
+                await self._ws.close()
+            except Exception:
+                pass
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    # --- KOMMANDON ---
+
+    async def _command(self, payload):
+        ws = self._ws
+        if ws is None:
+            raise HAError("ingen anslutning till Home Assistant")
+        msg_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = future
+        await ws.send(json.dumps({"id": msg_id, **payload}))
+        try:
+            return await asyncio.wait_for(future, timeout=self.call_timeout)
+        finally:
+            self._pending.pop(msg_id, None)
+
+    async def call_service(self, domain, service, entity_id=None, service_data=None, target=None):
+        """'entity_id' kan vara en lista; 'target' kan även ange area_id/device_id."""
+        payload = {"type": "call_service", "domain": domain, "service": service}
+        if service_data:
+            payload["service_data"] = service_data
+        if entity_id:
+            target = dict(target or {}, entity_id=entity_id)
+        if target:
+            payload["target"] = target
+        return await self._command(payload)
+
+    def get_state(self, entity_id):
+        """Senaste kända status ur spegeln (None om entiteten saknas)."""
+        return self.states.get(entity_id)
+
+    async def wait_for_state(self, entity_id, expected, timeout):
+        """Väntar tills entiteten når något av tillstånden i 'expected'. Returnerar True/False."""
+        current = self.states.get(entity_id)
+        if current and current.get("state") in expected:
+            return True
+        future = asyncio.get_running_loop().create_future()
+        waiter = (entity_id, expected, future)
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.remove(waiter)
+
+    # --- FRÅN TRÅDAR ---
+    # Verktygen i app/tools körs i trådpoolen (t.ex. Geminis automatiska
+    # funktionsanrop) och når anslutningen via händelseloopen.
+
+    def run_threadsafe(self, coro, timeout=None):
+        """Kör en korutin på appens händelseloop från en annan tråd och väntar på svaret."""
+        if self._loop is None:
+            coro.close()
+            raise HAError("Home Assistant-klienten är inte startad")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout=timeout or self.call_timeout + 1)
+
+    def call_service_threadsafe(self, domain, service, entity_id=None, service_data=None):
+        if not self.ready:
+            raise HAError("ingen anslutning till Home Assistant")
+        return self.run_threadsafe(self.call_service(domain, service, entity_id, service_data))
+
+
+ha_client = HomeAssistantClient(cfg.get("HA_BASE_URL"), cfg.get("HA_TOKEN"))
@@ -1,21 +1,12 @@
 import google.generativeai as genai
-import httpx
 import json
-import asyncio
-from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
 from config.settings import get_config
 
-# Importera alla verktyg centralt från app.tools
-from app.tools import (
-    get_calendar_events, 
-    get_sensor_data, 
-    control_vacuum, 
-    get_ha_state, 
-    control_light,
-    get_weather
-)
-from app.core.prompts import get_system_prompt
+from app.core.prompts import get_system_prompt, SystemPrompt
+from app.core.context import build_context, estimate_tokens
+from app.services.clients import registry, run_blocking
+# Verktygen (app/tools) med färdiga scheman per leverantör
+from app.services.tool_runner import tools, parse_arguments
 
 cfg = get_config()
 
@@ -23,97 +14,275 @@ cfg = get_config()
 if cfg.get("GOOGLE_API_KEY"):
     genai.configure(api_key=cfg["GOOGLE_API_KEY"])
 
-# Samla verktyg för AI-modeller
-daa_tools = [
-    get_calendar_events, 
-    get_sensor_data, 
-    control_vacuum, 
-    get_ha_state, 
-    control_light,
-    get_weather
-]
+# Modeller som avvisat verktyg (t.ex. vissa Ollama-modeller) får svara utan dem
+_no_tool_models = set()
+
+
+def _rejects_tools(error):
+    text = str(error).lower()
+    return "tool" in text and ("support" in text or getattr(error, "status_code", None) == 400)
+
+
+def split_prompt(system_prompt):
+    """
+    (statisk, föränderlig) del av prompten. Den statiska delen skickas först och
+    oförändrad mellan anropen så att leverantörernas prompt-cache träffar.
+    Vanlig text utan uppdelning skickas som den är.
+    """
+    if isinstance(system_prompt, SystemPrompt):
+        return system_prompt.static, system_prompt.dynamic
+    return system_prompt, ""
+
+
+class ProviderError(Exception):
+    """Fel från en AI-leverantör (används när strict=True)."""
+
+
+def fit_history(model_id, history, system_prompt, new_message):
+    """Trimmar historiken till modellens token-budget."""
+    reserved = estimate_tokens(system_prompt) + estimate_tokens(new_message)
+    return build_context(history, model_id, reserved_tokens=reserved)
 
 # --- 1. GOOGLE GEMINI ---
-async def stream_gemini(model_id, history, new_message, image_data=None):
+# strict=True: fel kastas som undantag i stället för att skickas som text,
+# så att failover-lagret (app/services/failover.py) kan byta leverantör.
+#
+# Verktygsanrop: alla leverantörer kör samma loop. Modellen svarar med text
+# och/eller verktygsanrop; anropen körs via tool_runner (parallellt där det går)
+# och resultaten skickas tillbaka, högst TOOL_MAX_ROUNDS gånger. En tom bit ("")
+# skickas innan verktygen körs så att failover-lagret ser att leverantören svarat
+# och inte startar en till (som annars skulle utföra samma åtgärder igen).
+
+def _gemini_args(call):
+    # proto-plus -> vanliga Python-värden (listor, nästlade objekt)
+    return type(call).to_dict(call).get("args", {})
+
+async def stream_gemini(model_id, history, new_message, image_data=None, system_prompt=None, strict=False):
     try:
+        system_prompt = system_prompt or get_system_prompt()
+        static, dynamic = split_prompt(system_prompt)
+        # Statisk systeminstruktion: Geminis implicita cache träffar när början på
+        # förfrågan (verktyg + instruktion) är densamma. Explicit context caching
+        # (CachedContent) används inte; den statiska prompten är långt under
+        # minimistorleken för en cache.
         model = genai.GenerativeModel(
-            model_name=model_id, 
-            tools=daa_tools, 
-            system_instruction=get_system_prompt()
+            model_name=model_id,
+            tools=tools.gemini,
+            system_instruction=static
         )
+        history = fit_history(model_id, history, system_prompt, new_message)
         chat_history = []
         for msg in history:
             role = "user" if msg["role"] == "user" else "model"
             chat_history.append({"role": role, "parts": [msg["content"]]})
 
-        chat = model.start_chat(history=chat_history, enable_automatic_function_calling=True)
-        parts = [new_message]
+        chat = model.start_chat(history=chat_history)
+        content = [new_message]
+        if dynamic:
+            # Föränderlig kontext (tid, sensordata) följer med meddelandet, efter den cachade delen
+            content.insert(0, f"{dynamic}\n\n")
         if image_data:
-            parts.append({"mime_type": "image/jpeg", "data": image_data})
+            content.append({"mime_type": "image/jpeg", "data": image_data})
 
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, lambda: chat.send_message(parts))
-        if response.text:
-            yield response.text
+        for round_no in range(cfg["TOOL_MAX_ROUNDS"] + 1):
+            kwargs = {}
+            if round_no == cfg["TOOL_MAX_ROUNDS"]:
+                # Sista varvet: tvinga fram ett textsvar
+                kwargs["tool_config"] = {"function_calling_config": {"mode": "NONE"}}
+            response = await run_blocking(chat.send_message, content, **kwargs)
+            parts = response.candidates[0].content.parts if response.candidates else []
+            text = "".join(p.text for p in parts if p.text)
+            if text:
+                yield text
+            calls = [p.function_call for p in parts if p.function_call.name]
+            if not calls:
+                return
+            yield ""
+            results = await tools.run_calls([(c.name, _gemini_args(c)) for c in calls])
+            content = [
+                genai.protos.Part(function_response=genai.protos.FunctionResponse(name=c.name, response={"result": r}))
+                for c, r in zip(calls, results)
+            ]
     except Exception as e:
+        if strict:
+            raise
         yield f"⚠️ Gemini Error: {str(e)}"
 
 # --- 2. OPENAI KOMPATIBEL (OpenAI, Groq, DeepSeek) ---
-async def stream_openai_compatible(api_key, base_url, model_id, history, new_message):
+async def stream_openai_compatible(api_key, base_url, model_id, history, new_message, system_prompt=None, strict=False):
     try:
-        client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-        messages = [{"role": "system", "content": get_system_prompt()}]
+        client = registry.openai(api_key, base_url)
+        system_prompt = system_prompt or get_system_prompt()
+        history = fit_history(model_id, history, system_prompt, new_message)
+        # Automatisk prefix-cache (OpenAI, DeepSeek): statisk prompt och historik
+        # först, den föränderliga delen precis före det nya meddelandet
+        static, dynamic = split_prompt(system_prompt)
+        messages = [{"role": "system", "content": static}]
         for msg in history:
             messages.append({"role": msg["role"], "content": msg["content"]})
+        if dynamic:
+            messages.append({"role": "system", "content": dynamic})
         messages.append({"role": "user", "content": new_message})
 
-        stream = await client.chat.completions.create(
-            model=model_id,
-            messages=messages,
-            stream=True
-        )
-        async for chunk in stream:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        round_no = 0
+        while True:
+            kwargs = {}
+            if model_id not in _no_tool_models:
+                kwargs["tools"] = tools.openai
+                if round_no >= cfg["TOOL_MAX_ROUNDS"]:
+                    kwargs["tool_choice"] = "none"
+            try:
+                stream = await client.chat.completions.create(
+                    model=model_id,
+                    messages=messages,
+                    stream=True,
+                    **kwargs
+                )
+            except Exception as e:
+                if "tools" in kwargs and _rejects_tools(e):
+                    _no_tool_models.add(model_id)
+                    continue
+                raise
+
+            text, calls = [], {}
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    text.append(delta.content)
+                    yield delta.content
+                # Verktygsanropen strömmas i bitar, samlas per index
+                for tc in delta.tool_calls or []:
+                    call = calls.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                    call["id"] = tc.id or call["id"]
+                    if tc.function:
+                        call["name"] += tc.function.name or ""
+                        call["arguments"] += tc.function.arguments or ""
+            if not calls:
+                return
+
+            yield ""
+            calls = [calls[i] for i in sorted(calls)]
+            messages.append({
+                "role": "assistant",
+                "content": "".join(text) or None,
+                "tool_calls": [
+                    {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"] or "{}"}}
+                    for c in calls
+                ]
+            })
+            results = await tools.run_calls([(c["name"], parse_arguments(c["arguments"])) for c in calls])
+            for c, result in zip(calls, results):
+                messages.append({"role": "tool", "tool_call_id": c["id"], "content": result})
+            round_no += 1
     except Exception as e:
+        if strict:
+            raise
         yield f"⚠️ Provider Error ({model_id}): {str(e)}"
 
 # --- 3. ANTHROPIC ---
-async def stream_anthropic(api_key, model_id, history, new_message):
+def _anthropic_block(block):
+    if block.type == "tool_use":
+        return {"type": "tool_use", "id": block.id, "name": block.name, "input": block.input}
+    return {"type": "text", "text": getattr(block, "text", "")}
+
+async def stream_anthropic(api_key, model_id, history, new_message, system_prompt=None, strict=False):
     try:
-        client = AsyncAnthropic(api_key=api_key)
+        client = registry.anthropic(api_key)
+        system_prompt = system_prompt or get_system_prompt()
+        history = fit_history(model_id, history, system_prompt, new_message)
         messages = []
         for msg in history:
             role = "user" if msg["role"] == "user" else "assistant"
             messages.append({"role": role, "content": msg["content"]})
         messages.append({"role": "user", "content": new_message})
 
-        async with client.messages.stream(
-            max_tokens=2048,
-            system=get_system_prompt(),
-            messages=messages,
-            model=model_id,
-        ) as stream:
-            async for text in stream.text_stream:
-                yield text
+        # cache_control på den statiska delen: verktyg + statisk prompt cachas hos Anthropic
+        static, dynamic = split_prompt(system_prompt)
+        system = [{"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}]
+        if dynamic:
+            system.append({"type": "text", "text": dynamic})
+
+        for round_no in range(cfg["TOOL_MAX_ROUNDS"] + 1):
+            kwargs = {"tools": tools.anthropic}
+            if round_no == cfg["TOOL_MAX_ROUNDS"]:
+                kwargs["tool_choice"] = {"type": "none"}
+            async with client.messages.stream(
+                max_tokens=2048,
+                system=system,
+                messages=messages,
+                model=model_id,
+                **kwargs
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                final = await stream.get_final_message()
+
+            calls = [b for b in final.content if b.type == "tool_use"]
+            if not calls:
+                return
+            yield ""
+            messages.append({"role": "assistant", "content": [_anthropic_block(b) for b in final.content]})
+            results = await tools.run_calls([(b.name, b.input) for b in calls])
+            messages.append({"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": b.id, "content": result}
+                for b, result in zip(calls, results)
+            ]})
     except Exception as e:
+        if strict:
+            raise
         yield f"⚠️ Claude Error: {str(e)}"
 
 # --- 4. OLLAMA ---
-async def stream_ollama(model_id, history, new_message):
+async def stream_ollama(model_id, history, new_message, system_prompt=None, strict=False):
     url = f"{cfg['OLLAMA_URL']}/api/chat"
-    messages = [{"role": "system", "content": get_system_prompt()}]
+    # Statisk del först (SystemPrompt), så att Ollama kan återanvända KV-cachen för början
+    system_prompt = system_prompt or get_system_prompt()
+    history = fit_history(model_id, history, system_prompt, new_message)
+    messages = [{"role": "system", "content": system_prompt}]
     for msg in history:
         messages.append({"role": msg["role"], "content": msg["content"]})
     messages.append({"role": "user", "content": new_message})
     
-    async with httpx.AsyncClient() as client:
-        try:
-            async with client.stream("POST", url, json={"model": model_id, "messages": messages}, timeout=60.0) as resp:
+    client = registry.http(cfg['OLLAMA_URL'])
+    try:
+        round_no = 0
+        while True:
+            payload = {"model": model_id, "messages": messages, "stream": True}
+            # Ollama saknar tool_choice; sista varvet skickas utan verktyg
+            use_tools = model_id not in _no_tool_models and round_no < cfg["TOOL_MAX_ROUNDS"]
+            if use_tools:
+                payload["tools"] = tools.openai
+
+            text, calls = [], []
+            async with client.stream("POST", url, json=payload, timeout=60.0) as resp:
+                if resp.status_code != 200:
+                    body = (await resp.aread()).decode('utf-8', 'replace')
+                    if use_tools and _rejects_tools(body):
+                        _no_tool_models.add(model_id)
+                        continue
+                    raise ProviderError(body)
                 async for line in resp.aiter_lines():
                     if line:
                         data = json.loads(line)
-                        if "message" in data:
-                            yield data["message"].get("content", "")
-        except Exception as e:
-            yield f"⚠️ Ollama Error: {e}"
\ No newline at end of file
+                        message = data.get("message") or {}
+                        if message.get("content"):
+                            text.append(message["content"])
+                            yield message["content"]
+                        calls.extend(message.get("tool_calls") or [])
+            if not calls:
+                return
+
+            yield ""
+            messages.append({"role": "assistant", "content": "".join(text), "tool_calls": calls})
+            results = await tools.run_calls([
+                (c["function"]["name"], parse_arguments(c["function"].get("arguments"))) for c in calls
+            ])
+            for c, result in zip(calls, results):
+                messages.append({"role": "tool", "content": result, "tool_name": c["function"]["name"]})
+            round_no += 1
+    except Exception as e:
+        if strict:
+            raise
+        yield f"⚠️ Ollama Error: {e}"
\ No newline at end of file
@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import json
+import time
+from config.settings import get_config
+from app.services.providers import available_providers
+
+"""
+==============================================================================
+FILE: app/services/model_catalog.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Cachad modellista. Leverantörerna frågas parallellt med egna
+             timeouts, resultatet cachas med TTL och förnyas i bakgrunden
+             (stale-while-revalidate). En ETag gör villkorliga GET möjliga.
+==============================================================================
+"""
+
+cfg = get_config()
+
+
+class ModelCatalog:
+    """Håller senaste modellistan per leverantör och förnyar den vid behov."""
+
+    def __init__(self, ttl=None, timeout=None):
+        self.ttl = ttl if ttl is not None else cfg["MODELS_CACHE_TTL"]
+        self.timeout = timeout if timeout is not None else cfg["MODELS_PROVIDER_TIMEOUT"]
+        self._by_provider = {}
+        self.models = []
+        # Modell-ID -> leverantörsnamn, används av routern för O(1)-uppslag
+        self.index = {}
+        self.etag = None
+        self.fetched_at = 0.0
+        self._refresh_task = None
+
+    def providers(self):
+        """Vilka leverantörer som är konfigurerade (namn -> hämtfunktion)."""
+        return {p.name: p.list_models for p in available_providers()}
+
+    async def _fetch_one(self, name, fetcher):
+        try:
+            return name, await asyncio.wait_for(fetcher(), timeout=self.timeout)
+        except Exception as e:
+            print(f">> [Modeller] {name} svarade inte ({type(e).__name__}), behåller tidigare lista.")
+            return name, None
+
+    async def refresh(self):
+        """Frågar alla leverantörer parallellt. En leverantör som fallerar behåller sin gamla lista."""
+        results = await asyncio.gather(*(
+            self._fetch_one(name, fetcher) for name, fetcher in self.providers().items()
+        ))
+        for name, models in results:
+            if models is not None:
+                self._by_provider[name] = models
+
+        # Samma modell-ID hos flera leverantörer: första leverantören vinner
+        merged = []
+        seen = set()
+        for name in self.providers():
+            for model in self._by_provider.get(name, []):
+                if model["id"] not in seen:
+                    seen.add(model["id"])
+                    merged.append(model)
+
+        self.models = merged
+        self.index = {model["id"]: model["provider"] for model in merged}
+        body = json.dumps(merged, sort_keys=True).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.fetched_at = time.time()
+        return self.models
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def get(self):
+        """Returnerar (modeller, etag). Gammal data serveras direkt medan ny hämtas."""
+        if not self.fetched_at:
+            # Kallstart: ingen data alls, vänta på (en gemensam) hämtning
+            self._refresh_in_background()
+            await asyncio.shield(self._refresh_task)
+        elif time.time() - self.fetched_at > self.ttl:
+            self._refresh_in_background()
+        return self.models, self.etag
+
+
+catalog = ModelCatalog()
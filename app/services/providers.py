@@ -0,0 +1,155 @@
+from abc import ABC, abstractmethod
+import google.generativeai as genai
+from config.settings import get_config
+from app.services.clients import registry, run_blocking
+from app.services.llm_handler import (
+    stream_gemini,
+    stream_openai_compatible,
+    stream_anthropic,
+    stream_ollama
+)
+
+"""
+==============================================================================
+FILE: app/services/providers.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Adaptrar per AI-leverantör med ett gemensamt gränssnitt:
+             list_models() för modellistan och stream() för svaret.
+==============================================================================
+"""
+
+cfg = get_config()
+
+
+class Provider(ABC):
+    """
+    Basklass. 'name' används som nyckel i routern och i modellistan.
+    En adapter utan stream() kan inte instansieras.
+    """
+    name = ""
+    label = ""
+
+    def available(self):
+        return True
+
+    async def list_models(self):
+        return []
+
+    @abstractmethod
+    def stream(self, model_id, history, new_message, system_prompt=None, strict=False):
+        """Async-generator med svarets text i bitar."""
+
+    def _entry(self, model_id, display_name=None):
+        return {
+            "id": model_id,
+            "name": f"{self.label}: {display_name or model_id}",
+            "provider": self.name
+        }
+
+
+class GeminiProvider(Provider):
+    name = "google"
+    label = "Google"
+
+    def available(self):
+        return bool(cfg.get("GOOGLE_API_KEY"))
+
+    def _list_blocking(self):
+        # Google SDK saknar async-variant, körs i trådpoolen
+        models = []
+        for m in genai.list_models():
+            if 'generateContent' in m.supported_generation_methods:
+                clean_id = m.name.replace("models/", "")
+                models.append(self._entry(clean_id, getattr(m, "display_name", clean_id)))
+        return models
+
+    async def list_models(self):
+        return await run_blocking(self._list_blocking)
+
+    def stream(self, model_id, history, new_message, system_prompt=None, strict=False):
+        return stream_gemini(model_id, history, new_message, system_prompt=system_prompt, strict=strict)
+
+
+class OpenAICompatibleProvider(Provider):
+    """OpenAI, Groq och DeepSeek delar API och därmed adapter."""
+
+    def __init__(self, name, label, api_key_name, base_url=None, prefixes=None):
+        self.name = name
+        self.label = label
+        self.api_key_name = api_key_name
+        self.base_url = base_url
+        self.prefixes = prefixes
+
+    @property
+    def api_key(self):
+        return cfg.get(self.api_key_name)
+
+    def available(self):
+        return bool(self.api_key)
+
+    async def list_models(self):
+        page = await registry.openai(self.api_key, self.base_url).models.list()
+        data = sorted(page.data, key=lambda m: getattr(m, "created", 0) or 0, reverse=True)
+        return [
+            self._entry(m.id) for m in data
+            if not self.prefixes or m.id.startswith(self.prefixes)
+        ]
+
+    def stream(self, model_id, history, new_message, system_prompt=None, strict=False):
+        return stream_openai_compatible(
+            self.api_key, self.base_url, model_id, history, new_message,
+            system_prompt=system_prompt, strict=strict
+        )
+
+
+class AnthropicProvider(Provider):
+    name = "anthropic"
+    label = "Anthropic"
+
+    def available(self):
+        return bool(cfg.get("ANTHROPIC_API_KEY"))
+
+    async def list_models(self):
+        headers = {"x-api-key": cfg["ANTHROPIC_API_KEY"], "anthropic-version": "2023-06-01"}
+        r = await registry.http().get("https://api.anthropic.com/v1/models", headers=headers)
+        r.raise_for_status()
+        return [
+            self._entry(m["id"], m.get("display_name"))
+            for m in r.json().get("data", [])
+        ]
+
+    def stream(self, model_id, history, new_message, system_prompt=None, strict=False):
+        return stream_anthropic(
+            cfg["ANTHROPIC_API_KEY"], model_id, history, new_message,
+            system_prompt=system_prompt, strict=strict
+        )
+
+
+class OllamaProvider(Provider):
+    name = "ollama"
+    label = "Ollama"
+
+    async def list_models(self):
+        r = await registry.http(cfg["OLLAMA_URL"]).get(f"{cfg['OLLAMA_URL']}/api/tags")
+        r.raise_for_status()
+        return [self._entry(m["name"]) for m in r.json().get("models", [])]
+
+    def stream(self, model_id, history, new_message, system_prompt=None, strict=False):
+        return stream_ollama(model_id, history, new_message, system_prompt=system_prompt, strict=strict)
+
+
+# Ordningen avgör vilken leverantör som vinner om samma modell-ID finns hos flera
+PROVIDERS = [
+    GeminiProvider(),
+    OpenAICompatibleProvider("openai", "OpenAI", "OPENAI_API_KEY", prefixes=("gpt", "o1")),
+    AnthropicProvider(),
+    OpenAICompatibleProvider("groq", "Groq", "GROQ_API_KEY", base_url=cfg["GROQ_BASE_URL"]),
+    OpenAICompatibleProvider("deepseek", "DeepSeek", "DEEPSEEK_API_KEY", base_url=cfg["DEEPSEEK_BASE_URL"]),
+    OllamaProvider(),
+]
+
+PROVIDERS_BY_NAME = {p.name: p for p in PROVIDERS}
+
+
+def available_providers():
+    return [p for p in PROVIDERS if p.available()]
@@ -0,0 +1,48 @@
+from config.settings import get_config
+from app.services.providers import PROVIDERS_BY_NAME
+from app.services.model_catalog import catalog
+
+"""
+==============================================================================
+FILE: app/services/router.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Väljer leverantör för ett modell-ID. I första hand via modellistans
+             index (O(1)), annars via alias, "leverantör:modell" eller enkla
+             namnregler medan listan ännu inte hämtats.
+==============================================================================
+"""
+
+cfg = get_config()
+
+# Reserv när modellen inte finns i listan (t.ex. direkt efter uppstart)
+FALLBACK_RULES = (
+    ("gemini", "google"),
+    ("gpt", "openai"),
+    ("o1", "openai"),
+    ("claude", "anthropic"),
+    ("deepseek", "deepseek"),
+)
+DEFAULT_PROVIDER = "ollama"
+
+
+def resolve(model_id):
+    """Returnerar (leverantör, modell-ID hos leverantören)."""
+    model_id = cfg["MODEL_ALIASES"].get(model_id, model_id)
+
+    # 1. Explicit leverantör: "groq:llama-3.1-8b-instant"
+    prefix, sep, rest = model_id.partition(":")
+    if sep and prefix in PROVIDERS_BY_NAME:
+        return PROVIDERS_BY_NAME[prefix], rest
+
+    # 2. Modellistan
+    name = catalog.index.get(model_id)
+    if name:
+        return PROVIDERS_BY_NAME[name], model_id
+
+    # 3. Namnregler
+    lower = model_id.lower()
+    for needle, name in FALLBACK_RULES:
+        if needle in lower:
+            return PROVIDERS_BY_NAME[name], model_id
+
+    return PROVIDERS_BY_NAME[DEFAULT_PROVIDER], model_id
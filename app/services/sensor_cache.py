@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from config.settings import get_config
+
+"""
+==============================================================================
+FILE: app/services/sensor_cache.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: En långlivad MQTT-klient prenumererar på zigbee2mqtt/# och
+             håller senaste värdena per enhet i minnet (med tidsstämpel).
+             Sensorläsningar blir lokala uppslag och fungerar även för
+             enheter som inte skickar retained-meddelanden.
+==============================================================================
+"""
+
+cfg = get_config()
+
+# Ämnen under basen som inte är enhetsdata
+_SKIP_SUFFIXES = ("/set", "/get")
+
+
+class SensorCache:
+    """Senaste payload per Zigbee-enhet, matad av paho-mqtts nätverkstråd."""
+
+    def __init__(self, broker, port, topic_base):
+        self.broker = broker
+        self.port = port
+        self.topic_base = topic_base.rstrip("/")
+        self.devices = {}
+        self.availability = {}
+        self.connected = False
+        # Anropas med (friendly_name, data, tidsstämpel) för varje nytt värde
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._client = None
+
+    @property
+    def enabled(self):
+        return bool(self.broker)
+
+    # --- MQTT-CALLBACKS (körs i paho-tråden) ---
+
+    def _on_connect(self, client, userdata, flags, reason_code, *args):
+        if getattr(reason_code, "is_failure", reason_code != 0):
+            print(f">> [Z2M] ❌ Anslutning nekad av broker: {reason_code}")
+            return
+        self.connected = True
+        # Prenumerera i on_connect så att prenumerationen återställs efter återanslutning
+        client.subscribe(f"{self.topic_base}/#")
+        print(f">> [Z2M] ✅ Prenumererar på {self.topic_base}/#")
+
+    def _on_disconnect(self, client, userdata, *args):
+        self.connected = False
+
+    def _on_message(self, client, userdata, msg):
+        topic = msg.topic
+        if not topic.startswith(self.topic_base + "/"):
+            return
+        name = topic[len(self.topic_base) + 1:]
+        if name.startswith("bridge/") or name.endswith(_SKIP_SUFFIXES):
+            return
+
+        if name.endswith("/availability"):
+            payload = msg.payload.decode("utf-8", "replace")
+            try:
+                payload = json.loads(payload).get("state", payload)
+            except (ValueError, AttributeError):
+                pass
+            self.availability[name[:-len("/availability")]] = payload
+            return
+
+        try:
+            data = json.loads(msg.payload.decode("utf-8"))
+        except ValueError:
+            return
+        if not isinstance(data, dict):
+            return
+
+        now = time.time()
+        with self._lock:
+            self.devices[name] = (data, now)
+        for listener in self.listeners:
+            try:
+                listener(name, data, now)
+            except Exception as e:
+                print(f">> [Z2M] Lyssnare misslyckades: {e}")
+
+    # --- LIVSCYKEL ---
+
+    def start(self):
+        """Ansluter i bakgrunden. paho sköter återanslutning i sin egen tråd."""
+        import paho.mqtt.client as mqtt
+        try:
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="daa-sensor-cache")
+        except AttributeError:
+            # paho-mqtt 1.x
+            client = mqtt.Client(client_id="daa-sensor-cache")
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        client.reconnect_delay_set(min_delay=1, max_delay=60)
+        client.connect_async(self.broker, self.port, keepalive=60)
+        client.loop_start()
+        self._client = client
+
+    def stop(self):
+        if self._client is not None:
+            self._client.disconnect()
+            self._client.loop_stop()
+            self._client = None
+            self.connected = False
+
+    # --- LÄSNING ---
+
+    def get(self, friendly_name):
+        """Returnerar (data, ålder i sekunder) eller (None, None) om enheten inte hörts av."""
+        with self._lock:
+            entry = self.devices.get(friendly_name)
+        if entry is None:
+            return None, None
+        data, updated = entry
+        return data, time.time() - updated
+
+    def names(self):
+        with self._lock:
+            return sorted(self.devices)
+
+
+sensor_cache = SensorCache(cfg.get("MQTT_BROKER_IP"), cfg.get("MQTT_PORT", 1883), cfg.get("MQTT_TOPIC_BASE", "zigbee2mqtt"))
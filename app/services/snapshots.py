@@ -0,0 +1,154 @@
+import asyncio
+import time
+from config.settings import (
+    GARMIN_EMAIL,
+    GARMIN_PASSWORD,
+    STRAVA_CLIENT_ID,
+    STRAVA_REFRESH_TOKEN,
+    get_config
+)
+from app.services.clients import run_blocking
+
+"""
+==============================================================================
+FILE: app/services/snapshots.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Ögonblicksbilder av långsamma datakällor (t.ex. Garmin Connect)
+             som förnyas i bakgrunden. Chatten läser alltid direkt ur minnet
+             och får gammal data med en åldersangivelse i stället för att vänta.
+==============================================================================
+"""
+
+cfg = get_config()
+
+
+def format_age(seconds):
+    """Ålder i klartext för prompten, t.ex. 'för 2 timmar sedan'."""
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "nyss"
+    if minutes < 60:
+        return f"för {minutes} min sedan"
+    hours = minutes // 60
+    if hours < 48:
+        return f"för {hours} timmar sedan"
+    return f"för {hours // 24} dagar sedan"
+
+
+class Snapshot:
+    """Senaste värdet från en blockerande källa, förnyat med jämna mellanrum."""
+
+    def __init__(self, name, fetch, interval, enabled=True):
+        self.name = name
+        self.fetch = fetch
+        self.interval = interval
+        self.enabled = enabled
+        self.value = None
+        self.fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at if self.fetched_at else None
+
+    def is_stale(self):
+        return bool(self.fetched_at) and self.age > self.interval
+
+    def get(self):
+        """Returnerar (värde, ålder i sekunder) utan att blockera."""
+        return self.value, self.age
+
+    async def refresh(self):
+        """Hämtar nytt värde i trådpoolen. Misslyckas det behålls det gamla."""
+        if self._lock.locked():
+            return self.value
+        async with self._lock:
+            try:
+                value = await run_blocking(self.fetch)
+                if value:
+                    self.value = value
+                    self.fetched_at = time.time()
+            except Exception as e:
+                print(f">> [{self.name}] Bakgrundshämtning misslyckades: {e}")
+        return self.value
+
+    async def run(self):
+        """Bakgrundsloop: hämtar direkt vid start och sedan varje 'interval' sekunder."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        return asyncio.create_task(self.run())
+
+
+GARMIN_ENABLED = bool(GARMIN_EMAIL and GARMIN_PASSWORD)
+STRAVA_ENABLED = bool(STRAVA_CLIENT_ID and STRAVA_REFRESH_TOKEN)
+
+# --- DELADE VERKTYG ---
+_garmin_coach = None
+_strava_tool = None
+
+def get_garmin_coach():
+    # Inloggningen sker här (i bakgrundstråden) i stället för vid import av api.py.
+    # garminconnect importeras sent eftersom paketet är valfritt.
+    global _garmin_coach
+    if _garmin_coach is None and GARMIN_ENABLED:
+        from app.tools.garmin_core import GarminCoach
+        _garmin_coach = GarminCoach()
+    return _garmin_coach
+
+def get_strava_tool():
+    global _strava_tool
+    if _strava_tool is None and STRAVA_ENABLED:
+        from app.tools.strava_core import StravaTool
+        _strava_tool = StravaTool()
+    return _strava_tool
+
+
+# --- GARMIN ---
+def _fetch_garmin():
+    return get_garmin_coach().get_health_report()
+
+garmin_snapshot = Snapshot(
+    "Garmin", _fetch_garmin, cfg["GARMIN_REFRESH_INTERVAL"],
+    enabled=GARMIN_ENABLED
+)
+
+
+# --- TIDSSERIE & TRENDER ---
+def _sync_metrics():
+    # Synkar bara det som saknas lokalt och räknar sedan om trenderna.
+    from app.core import metrics_store
+    metrics_store.init_metrics()
+    days = cfg["METRICS_BACKFILL_DAYS"]
+    # Ett fel i en källa stoppar varken den andra eller trenderna ur lokal data.
+    if GARMIN_ENABLED:
+        try:
+            saved = metrics_store.sync_garmin(get_garmin_coach(), days)
+            print(f">> [Trender] Garmin: {saved} dagar uppdaterade.")
+        except Exception as e:
+            print(f">> [Trender] Garmin-synk misslyckades: {e}")
+    if STRAVA_ENABLED:
+        try:
+            saved = metrics_store.sync_strava(get_strava_tool(), days)
+            print(f">> [Trender] Strava: {saved} nya aktiviteter.")
+        except Exception as e:
+            print(f">> [Trender] Strava-synk misslyckades: {e}")
+    return metrics_store.get_trends(days)
+
+def get_recent_strava(limit=3):
+    """Inkrementell Strava-synk följd av läsning ur den lokala tabellen (blockerande)."""
+    from app.core import metrics_store
+    metrics_store.init_metrics()
+    try:
+        metrics_store.sync_strava(get_strava_tool(), cfg["METRICS_BACKFILL_DAYS"])
+    except Exception as e:
+        # Strava nere: svara med det som redan finns lokalt
+        print(f">> [Strava] Synk misslyckades: {e}")
+    return metrics_store.get_recent_activities(limit)
+
+metrics_snapshot = Snapshot(
+    "Trender", _sync_metrics, cfg["METRICS_SYNC_INTERVAL"],
+    enabled=GARMIN_ENABLED or STRAVA_ENABLED
+)
@@ -0,0 +1,148 @@
+import asyncio
+import inspect
+import json
+import typing
+from config.settings import get_config
+from app.services.clients import run_blocking
+from app.tools import daa_tools
+from app.tools.cache import get_cache_stats
+
+"""
+==============================================================================
+FILE: app/services/tool_runner.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Leverantörsoberoende verktygsanrop. Scheman byggs en gång från
+             funktionerna i app/tools (signatur + docstring) och översätts
+             till varje leverantörs format. Verktygsanrop från modellen körs
+             i modellens ordning; läsningar i följd körs parallellt, åtgärder
+             en i taget. Tidsgräns per verktyg. Läsningarna cachas av @cached i app/tools.
+==============================================================================
+"""
+
+cfg = get_config()
+
+# Python-typ -> JSON Schema
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object"}
+
+
+def _json_type(annotation, default):
+    if annotation is inspect.Parameter.empty:
+        annotation = type(default) if default not in (None, inspect.Parameter.empty) else str
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        # Optional[X] -> X
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        return _json_type(args[0], default) if args else {"type": "string"}
+    if annotation is list or origin is list:
+        args = typing.get_args(annotation)
+        return {"type": "array", "items": _json_type(args[0] if args else str, None)}
+    return {"type": _JSON_TYPES.get(annotation, "string")}
+
+
+def build_schema(func):
+    """JSON Schema för funktionens parametrar samt beskrivning ur docstringen."""
+    properties, required = {}, []
+    for name, param in inspect.signature(func).parameters.items():
+        properties[name] = _json_type(param.annotation, param.default)
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+    description = " ".join((inspect.getdoc(func) or func.__name__).split())
+    return {
+        "name": func.__name__,
+        "description": description,
+        "parameters": {"type": "object", "properties": properties, "required": required},
+    }
+
+
+class ToolRegistry:
+    """Verktygen med förberäknade scheman per leverantörsformat."""
+
+    def __init__(self, functions):
+        self.functions = {f.__name__: f for f in functions}
+        self.schemas = [build_schema(f) for f in functions]
+        # Färdiga listor så att inget byggs om per anrop
+        self.openai = [{"type": "function", "function": s} for s in self.schemas]
+        self.anthropic = [
+            {"name": s["name"], "description": s["description"], "input_schema": s["parameters"]}
+            for s in self.schemas
+        ]
+        # Gemini-SDK:n bygger sina deklarationer ur funktionerna själv
+        self.gemini = list(functions)
+        self.stats = {name: {"calls": 0, "timeouts": 0, "errors": 0} for name in self.functions}
+
+    def is_read(self, name):
+        # Läsningar är märkta med @cached (app/tools/cache.py)
+        return hasattr(self.functions.get(name), "cache")
+
+    @staticmethod
+    def timeout(name):
+        timeouts = cfg["TOOL_TIMEOUTS"]
+        return timeouts.get(name, timeouts.get("default", 10.0))
+
+    async def run(self, name, args):
+        """Kör ett verktyg. Returnerar alltid text (fel blir ett svar till modellen)."""
+        func = self.functions.get(name)
+        if func is None:
+            return f"Okänt verktyg: {name}"
+        stats = self.stats[name]
+        stats["calls"] += 1
+        args = args or {}
+
+        timeout = self.timeout(name)
+        try:
+            result = await asyncio.wait_for(run_blocking(func, **args), timeout=timeout)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            return f"Verktyget {name} svarade inte inom {timeout:g} sekunder."
+        except Exception as e:
+            stats["errors"] += 1
+            return f"Fel i verktyget {name}: {e}"
+
+        return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+
+    async def run_calls(self, calls):
+        """
+        Kör modellens verktygsanrop [(namn, argument), ...] och returnerar
+        resultaten i samma ordning. Anropen körs i modellens ordning: läsningar
+        i följd körs parallellt, och varje åtgärd väntar in läsningarna före sig
+        och måste bli klar innan något efter den startar.
+        """
+        results = [None] * len(calls)
+        reads = []
+
+        async def run_reads():
+            outputs = await asyncio.gather(*(self.run(*calls[i]) for i in reads))
+            for i, output in zip(reads, outputs):
+                results[i] = output
+            reads.clear()
+
+        for i, (name, args) in enumerate(calls):
+            if self.is_read(name):
+                reads.append(i)
+                continue
+            # Åtgärden är en spärr: en läsning efter den ska se dess effekt
+            await run_reads()
+            results[i] = await self.run(name, args)
+        await run_reads()
+        return results
+
+
+tools = ToolRegistry(daa_tools)
+
+
+def parse_arguments(raw):
+    """Argument från OpenAI-kompatibla API:er kommer som JSON-text."""
+    if isinstance(raw, dict):
+        return raw
+    try:
+        return json.loads(raw or "{}")
+    except ValueError:
+        return {}
+
+
+def get_tool_stats():
+    """Anrop, timeouts och fel per verktyg samt cachens träffar/missar."""
+    return {
+        "calls": {name: s for name, s in tools.stats.items() if s["calls"]},
+        "cache": get_cache_stats(),
+    }
@@ -0,0 +1,226 @@
+import asyncio
+import time
+import numpy as np
+from config.settings import get_config
+from app.services.clients import run_blocking
+from app.tools.weather_core import get_forecast, build_report
+
+"""
+==============================================================================
+FILE: app/services/weather_service.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Väder för flera namngivna platser (hemma, stugan, platser från
+             kalendern). Prognoserna förhämtas i bakgrunden så att verktygs-
+             anrop aldrig väntar på SMHI, och sol upp/ned räknas ut lokalt.
+             Resultaten finns som arrayer (timvärden) för t.ex. HA-automationer;
+             TTS-texten byggs från dem först när den efterfrågas.
+==============================================================================
+"""
+
+cfg = get_config()
+
+# Solens övre kant vid horisonten, inklusive ljusbrytning (grader)
+SUN_ALTITUDE = -0.833
+OBLIQUITY = 23.4397
+# Antal dagar som soltiderna räknas ut för (täcker SMHI:s tiodygnsprognos)
+SUN_DAYS = 11
+
+
+def sun_times(lat, lon, dates):
+    """
+    Soluppgång och solnedgång (unix-tid, UTC) för varje datum i 'dates'
+    (datetime64[D]) enligt soluppgångsekvationen; noggrannhet runt en minut.
+    NaN när solen inte går upp eller ner; 'daylight' är då 0 eller 24 timmar.
+    """
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    # Dagar sedan J2000 (2000-01-01 = dag 10957 räknat från 1970)
+    n = days - 10957
+    j_star = n - lon / 360.0
+    m = np.radians((357.5291 + 0.98560028 * j_star) % 360)
+    c = 1.9148 * np.sin(m) + 0.02 * np.sin(2 * m) + 0.0003 * np.sin(3 * m)
+    lam = np.radians((np.degrees(m) + c + 180 + 102.9372) % 360)
+    j_transit = 2451545.0 + j_star + 0.0053 * np.sin(m) - 0.0069 * np.sin(2 * lam)
+
+    sin_d = np.sin(lam) * np.sin(np.radians(OBLIQUITY))
+    cos_d = np.cos(np.arcsin(sin_d))
+    phi = np.radians(lat)
+    cos_w0 = (np.sin(np.radians(SUN_ALTITUDE)) - np.sin(phi) * sin_d) / (np.cos(phi) * cos_d)
+    w0 = np.degrees(np.arccos(np.clip(cos_w0, -1, 1)))
+
+    # Juliansk dag -> unix-tid
+    rise = (j_transit - w0 / 360 - 2440587.5) * 86400
+    set_ = (j_transit + w0 / 360 - 2440587.5) * 86400
+    polar = np.abs(cos_w0) > 1
+    rise[polar] = np.nan
+    set_[polar] = np.nan
+    return {"date": dates, "sunrise": rise, "sunset": set_, "daylight": w0 / 7.5}
+
+
+def _clock(ts):
+    return time.strftime("%H.%M", time.localtime(ts))
+
+
+def _rounded(values, digits=1):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+class LocationWeather:
+    """Förberäknat väder för en plats: prognosen (arrayer) och soltider."""
+
+    __slots__ = ("name", "lat", "lon", "forecast", "sun", "updated_at")
+
+    def __init__(self, name, lat, lon, forecast):
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.forecast = forecast
+        self.updated_at = time.time()
+        today = np.datetime64(time.strftime("%Y-%m-%d"), "D")
+        self.sun = sun_times(lat, lon, today + np.arange(SUN_DAYS))
+
+    def hourly(self, hours=48, now=None):
+        """
+        Timvärden från innevarande timme och 'hours' timmar framåt. SMHI ger
+        glesare steg längre fram; mätvärden interpoleras, vädersymbolen tas
+        från närmast föregående tidpunkt.
+        """
+        f = self.forecast
+        src = f.times.astype(np.int64)
+        start = (int(now or time.time()) // 3600) * 3600
+        grid = start + 3600 * np.arange(hours)
+        # Tom eller ofullständig prognos från SMHI: tom serie i stället för fel
+        grid = grid[grid <= src[-1]] if len(src) else grid[:0]
+
+        def interp(values):
+            ok = ~np.isnan(values)
+            if not ok.any():
+                return np.full(len(grid), np.nan)
+            return np.interp(grid, src[ok], values[ok])
+
+        prev = np.clip(np.searchsorted(src, grid, side="right") - 1, 0, len(src) - 1)
+        return {
+            "time": grid.tolist(),
+            "temp": _rounded(interp(f.temp)),
+            "wind": _rounded(interp(f.wind)),
+            "gust": _rounded(interp(f.gust)),
+            "precip": _rounded(interp(f.precip)),
+            "humidity": _rounded(interp(f.humidity), 0),
+            "cloud": _rounded(interp(f.cloud), 0),
+            "symbol": [None if np.isnan(v) else int(v) for v in f.symbol[prev]],
+        }
+
+    def daily(self):
+        """Lägsta/högsta temperatur per dygn (UTC) i prognosen."""
+        dates = self.forecast.times.astype("datetime64[D]")
+        if len(dates) == 0:
+            return {"date": [], "min": [], "max": []}
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        temp = np.where(np.isnan(self.forecast.temp), np.inf, self.forecast.temp)
+        low = np.minimum.reduceat(temp, starts)
+        temp = np.where(np.isnan(self.forecast.temp), -np.inf, self.forecast.temp)
+        high = np.maximum.reduceat(temp, starts)
+        return {
+            "date": [str(d) for d in dates[starts]],
+            "min": _rounded(np.where(np.isinf(low), np.nan, low)),
+            "max": _rounded(np.where(np.isinf(high), np.nan, high)),
+        }
+
+    def as_dict(self, hours=48):
+        """Strukturerat resultat (JSON-vänligt) för andra delsystem."""
+        sun = self.sun
+        return {
+            "name": self.name,
+            "lat": self.lat,
+            "lon": self.lon,
+            "approved_time": str(self.forecast.approved_time) + "Z",
+            "updated_at": self.updated_at,
+            "hourly": self.hourly(hours),
+            "daily": self.daily(),
+            "sun": {
+                "date": [str(d) for d in sun["date"]],
+                "sunrise": [None if np.isnan(t) else int(t) for t in sun["sunrise"]],
+                "sunset": [None if np.isnan(t) else int(t) for t in sun["sunset"]],
+                "daylight_hours": _rounded(sun["daylight"]),
+            },
+        }
+
+    def sun_sentence(self):
+        rise, set_ = self.sun["sunrise"][0], self.sun["sunset"][0]
+        if np.isnan(rise):
+            return "Solen går inte ner idag." if self.sun["daylight"][0] > 12 else "Solen går inte upp idag."
+        return f"Solen går upp klockan {_clock(rise)} och ner klockan {_clock(set_)}."
+
+    def render(self, now=None):
+        """TTS-text byggd från de förberäknade arrayerna."""
+        report = build_report(self.forecast, now=now)
+        return f"{report}\n{self.sun_sentence()}"
+
+
+class WeatherService:
+    """Förhämtar prognoser för alla kända platser och svarar ur minnet."""
+
+    def __init__(self, locations=None, interval=None):
+        locations = cfg["WEATHER_LOCATIONS"] if locations is None else locations
+        self.locations = {name.lower(): (float(lat), float(lon)) for name, (lat, lon) in locations.items()}
+        self.interval = interval or cfg["WEATHER_PREFETCH_INTERVAL"]
+        self.data = {}
+
+    @property
+    def default(self):
+        return next(iter(self.locations), None)
+
+    def add_location(self, name, lat, lon):
+        """Lägger till en plats (t.ex. från en kalenderhändelse); förhämtas från nästa varv."""
+        self.locations[name.lower()] = (float(lat), float(lon))
+
+    def refresh_location(self, name):
+        """Blockerande: hämtar (cachad) prognos och räknar om bara om den är ny."""
+        lat, lon = self.locations[name]
+        forecast = get_forecast(lat, lon)
+        if forecast is None:
+            return self.data.get(name)
+        current = self.data.get(name)
+        today = np.datetime64(time.strftime("%Y-%m-%d"), "D")
+        # Samma prognosobjekt som förra varvet och soltiderna gäller fortfarande idag
+        if current is not None and current.forecast is forecast and current.sun["date"][0] == today:
+            return current
+        current = LocationWeather(name, lat, lon, forecast)
+        self.data[name] = current
+        return current
+
+    async def refresh(self):
+        names = list(self.locations)
+        results = await asyncio.gather(
+            *(run_blocking(self.refresh_location, name) for name in names),
+            return_exceptions=True
+        )
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f">> [Väder] Förhämtning för {name} misslyckades: {result}")
+
+    async def run(self):
+        """Bakgrundsloop: hämtar direkt vid start och sedan varje 'interval' sekunder."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        return asyncio.create_task(self.run())
+
+    def get(self, name=None):
+        """Förberäknat väder för platsen utan att blockera (None om det inte hämtats än)."""
+        return self.data.get((name or self.default or "").lower())
+
+    def report(self, name=None):
+        """TTS-text för platsen. Hämtar synkront bara om förhämtningen inte hunnit köra."""
+        key = (name or self.default or "").lower()
+        if key not in self.locations:
+            known = ", ".join(self.locations) or "inga"
+            return f"Okänd plats '{name}'. Kända platser: {known}."
+        location = self.data.get(key) or self.refresh_location(key)
+        if location is None:
+            return "Kunde inte nå vädertjänsten just nu."
+        return location.render()
+
+
+weather_service = WeatherService()
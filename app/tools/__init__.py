@@ -1,5 +1,21 @@
 from .gcal_core import create_calendar_event, get_calendar_events
-from .z2m_core import get_sensor_data
-from .ha_core import control_vacuum, get_ha_state, control_light
+from .z2m_core import get_sensor_data, get_sensor_history
+from .ha_core import control_vacuum, get_ha_state, control_light, control_devices
 from .weather_core import get_weather
-from .withings_core import WithingsTool
+# Withings är valfritt (modulen skapas av setup_withings.py-flödet)
+try:
+    from .withings_core import WithingsTool
+except ImportError:
+    WithingsTool = None
+
+# Verktyg som AI-modellerna får anropa (scheman byggs en gång i app/services/tool_runner.py)
+daa_tools = [
+    get_calendar_events,
+    get_sensor_data,
+    get_sensor_history,
+    control_vacuum,
+    get_ha_state,
+    control_light,
+    control_devices,
+    get_weather
+]
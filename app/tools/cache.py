@@ -0,0 +1,177 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from config.settings import get_config
+
+"""
+==============================================================================
+FILE: app/tools/cache.py
+PROJECT: DAA Digital Advanced Assistant
+DESCRIPTION: Cache för verktygen i app/tools. @cached lägger en LRU-cache med
+             tidsgräns (TOOL_CACHE_TTL per verktyg) runt en läsning; samtidiga
+             identiska anrop delar på en körning. @invalidates på en åtgärd
+             rensar cachade läsningar för de entiteter den rör, t.ex. tänder
+             control_light bort get_ha_state för samma lampa.
+==============================================================================
+"""
+
+cfg = get_config()
+
+# Alla cachade verktyg, per namn
+_caches = {}
+
+
+class ToolCache:
+    """LRU-cache för ett verktyg. Trådsäker, verktygen körs i trådpoolen."""
+
+    def __init__(self, func, ttl=None, entity=None, maxsize=None):
+        self.func = func
+        self.name = func.__name__
+        self._ttl = ttl
+        self.entity = entity
+        self.maxsize = maxsize or cfg["TOOL_CACHE_SIZE"]
+        self.signature = inspect.signature(func)
+        # nyckel -> (värde, går ut, entitet)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def ttl(self):
+        # Läses vid varje anrop så att TOOL_CACHE_TTL kan ändras utan omstart
+        return self._ttl if self._ttl is not None else cfg["TOOL_CACHE_TTL"].get(self.name, 0)
+
+    def _key(self, args, kwargs):
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = json.dumps(bound.arguments, sort_keys=True, default=str)
+        return key, bound.arguments.get(self.entity) if self.entity else None
+
+    def call(self, *args, **kwargs):
+        ttl = self.ttl
+        if ttl <= 0:
+            return self.func(*args, **kwargs)
+        key, entity = self._key(args, kwargs)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                # Första anropet kör; identiska anrop under tiden väntar på samma resultat
+                future = Future()
+                self._inflight[key] = future
+                self.stats["misses"] += 1
+                generation = self._generation
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = self.func(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            # Rensades cachen medan vi hämtade kan värdet redan vara inaktuellt
+            if generation == self._generation:
+                self._entries[key] = (value, time.monotonic() + ttl, entity)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+        future.set_result(value)
+        return value
+
+    def invalidate(self, entities=None):
+        """Rensar poster för entiteterna (alla poster om entities är None)."""
+        with self._lock:
+            self._generation += 1
+            if entities is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [k for k, entry in self._entries.items() if entry[2] in entities]
+                for k in stale:
+                    del self._entries[k]
+                removed = len(stale)
+            self.stats["invalidations"] += removed
+
+
+def cached(ttl=None, entity=None, maxsize=None):
+    """
+    Cachar verktygets resultat. ttl i sekunder (standard: TOOL_CACHE_TTL[namn]),
+    entity: namnet på argumentet som anger entiteten, för @invalidates.
+    """
+    def decorator(func):
+        cache = ToolCache(func, ttl=ttl, entity=entity, maxsize=maxsize)
+        _caches[cache.name] = cache
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.call(*args, **kwargs)
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def invalidates(*params, tools=()):
+    """
+    Markerar en åtgärd. Efter anropet rensas cachade läsningar för entiteterna
+    i argumenten 'params' (sträng eller lista), samt hela cachen för 'tools'.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                bound = signature.bind(*args, **kwargs)
+                entities = set()
+                for param in params:
+                    value = bound.arguments.get(param)
+                    if isinstance(value, str):
+                        entities.add(value)
+                    elif value:
+                        entities.update(value)
+                invalidate(entities, tools)
+
+        wrapper.invalidates = (params, tools)
+        return wrapper
+    return decorator
+
+
+def invalidate(entities=(), tools=()):
+    """Rensar cachade värden för entiteterna i alla verktyg, och hela cachen för 'tools'."""
+    for name, cache in _caches.items():
+        if name in tools:
+            cache.invalidate()
+        elif entities and cache.entity:
+            cache.invalidate(entities)
+
+
+def get_cache_stats():
+    """Träffar/missar per cachat verktyg för övervakning."""
+    return {
+        name: dict(cache.stats, size=len(cache._entries), ttl=cache.ttl)
+        for name, cache in _caches.items()
+    }
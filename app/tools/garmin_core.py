@@ -45,36 +45,50 @@ class GarminCoach:
             print(f">> [Garmin] Inloggningsfel: {e}")
             self.client = None
 
-    def get_health_report(self):
+    def _ensure_client(self):
         if not self.client:
             self._login()
-            if not self.client: return None
+        return self.client is not None
+
+    def get_daily_summary(self, day):
+        """Hämtar nyckeltal för ett datum ('YYYY-MM-DD'). Returnerar None om data saknas."""
+        if not self._ensure_client():
+            return None
+
+        stats = self.client.get_user_summary(day)
+        if not stats or not stats.get('totalSteps'):
+            return None
+
+        data = {
+            "datum": day,
+            "steg": stats.get("totalSteps", 0),
+            "vilopuls": stats.get("restingHeartRate", "Ingen data"),
+            "stress_snitt": stats.get("averageStressLevel", "Ingen data"),
+            "sömn_timmar": round((stats.get("sleepingSeconds") or 0) / 3600, 1)
+        }
+
+        # Försök hämta Body Battery om det finns
+        if 'bodyBattery' in stats:
+             data['body_battery'] = stats['bodyBattery']
+
+        return data
+
+    def get_health_report(self):
+        if not self._ensure_client():
+            return None
 
         try:
             # Hämtar dagens datum
-            today = datetime.date.today().isoformat()
-            
-            # Hämta grunddata (Steps, HR etc)
             # Här kommer det fungera nu eftersom self.client.display_name är satt
-            stats = self.client.get_user_summary(today)
-            
+            today = datetime.date.today().isoformat()
+            data = self.get_daily_summary(today)
+
             # Fallback till igår om ingen data finns än (t.ex. tidigt på morgonen)
-            if not stats or stats.get('totalSteps') == 0:
+            if not data:
                 yesterday = (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
-                stats = self.client.get_user_summary(yesterday)
-                today = f"{yesterday} (Igår)"
-
-            data = {
-                "datum": today,
-                "steg": stats.get("totalSteps", 0),
-                "vilopuls": stats.get("restingHeartRate", "Ingen data"),
-                "stress_snitt": stats.get("averageStressLevel", "Ingen data"),
-                "sömn_timmar": round(stats.get("sleepingSeconds", 0) / 3600, 1)
-            }
-            
-            # Försök hämta Body Battery om det finns
-            if 'bodyBattery' in stats:
-                 data['body_battery'] = stats['bodyBattery']
+                data = self.get_daily_summary(yesterday)
+                if data:
+                    data["datum"] = f"{yesterday} (Igår)"
 
             return data
 
@@ -2,37 +2,51 @@
 app/tools/gcal_core.py
 """
 import os
-import datetime
+import threading
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from config.settings import get_config
+from .cache import cached
 
 cfg = get_config()
 
+# Credentials och tjänsteobjekt byggs en gång per process (discovery är långsamt)
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    """Delad Calendar-tjänst. Kastar om nyckelfilen saknas."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            creds = service_account.Credentials.from_service_account_file(
+                cfg["SERVICE_ACCOUNT_FILE"], scopes=['https://www.googleapis.com/auth/calendar.readonly'])
+            _service = build('calendar', 'v3', credentials=creds, cache_discovery=False)
+    return _service
+
+def format_events(events):
+    if not events: return "Kalendern är tom."
+
+    output = "Kommande händelser: "
+    for event in events:
+        start = event['start'].get('dateTime', event['start'].get('date'))
+        clean_time = start.replace('T', ' ').split('+')[0][:16]
+        output += f"Kl {clean_time}: {event.get('summary', 'Inget namn')}. "
+    return output
+
+@cached()
 def get_calendar_events(max_results=5):
     """Hämtar kommande händelser i kalendern."""
     key_path = cfg["SERVICE_ACCOUNT_FILE"]
     if not os.path.exists(key_path): return "Ingen kalender-nyckel hittades."
 
     try:
-        creds = service_account.Credentials.from_service_account_file(
-            key_path, scopes=['https://www.googleapis.com/auth/calendar.readonly'])
-        service = build('calendar', 'v3', credentials=creds)
-        
-        now = datetime.datetime.utcnow().isoformat() + 'Z'
-        events_result = service.events().list(calendarId='primary', timeMin=now,
-                                            maxResults=max_results, singleEvents=True,
-                                            orderBy='startTime').execute()
-        events = events_result.get('items', [])
-        
-        if not events: return "Kalendern är tom."
-        
-        output = "Kommande händelser: "
-        for event in events:
-            start = event['start'].get('dateTime', event['start'].get('date'))
-            clean_time = start.replace('T', ' ').split('+')[0][:16]
-            output += f"Kl {clean_time}: {event.get('summary', 'Inget namn')}. "
-        return output
+        # Svaret kommer ur den lokala spegeln (synkas i bakgrunden med syncToken)
+        from app.services.calendar_mirror import calendar_mirror
+        if not calendar_mirror.ready:
+            # Första anropet innan bakgrundssynken hunnit köra
+            calendar_mirror.sync()
+        return format_events(calendar_mirror.upcoming(max_results))
     except Exception as e:
         return f"Kalenderfel: {e}"
 
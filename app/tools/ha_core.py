@@ -1,6 +1,10 @@
+import asyncio
 import requests
 from config.settings import get_config
 from .formatter import format_temp_for_speech
+from .cache import cached, invalidates
+from app.services.clients import registry
+from app.services.ha_client import ha_client
 
 """
 ==============================================================================
@@ -12,51 +16,177 @@ cfg = get_config()
 HA_URL = cfg.get("HA_BASE_URL")
 HA_TOKEN = cfg.get("HA_TOKEN")
 
+# Delad session för REST-reserven (när WebSocket-spegeln inte är uppe)
+_session = requests.Session()
+_session.headers.update({
+    "Authorization": f"Bearer {HA_TOKEN}",
+    "Content-Type": "application/json"
+})
+
+def _format_state(entity_id, data):
+    state = data.get("state")
+    unit = data.get("attributes", {}).get("unit_of_measurement", "")
+
+    # Om det är en temperatur, formatera för tal
+    if unit == "°C" or "temperature" in entity_id.lower():
+        return f"Status för {entity_id} är {format_temp_for_speech(state)}."
+
+    return f"Status för {entity_id} är {state} {unit}."
+
+def _call_service(domain, service, entity_id):
+    """Över WebSocket om anslutningen är uppe, annars REST."""
+    if ha_client.ready:
+        ha_client.call_service_threadsafe(domain, service, entity_id)
+        return
+    r = _session.post(f"{HA_URL}/api/services/{domain}/{service}", json={"entity_id": entity_id}, timeout=5)
+    r.raise_for_status()
+
+@cached(entity="entity_id")
 def get_ha_state(entity_id: str):
     """
     Hämtar status från Home Assistant och formaterar temperaturer för tal.
+    Läses ur WebSocket-spegeln i minnet när den är uppe.
     """
-    url = f"{HA_URL}/api/states/{entity_id}"
-    headers = {
-        "Authorization": f"Bearer {HA_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
+    if ha_client.ready:
+        data = ha_client.get_state(entity_id)
+        if data:
+            return _format_state(entity_id, data)
+        return f"Kunde inte hitta status för {entity_id}."
+
     try:
-        response = requests.get(url, headers=headers, timeout=5)
+        response = _session.get(f"{HA_URL}/api/states/{entity_id}", timeout=5)
         if response.status_code == 200:
-            data = response.json()
-            state = data.get("state")
-            unit = data.get("attributes", {}).get("unit_of_measurement", "")
-
-            # Om det är en temperatur, formatera för tal
-            if unit == "°C" or "temperature" in entity_id.lower():
-                return f"Status för {entity_id} är {format_temp_for_speech(state)}."
-            
-            return f"Status för {entity_id} är {state} {unit}."
+            return _format_state(entity_id, response.json())
         return f"Kunde inte hitta status för {entity_id}."
     except Exception as e:
         return f"Fel vid anrop till HA: {str(e)}"
 
+@invalidates("entity_id")
 def control_vacuum(entity_id: str, action: str):
     """Styr dammsugaren: start, stop, pause, dock."""
-    url = f"{HA_URL}/api/services/vacuum/{action}"
-    headers = {"Authorization": f"Bearer {HA_TOKEN}"}
-    data = {"entity_id": entity_id}
+    # Samma översättning som de batchade anropen (dock -> return_to_base)
+    if action not in ACTIONS:
+        return f"Okänd åtgärd för dammsugaren: {action}."
     try:
-        requests.post(url, headers=headers, json=data, timeout=5)
+        _call_service("vacuum", ACTIONS[action][0], entity_id)
         return f"Dammsugaren {action} utförd."
     except:
         return "Kunde inte styra dammsugaren."
 
+@invalidates("entity_id")
 def control_light(entity_id: str, action: str):
     """Styr belysning: on, off."""
     service = "turn_on" if action == "on" else "turn_off"
-    url = f"{HA_URL}/api/services/light/{service}"
-    headers = {"Authorization": f"Bearer {HA_TOKEN}"}
-    data = {"entity_id": entity_id}
     try:
-        requests.post(url, headers=headers, json=data, timeout=5)
+        _call_service("light", service, entity_id)
         return f"Ljuset är nu {action}."
     except:
-        return "Kunde inte styra ljuset."
\ No newline at end of file
+        return "Kunde inte styra ljuset."
+
+
+# --- BATCHADE ANROP (flera entiteter/områden) ---
+# action -> (tjänst, tillstånd som bekräftar att anropet gått igenom)
+ACTIONS = {
+    "on": ("turn_on", ("on",)),
+    "off": ("turn_off", ("off",)),
+    "toggle": ("toggle", ()),
+    "start": ("start", ("cleaning",)),
+    "stop": ("stop", ()),
+    "pause": ("pause", ("paused",)),
+    "dock": ("return_to_base", ("returning", "docked")),
+}
+
+async def _call_group(domain, service, target):
+    """Ett tjänsteanrop för en hel domän. Returnerar ändrade tillstånd (bara via REST)."""
+    if ha_client.ready:
+        await ha_client.call_service(domain, service, target=target)
+        return None
+    r = await registry.http(HA_URL).post(
+        f"{HA_URL}/api/services/{domain}/{service}",
+        headers={"Authorization": f"Bearer {HA_TOKEN}"},
+        json=target,
+        timeout=cfg["HA_WS_CALL_TIMEOUT"]
+    )
+    r.raise_for_status()
+    return {s["entity_id"]: s.get("state") for s in r.json()}
+
+async def _confirm(entity_id, expected, changed):
+    if not expected:
+        return "ok"
+    if changed is not None:
+        return "ok" if changed.get(entity_id) in expected else "skickat, ej bekräftat"
+    confirmed = await ha_client.wait_for_state(entity_id, expected, cfg["HA_CONFIRM_TIMEOUT"])
+    return "ok" if confirmed else "skickat, ej bekräftat"
+
+async def control_devices_async(action, entity_ids=None, area_ids=None, area_domain="light"):
+    """
+    Styr flera entiteter och/eller områden samtidigt. Ett anrop per domän,
+    domänerna körs parallellt. Returnerar {entity_id|"area:<id>": resultat}.
+    """
+    if action not in ACTIONS:
+        targets = list(entity_ids or []) + [f"area:{a}" for a in area_ids or []]
+        return {target: f"fel: okänd åtgärd '{action}'" for target in targets}
+    service, expected = ACTIONS[action]
+    results = {}
+
+    # Gruppera per domän (light.x, light.y -> ett light.turn_off)
+    groups = {}
+    for entity_id in entity_ids or []:
+        if ha_client.ready and ha_client.get_state(entity_id) is None:
+            results[entity_id] = "fel: okänd entitet"
+            continue
+        groups.setdefault(entity_id.split(".", 1)[0], []).append(entity_id)
+
+    calls = [(domain, {"entity_id": ids}) for domain, ids in groups.items()]
+    if area_ids:
+        calls.append((area_domain, {"area_id": list(area_ids)}))
+
+    outcomes = await asyncio.gather(
+        *(_call_group(domain, service, target) for domain, target in calls),
+        return_exceptions=True
+    )
+
+    confirmations = []
+    for (domain, target), outcome in zip(calls, outcomes):
+        if "area_id" in target:
+            for area_id in target["area_id"]:
+                results[f"area:{area_id}"] = f"fel: {outcome}" if isinstance(outcome, Exception) else "ok"
+            continue
+        for entity_id in target["entity_id"]:
+            if isinstance(outcome, Exception):
+                results[entity_id] = f"fel: {outcome}"
+            else:
+                confirmations.append((entity_id, _confirm(entity_id, expected, outcome)))
+
+    # Bekräftelser väntas in parallellt
+    for (entity_id, _), status in zip(confirmations, await asyncio.gather(*(c for _, c in confirmations))):
+        results[entity_id] = status
+    return results
+
+def format_results(action, results):
+    """Kort text till modellen: vad som lyckades och vad som misslyckades."""
+    ok = [k for k, v in results.items() if v == "ok"]
+    other = [f"{k} ({v})" for k, v in results.items() if v != "ok"]
+    parts = []
+    if ok:
+        parts.append(f"Klart ({action}): {', '.join(ok)}.")
+    if other:
+        parts.append(f"Ej bekräftat eller misslyckat: {', '.join(other)}.")
+    return " ".join(parts) or "Inga entiteter angavs."
+
+# Områden kan innehålla vilka entiteter som helst, därför rensas all cachad HA-status
+@invalidates("entity_ids", tools=("get_ha_state",))
+def control_devices(entity_ids: list[str], action: str, area_ids: list[str] = None):
+    """
+    Styr flera enheter i Home Assistant i ett anrop, t.ex. släck alla lampor.
+    action: on, off, toggle, start, stop, pause, dock. area_ids: områden (t.ex. "kontor").
+    Returnerar resultat per entitet.
+    """
+    try:
+        results = ha_client.run_threadsafe(
+            control_devices_async(action, entity_ids, area_ids),
+            timeout=cfg["HA_WS_CALL_TIMEOUT"] + cfg["HA_CONFIRM_TIMEOUT"] + 1
+        )
+        return format_results(action, results)
+    except Exception as e:
+        return f"Kunde inte styra enheterna: {e}"
@@ -1,7 +1,17 @@
 import requests
+import threading
 import time
+from requests.adapters import HTTPAdapter
 from config.settings import get_config
 
+API_URL = "https://www.strava.com/api/v3"
+
+class StravaRateLimited(Exception):
+    """Strava har strypt anropen. 'retry_at' är epoch då nästa försök är tillåtet."""
+    def __init__(self, retry_at):
+        super().__init__(f"rate limit, försök igen {time.strftime('%H:%M', time.localtime(retry_at))}")
+        self.retry_at = retry_at
+
 class StravaTool:
     def __init__(self):
         cfg = get_config()
@@ -10,41 +20,125 @@ class StravaTool:
         self.refresh_token = cfg.get("STRAVA_REFRESH_TOKEN")
         self.access_token = None
         self.expires_at = 0
+        # Marginal mot Stravas gräns (anrop kvar i 15-min-fönstret)
+        self.rate_margin = cfg.get("STRAVA_RATE_MARGIN", 5)
+        self.retry_at = 0
+
+        # Återanvänd anslutningar i stället för en ny TLS-handskakning per anrop
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=2))
+        # Bara en tråd i taget förnyar token
+        self._token_lock = threading.Lock()
 
     def _refresh_access_token(self):
         """Hämtar ett nytt access token om det gamla gått ut."""
-        if time.time() < self.expires_at and self.access_token:
+        if time.time() < self.expires_at - 60 and self.access_token:
+            return
+
+        with self._token_lock:
+            # En annan tråd kan ha hunnit förnya medan vi väntade på låset
+            if time.time() < self.expires_at - 60 and self.access_token:
+                return
+
+            url = f"{API_URL}/oauth/token"
+            payload = {
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'refresh_token': self.refresh_token,
+                'grant_type': 'refresh_token'
+            }
+            try:
+                r = self.session.post(url, data=payload, timeout=10).json()
+                self.access_token = r['access_token']
+                self.expires_at = r['expires_at']
+                # Strava kan rotera refresh-token
+                self.refresh_token = r.get('refresh_token', self.refresh_token)
+            except Exception as e:
+                print(f">> [Strava] Token Refresh Error: {e}")
+
+    @staticmethod
+    def _next_window():
+        """Stravas korta gräns nollställs varje hel kvart."""
+        now = time.time()
+        return now - (now % 900) + 900
+
+    def _check_rate_limit(self, r):
+        """Läser X-RateLimit-Limit/-Usage ('15min,dag') och backar av nära gränsen."""
+        try:
+            limits = [int(x) for x in r.headers["X-RateLimit-Limit"].split(",")]
+            usage = [int(x) for x in r.headers["X-RateLimit-Usage"].split(",")]
+        except (KeyError, ValueError):
             return
+        if usage[1] >= limits[1] - self.rate_margin:
+            # Dagsgränsen nollställs vid midnatt UTC
+            now = time.time()
+            self.retry_at = now - (now % 86400) + 86400
+        elif usage[0] >= limits[0] - self.rate_margin:
+            self.retry_at = self._next_window()
+
+    def _get(self, path, params=None):
+        if time.time() < self.retry_at:
+            raise StravaRateLimited(self.retry_at)
 
-        url = "https://www.strava.com/api/v3/oauth/token"
-        payload = {
-            'client_id': self.client_id,
-            'client_secret': self.client_secret,
-            'refresh_token': self.refresh_token,
-            'grant_type': 'refresh_token'
-        }
+        self._refresh_access_token()
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        r = self.session.get(f"{API_URL}{path}", headers=headers, params=params, timeout=15)
+        self._check_rate_limit(r)
+
+        if r.status_code == 429:
+            self.retry_at = max(self.retry_at, self._next_window())
+            raise StravaRateLimited(self.retry_at)
+        if r.status_code == 401:
+            # Token återkallat i förtid: tvinga förnyelse nästa gång
+            self.expires_at = 0
+        r.raise_for_status()
+        return r.json()
+
+    def _configured(self):
+        return bool(self.refresh_token) and "DITT_STRAVA_REFRESH_TOKEN" not in self.refresh_token
+
+    def fetch_activities(self, after=None, per_page=30, page=1):
+        """Hämtar rå aktivitetsdata från Strava (None vid fel)."""
+        if not self._configured():
+            return None
+
+        params = {"per_page": per_page, "page": page}
+        if after:
+            params["after"] = int(after)
         try:
-            r = requests.post(url, data=payload).json()
-            self.access_token = r['access_token']
-            self.expires_at = r['expires_at']
+            return self._get("/athlete/activities", params)
+        except StravaRateLimited as e:
+            print(f">> [Strava] ⚠️ Pausar: {e}")
         except Exception as e:
-            print(f">> [Strava] Token Refresh Error: {e}")
+            print(f">> [Strava] Fetch Error: {e}")
+        return None
+
+    def iter_activity_pages(self, after, per_page=200):
+        """
+        Alla aktiviteter efter 'after' (epoch), sida för sida, äldst först.
+        Avbryts tyst vid rate limit; nästa synk fortsätter från senast sparade.
+        """
+        if not self._configured():
+            return
+        page = 1
+        while True:
+            try:
+                batch = self._get("/athlete/activities", {"after": int(after), "per_page": per_page, "page": page})
+            except StravaRateLimited as e:
+                print(f">> [Strava] ⚠️ Synk pausad: {e}")
+                return
+            if not batch:
+                return
+            yield batch
+            if len(batch) < per_page:
+                return
+            page += 1
 
     def get_health_report(self, limit=3):
         """Hämtar de senaste träningspassen för analys."""
-        # Kontrollera att token finns
-        if not self.refresh_token or "DITT_STRAVA_REFRESH_TOKEN" in self.refresh_token:
-            return None
-
         try:
-            self._refresh_access_token()
-            url = "https://www.strava.com/api/v3/athlete/activities"
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-            params = {"per_page": limit}
-            
-            r = requests.get(url, headers=headers, params=params)
-            if r.status_code == 200:
-                activities = r.json()
+            activities = self.fetch_activities(per_page=limit)
+            if activities is not None:
                 output = []
                 for act in activities:
                     output.append({
@@ -1,112 +1,220 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import numpy as np
 import requests
-from datetime import datetime, timedelta
 from config.settings import get_config
 from .formatter import format_temp_for_speech
+from .cache import cached
 
 """
 ==============================================================================
 FILE: app/tools/weather_core.py
 PROJECT: DAA Digital Advanced Assistant
 DESCRIPTION: Väderverktyg med förbättrad sökning efter veckoprognos.
+             Prognosen från SMHI cachas per avrundad koordinat (SMHI godkänner
+             en ny prognos ungefär en gång i timmen) och tolkas en gång till
+             kompakta arrayer, så att rapporten byggs vektoriserat.
 ==============================================================================
 """
 
 cfg = get_config()
 
-def get_weather():
+SMHI_URL = "https://opendata-download-metfcst.smhi.se/api/category/pmp3g/version/2/geotype/point/lon/{lon}/lat/{lat}/data.json"
+
+# Mappning av vädersymboler till naturligt talspråk
+WEATHER_SYMBOLS = {
+    1: "klart", 2: "mestadels klart", 3: "varierande molnighet", 4: "halvklart",
+    5: "molnigt", 6: "mulet", 7: "dimma", 8: "lätta regnskurar", 9: "regnskurar",
+    10: "kraftiga regnskurar", 18: "lätt regn", 19: "regn", 20: "kraftigt regn",
+    25: "lätt snöfall", 26: "snöfall", 27: "kraftigt snöfall"
+}
+
+DAY_NAMES = ["måndag", "tisdag", "onsdag", "torsdag", "fredag", "lördag", "söndag"]
+
+# SMHI-parameter -> fält i Forecast
+PARAMETERS = {
+    "t": "temp",
+    "Wsymb2": "symbol",
+    "ws": "wind",
+    "gust": "gust",
+    "pmean": "precip",
+    "r": "humidity",
+    "tcc_mean": "cloud",
+}
+
+
+class Forecast:
+    """En tolkad punktprognos. Tider i UTC (datetime64[s]), värden som float32 (NaN = saknas)."""
+
+    __slots__ = ("times", "temp", "symbol", "wind", "gust", "precip", "humidity", "cloud",
+                 "approved_time", "fetched_at", "expires_at", "etag", "last_modified")
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.expires_at
+
+
+def parse_forecast(data):
+    """Tolkar SMHI:s JSON en gång till arrayer (en rad per tidpunkt)."""
+    series = data.get("timeSeries", [])
+    f = Forecast()
+    # "2024-11-18T12:00:00Z" -> datetime64 (utan 'Z', numpy tolkar det som UTC)
+    f.times = np.array([entry["validTime"][:19] for entry in series], dtype="datetime64[s]")
+    columns = {field: np.full(len(series), np.nan, dtype=np.float32) for field in PARAMETERS.values()}
+    for i, entry in enumerate(series):
+        for p in entry["parameters"]:
+            field = PARAMETERS.get(p["name"])
+            if field:
+                columns[field][i] = p["values"][0]
+    for field, values in columns.items():
+        setattr(f, field, values)
+    f.approved_time = np.datetime64(data.get("approvedTime", "1970-01-01T00:00:00")[:19], "s")
+    return f
+
+
+def _expiry(forecast, headers, now):
     """
-    Hämtar väderprognos från SMHI och returnerar text optimerad för TTS.
-    Täcker nuvarande väder, imorgon och kommande dagar.
+    När prognosen ska frågas om. HTTP-huvuden (Cache-Control/Expires) gäller
+    om de finns, annars approvedTime + en timme. Aldrig oftare än WEATHER_MIN_RECHECK.
     """
-    lat = cfg.get("LATITUDE")
-    lon = cfg.get("LONGITUDE")
+    expires = None
+    cache_control = headers.get("Cache-Control", "")
+    for part in cache_control.split(","):
+        part = part.strip()
+        if part.startswith("max-age="):
+            try:
+                expires = now + int(part[8:])
+            except ValueError:
+                pass
+    if expires is None and headers.get("Expires"):
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            pass
+    if expires is None:
+        approved = forecast.approved_time.astype("datetime64[s]").astype(np.int64)
+        expires = approved + cfg["WEATHER_UPDATE_INTERVAL"]
+    return max(expires, now + cfg["WEATHER_MIN_RECHECK"])
 
-    if lat is None or lon is None:
-        return "Systemfel: Koordinater saknas i settings punkt py."
 
-    # SMHI API (pmp3g v2)
-    url = f"https://opendata-download-metfcst.smhi.se/api/category/pmp3g/version/2/geotype/point/lon/{round(float(lon), 4)}/lat/{round(float(lat), 4)}/data.json"
-    
-    headers = {"User-Agent": "DAA-Digital-Advanced-Assistant/1.0"}
+# Delad session (återanvänder TLS-anslutningen till SMHI)
+_session = requests.Session()
+_session.headers.update({"User-Agent": "DAA-Digital-Advanced-Assistant/1.0"})
+_cache = {}
+_cache_lock = threading.Lock()
+_fetch_locks = {}
 
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
+
+def _cache_key(lat, lon):
+    # ~1 km upplösning räcker; närliggande positioner delar prognos
+    precision = cfg["WEATHER_COORD_PRECISION"]
+    return round(float(lat), precision), round(float(lon), precision)
+
+
+def get_forecast(lat, lon):
+    """
+    Cachad prognos för koordinaten. Inom giltighetstiden returneras cachen direkt;
+    därefter görs en villkorlig GET (If-None-Match/If-Modified-Since).
+    """
+    key = _cache_key(lat, lon)
+    now = time.time()
+    entry = _cache.get(key)
+    if entry and entry.is_fresh(now):
+        return entry
+
+    with _cache_lock:
+        lock = _fetch_locks.setdefault(key, threading.Lock())
+    # En hämtning per koordinat åt gången; övriga väntar på resultatet
+    with lock:
+        entry = _cache.get(key)
+        if entry and entry.is_fresh():
+            return entry
+
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        url = SMHI_URL.format(lat=key[0], lon=key[1])
+        try:
+            response = _session.get(url, headers=headers, timeout=10)
+        except requests.RequestException:
+            if entry:
+                # Hellre gammal prognos än ingen
+                return entry
+            raise
+
+        now = time.time()
+        if response.status_code == 304 and entry:
+            entry.expires_at = _expiry(entry, response.headers, now)
+            return entry
         if response.status_code != 200:
-            return "Kunde inte nå vädertjänsten just nu."
-
-        data = response.json()
-        series = data.get("timeSeries", [])
-        if not series:
-            return "Ingen väderdata tillgänglig för din position."
-
-        # Säkrare helper för parametrar
-        def find_p(p_list, name):
-            for p in p_list:
-                if p["name"] == name: return p["values"][0]
-            return None
-
-        # Mappning av vädersymboler till naturligt talspråk
-        wm = {
-            1: "klart", 2: "mestadels klart", 3: "varierande molnighet", 4: "halvklart", 
-            5: "molnigt", 6: "mulet", 7: "dimma", 8: "lätta regnskurar", 9: "regnskurar", 
-            10: "kraftiga regnskurar", 18: "lätt regn", 19: "regn", 20: "kraftigt regn",
-            25: "lätt snöfall", 26: "snöfall", 27: "kraftigt snöfall"
-        }
-
-        # --- 1. JUST NU ---
-        now = series[0]
-        curr_temp = find_p(now["parameters"], "t")
-        curr_cond = wm.get(find_p(now["parameters"], "Wsymb2"), "växlande molnighet")
-        report = f"Vädret just nu är {curr_cond} och det är {format_temp_for_speech(curr_temp)}.\n"
-
-        # --- 2. VECKOPROGNOSTISERING ---
-        # Vi skapar en ordlista för att spara en prognos per dag
-        daily_forecasts = {}
-        
-        # Vi tittar på alla tidspunkter i serien
-        for entry in series:
-            valid_time = datetime.strptime(entry["validTime"], "%Y-%m-%dT%H:%M:%SZ")
-            date_key = valid_time.strftime("%Y-%m-%d")
-            
-            # Vi hoppar över idag
-            if date_key == datetime.now().strftime("%Y-%m-%d"):
-                continue
-                
-            # Vi försöker hitta en tidpunkt så nära lunch (kl 12:00) som möjligt för varje dag
-            # Om vi inte hittat något för denna dag än, eller om denna tidpunkt är närmare kl 12
-            current_hour = valid_time.hour
-            if date_key not in daily_forecasts:
-                daily_forecasts[date_key] = entry
-            else:
-                existing_time = datetime.strptime(daily_forecasts[date_key]["validTime"], "%Y-%m-%dT%H:%M:%SZ")
-                if abs(current_hour - 12) < abs(existing_time.hour - 12):
-                    daily_forecasts[date_key] = entry
-
-        # Sortera dagarna och bygg rapporten
-        sorted_days = sorted(daily_forecasts.keys())
-        day_map = {
-            "Mon": "måndag", "Tue": "tisdag", "Wed": "onsdag", 
-            "Thu": "torsdag", "Fri": "fredag", "Sat": "lördag", "Sun": "söndag"
-        }
-
-        if sorted_days:
-            report += "Här är prognosen för veckan: "
-            forecast_parts = []
-            
-            # Ta med max 5 dagar framåt för att hålla det kort
-            for d_key in sorted_days[:5]:
-                f_entry = daily_forecasts[d_key]
-                temp = find_p(f_entry["parameters"], "t")
-                day_name_en = datetime.strptime(d_key, "%Y-%m-%d").strftime("%a")
-                day_name_se = day_map.get(day_name_en, day_name_en)
-                
-                forecast_parts.append(f"på {day_name_se} blir det {format_temp_for_speech(temp)}")
-            
-            report += ", ".join(forecast_parts) + "."
-        else:
-            report += "Jag kunde tyvärr inte hitta några detaljer för resten av veckan."
-
-        return report
+            return entry
+
+        forecast = parse_forecast(response.json())
+        forecast.fetched_at = now
+        forecast.etag = response.headers.get("ETag")
+        forecast.last_modified = response.headers.get("Last-Modified")
+        forecast.expires_at = _expiry(forecast, response.headers, now)
+        _cache[key] = forecast
+        return forecast
+
+
+def build_report(forecast, now=None, days=5):
+    """Bygger TTS-texten: väder just nu plus en tidpunkt nära lunch för kommande dagar."""
+    if forecast is None or len(forecast.times) == 0:
+        return "Ingen väderdata tillgänglig för din position."
+
+    now = now or time.time()
+    # Dagens datum i lokal tid, som tidigare
+    today = np.datetime64(time.strftime("%Y-%m-%d", time.localtime(now)), "D")
+    now = np.datetime64(int(now), "s")
+
+    # --- 1. JUST NU --- (senaste tidpunkten som inte ligger i framtiden)
+    i = max(int(np.searchsorted(forecast.times, now, side="right")) - 1, 0)
+    symbol = forecast.symbol[i]
+    curr_cond = WEATHER_SYMBOLS.get(int(symbol), "växlande molnighet") if not np.isnan(symbol) else "växlande molnighet"
+    report = f"Vädret just nu är {curr_cond} och det är {format_temp_for_speech(_value(forecast.temp[i]))}.\n"
+
+    # --- 2. VECKOPROGNOS --- en tidpunkt per dag, så nära kl 12 som möjligt (idag hoppas över)
+    dates = forecast.times.astype("datetime64[D]")
+    hours = (forecast.times - dates).astype("timedelta64[h]").astype(np.int64)
+    future = dates > today
+    if not future.any():
+        return report + "Jag kunde tyvärr inte hitta några detaljer för resten av veckan."
+
+    idx = np.flatnonzero(future)
+    order = idx[np.lexsort((np.abs(hours[idx] - 12), dates[idx]))]
+    _, first = np.unique(dates[order], return_index=True)
+    picks = order[first][:days]
+
+    parts = []
+    for j in picks:
+        # datetime64[D] räknar dagar från 1970-01-01, som var en torsdag
+        weekday = (int(dates[j].astype(np.int64)) + 3) % 7
+        parts.append(f"på {DAY_NAMES[weekday]} blir det {format_temp_for_speech(_value(forecast.temp[j]))}")
+    return report + "Här är prognosen för veckan: " + ", ".join(parts) + "."
 
+
+def _value(x):
+    return None if np.isnan(x) else round(float(x), 1)
+
+
+@cached()
+def get_weather(location: str = None):
+    """
+    Hämtar väderprognos från SMHI och returnerar text optimerad för TTS.
+    Täcker nuvarande väder, kommande dagar och sol upp/ned.
+    location: namn på en känd plats (t.ex. "stugan"); utelämnas för hemma.
+    """
+    # Förhämtade prognoser per plats (se app/services/weather_service.py)
+    from app.services.weather_service import weather_service
+
+    if not weather_service.locations:
+        return "Systemfel: Koordinater saknas i settings punkt py."
+
+    try:
+        return weather_service.report(location)
     except Exception as e:
         return f"Ett tekniskt fel uppstod vid väderhämtning: {str(e)}"
\ No newline at end of file
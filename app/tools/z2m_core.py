@@ -2,27 +2,66 @@
 app/tools/z2m_core.py
 """
 import json
-import paho.mqtt.subscribe as subscribe
+from datetime import datetime
 from config.settings import get_config
+from app.services.sensor_cache import sensor_cache
+from app.services.snapshots import format_age
+from .cache import cached
 
 cfg = get_config()
 
+IGNORED = ["linkquality", "update_available", "voltage", "device"]
+
+def _format(friendly_name, data, age=None):
+    output = []
+    for k, v in data.items():
+        if k not in IGNORED: output.append(f"{k}: {v}")
+    text = f"Data för {friendly_name}: " + ", ".join(output)
+    if age is not None and age > cfg["MQTT_STALE_AFTER"]:
+        text += f" (senast uppdaterad {format_age(age)})"
+    return text
+
+@cached(entity="friendly_name")
 def get_sensor_data(friendly_name: str):
     """Hämtar sensorvärden (temp, fukt etc) via Zigbee2MQTT."""
+    # Senaste värdet ur MQTT-cachen (bakgrundsprenumeration på zigbee2mqtt/#)
+    data, age = sensor_cache.get(friendly_name)
+    if data is not None:
+        return _format(friendly_name, data, age)
+
+    # Reserv: enheten har inte hörts av sedan start, läs retained-meddelandet direkt
     topic = f"{cfg['MQTT_TOPIC_BASE']}/{friendly_name}"
     print(f"[Z2M] Läser: {topic}")
 
     try:
+        import paho.mqtt.subscribe as subscribe
         msg = subscribe.simple(topic, hostname=cfg['MQTT_BROKER_IP'], port=cfg['MQTT_PORT'], timeout=2.0)
         if not msg: return f"Inget svar från {friendly_name}"
         
-        data = json.loads(msg.payload.decode("utf-8"))
-        output = []
-        ignored = ["linkquality", "update_available", "voltage", "device"]
-        
-        for k, v in data.items():
-            if k not in ignored: output.append(f"{k}: {v}")
-            
-        return f"Data för {friendly_name}: " + ", ".join(output)
+        return _format(friendly_name, json.loads(msg.payload.decode("utf-8")))
     except Exception as e:
-        return f"Fel vid sensorläsning: {e}"
\ No newline at end of file
+        return f"Fel vid sensorläsning: {e}"
+
+@cached(entity="friendly_name")
+def get_sensor_history(friendly_name: str, metric: str = "temperature", hours: int = 12):
+    """
+    Lägsta, högsta och snittvärde för en sensor de senaste 'hours' timmarna,
+    t.ex. hur kallt det blev i natt. metric: temperature, humidity, pressure ...
+    """
+    from app.core.sensor_history import get_history_stats
+    try:
+        stats = get_history_stats(friendly_name, metric, hours)
+    except Exception as e:
+        return f"Fel vid läsning av sensorhistorik: {e}"
+    if not stats:
+        return f"Ingen historik för {friendly_name} ({metric}) senaste {hours} timmarna."
+
+    def clock(ts):
+        return datetime.fromtimestamp(ts).strftime("%H:%M")
+
+    return (
+        f"{friendly_name} {metric} senaste {hours} h: "
+        f"lägst {stats['min']} (kl {clock(stats['min_at'])}), "
+        f"högst {stats['max']} (kl {clock(stats['max_at'])}), "
+        f"snitt {stats['avg']}."
+    )
\ No newline at end of file
@@ -112,12 +112,15 @@ def chat_loop():
 
             print(f"{Colors.BLUE}DAA: {Colors.ENDC}", end="")
             
-            # Simple sync request (streaming is handled by server accumulating response for now)
-            r = requests.post(f"{server_url}/api/chat", json=payload)
-            if r.status_code == 200:
-                print(r.text)
-            else:
-                print(f"{Colors.FAIL}Error: {r.status_code}{Colors.ENDC}")
+            # Streaming request: print each chunk as soon as the server sends it
+            with requests.post(f"{server_url}/api/chat", json=payload, stream=True) as r:
+                if r.status_code == 200:
+                    r.encoding = r.encoding or "utf-8"
+                    for chunk in r.iter_content(chunk_size=None, decode_unicode=True):
+                        print_stream(chunk)
+                    print()
+                else:
+                    print(f"{Colors.FAIL}Error: {r.status_code}{Colors.ENDC}")
             
         except KeyboardInterrupt:
             break
@@ -35,6 +35,61 @@ DB_PATH = os.path.join(LOG_PATH, "daa_memory.db")
 # Hur många meddelanden AI:n ska "komma ihåg" i en session.
 HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", 600))
 
+# Delad anslutningspool mot SQLite (WAL-läge).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 4))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 16384))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+
+# Antal sessioner vars senaste meddelanden hålls i minnet (ringbuffertar).
+HISTORY_SESSION_CACHE = int(os.getenv("HISTORY_SESSION_CACHE", 64))
+
+# Token-budget för historiken som skickas till modellen.
+# Nyckeln matchas som delsträng mot modell-ID (längsta träff vinner).
+CONTEXT_TOKEN_BUDGETS = {
+    "gemini": 32000,
+    "gpt-4o": 16000,
+    "gpt": 8000,
+    "o1": 16000,
+    "claude": 16000,
+    "deepseek": 16000,
+    "llama": 4000,
+    "default": 6000
+}
+# Tokens som lämnas lediga för modellens svar.
+CONTEXT_RESPONSE_RESERVE = int(os.getenv("CONTEXT_RESPONSE_RESERVE", 1024))
+
+# Rullande sammanfattning av äldre historik.
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "1") == "1"
+SUMMARY_INTERVAL = int(os.getenv("SUMMARY_INTERVAL", 600))      # Sekunder mellan körningar
+SUMMARY_CHUNK_SIZE = int(os.getenv("SUMMARY_CHUNK_SIZE", 60))   # Rader per sammanfattning
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", 40)) # Rader som alltid skickas ordagrant
+SUMMARY_TOKEN_SHARE = float(os.getenv("SUMMARY_TOKEN_SHARE", 0.25)) # Andel av budgeten för sammanfattningar
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "")                  # Tomt = OLLAMA_DEFAULT_MODEL
+
+# ==============================================================================
+# NÄTVERK & TRÅDAR
+# ==============================================================================
+# Max antal samtidiga blockerande anrop (SDK:er utan async-stöd).
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", 8))
+
+# Modellistan (/api/models) cachas och förnyas i bakgrunden.
+MODELS_CACHE_TTL = int(os.getenv("MODELS_CACHE_TTL", 600))
+MODELS_PROVIDER_TIMEOUT = float(os.getenv("MODELS_PROVIDER_TIMEOUT", 3.0))
+
+# Alias för modeller, t.ex. en snabb modell för röstkommandon och en tyngre för coaching.
+# Värdet kan vara ett modell-ID eller "leverantör:modell" (google, openai, anthropic, groq, deepseek, ollama).
+MODEL_ALIASES = {
+    # "snabb": "groq:llama-3.1-8b-instant",
+    # "coach": "gemini-1.5-pro",
+}
+
+# Kontextkällor i /api/chat (hälsa, träning, trender, väder, hemmet, kalender)
+# hämtas parallellt. Källor som inte hunnit klart vid CONTEXT_DEADLINE hoppas över.
+CONTEXT_DEADLINE = float(os.getenv("CONTEXT_DEADLINE", 1.5))
+CONTEXT_PROVIDER_TIMEOUTS = {"default": 2.0, "weather": 3.0, "calendar": 3.0}
+# Cachetid per källa i sekunder (0 = ingen cache, t.ex. för data som redan ligger i minnet)
+CONTEXT_CACHE_TTL = {"training": 300, "weather": 900, "calendar": 300, "home": 30}
+
 # ==============================================================================
 # API KEYS & CREDENTIALS
 # ==============================================================================
@@ -45,8 +100,16 @@ ANTHROPIC_API_KEY = ""
 GROQ_API_KEY = ""
 DEEPSEEK_API_KEY = ""
 
+# Bas-URL:er för OpenAI-kompatibla leverantörer
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
 # Filen ska ligga i 'config'-mappen
 SERVICE_ACCOUNT_FILE = os.path.join(BASE_DIR, "config", "service_account.json")
+# Google Kalender speglas lokalt och synkas inkrementellt (syncToken) i bakgrunden
+CALENDAR_ID = os.getenv("CALENDAR_ID", "primary")
+CALENDAR_SYNC_INTERVAL = int(os.getenv("CALENDAR_SYNC_INTERVAL", 120))   # Sekunder mellan synkar
+CALENDAR_SYNC_PAST_DAYS = int(os.getenv("CALENDAR_SYNC_PAST_DAYS", 7))   # Så långt bakåt spegeln börjar
 
 # ==============================================================================
 # LOCAL AI (OLLAMA)
@@ -55,11 +118,61 @@ OLLAMA_URL = "http://127.0.0.1:11434"
 # Fallback om vi inte kan hämta listan
 OLLAMA_DEFAULT_MODEL = "llama3"
 
+# ==============================================================================
+# FAILOVER (Reservleverantörer)
+# ==============================================================================
+# Prövas i ordning om den valda modellen fallerar eller inte svarar i tid.
+# Format som för MODEL_ALIASES, t.ex. "groq:llama-3.1-8b-instant".
+FALLBACK_CHAIN = [
+    f"ollama:{OLLAMA_DEFAULT_MODEL}",
+]
+# Max sekunder till första token per leverantör innan nästa i kedjan prövas.
+PROVIDER_FIRST_TOKEN_TIMEOUT = {
+    "default": 10.0,
+    "ollama": 30.0,
+}
+# Max sekunder mellan två tokens när svaret väl har börjat.
+PROVIDER_IDLE_TIMEOUT = float(os.getenv("PROVIDER_IDLE_TIMEOUT", 30.0))
+# Hedging: starta nästa leverantör parallellt om ingen token kommit inom X ms (0 = av).
+HEDGE_AFTER_MS = int(os.getenv("HEDGE_AFTER_MS", 0))
+# Circuit breaker: hoppa över en leverantör efter N fel i rad, i X sekunder.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))
+CIRCUIT_RESET_SECONDS = int(os.getenv("CIRCUIT_RESET_SECONDS", 60))
+
+# ==============================================================================
+# VERKTYGSANROP (function calling, alla leverantörer)
+# ==============================================================================
+# Max antal verktygsrundor (modell -> verktyg -> modell) per svar
+TOOL_MAX_ROUNDS = int(os.getenv("TOOL_MAX_ROUNDS", 5))
+# Tidsgräns per verktyg i sekunder
+TOOL_TIMEOUTS = {"default": 10.0, "control_devices": 15.0, "get_calendar_events": 15.0}
+# Cachetid i sekunder för läsverktygen märkta med @cached (app/tools/cache.py).
+# Åtgärder (@invalidates) rensar cachade värden för de entiteter de styr.
+TOOL_CACHE_TTL = {
+    "get_weather": 300,
+    "get_calendar_events": 60,
+    "get_sensor_history": 60,
+    "get_sensor_data": 10,
+    "get_ha_state": 5,
+}
+# Max antal cachade resultat per verktyg (äldst använda släpps först)
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", 128))
+
 # ==============================================================================
 # HOME ASSISTANT (Styrning)
 # ==============================================================================
 HA_BASE_URL = "" # Din HA IP
 HA_TOKEN = ""
+# WebSocket-spegeln av HA:s tillstånd (kräver paketet websockets)
+HA_WS_RECONNECT_MAX = int(os.getenv("HA_WS_RECONNECT_MAX", 60))   # Max sekunder mellan återanslutningar
+HA_WS_CALL_TIMEOUT = float(os.getenv("HA_WS_CALL_TIMEOUT", 5.0))  # Timeout för tjänsteanrop
+HA_CONFIRM_TIMEOUT = float(os.getenv("HA_CONFIRM_TIMEOUT", 2.0))  # Väntan på state_changed efter anrop
+# Entiteter vars status bifogas när frågan gäller hemmet
+HA_CONTEXT_ENTITIES = [
+    "sensor.ute_temperature_2",
+    "light.kontor_2",
+    "vacuum.roborock_s5_f528_robot_cleaner",
+]
 
 # ==============================================================================
 # ZIGBEE2MQTT (Sensorer)
@@ -67,12 +180,33 @@ HA_TOKEN = ""
 MQTT_BROKER_IP = ""
 MQTT_PORT = 1883
 MQTT_TOPIC_BASE = "zigbee2mqtt"
+# Värden äldre än så (sekunder) får en åldersangivelse i svaret
+MQTT_STALE_AFTER = int(os.getenv("MQTT_STALE_AFTER", 3600))
+# Sensorhistorik: ringbuffert per (enhet, mätvärde) och sammanställningar i databasen
+SENSOR_BUFFER_SIZE = int(os.getenv("SENSOR_BUFFER_SIZE", 1440))      # Mätpunkter per serie i minnet
+SENSOR_MAX_SERIES = int(os.getenv("SENSOR_MAX_SERIES", 500))         # Max antal serier (äldsta släpps)
+SENSOR_ROLLUP_INTERVAL = int(os.getenv("SENSOR_ROLLUP_INTERVAL", 60)) # Sekunder mellan sparningar
+SENSOR_MINUTE_RETENTION_DAYS = int(os.getenv("SENSOR_MINUTE_RETENTION_DAYS", 7))
+SENSOR_HOUR_RETENTION_DAYS = int(os.getenv("SENSOR_HOUR_RETENTION_DAYS", 365))
 
 # ==============================================================================
 # LOCATION SETTINGS (För Väder & Astro)
 # ==============================================================================
 LATITUDE = float(os.getenv("LATITUDE", xx.xxxx))
 LONGITUDE = float(os.getenv("LONGITUDE", xx.xxxx))
+# SMHI-prognosen cachas per koordinat avrundad till så många decimaler (2 ≈ 1 km)
+WEATHER_COORD_PRECISION = int(os.getenv("WEATHER_COORD_PRECISION", 2))
+# SMHI godkänner en ny prognos ungefär en gång i timmen (sekunder efter approvedTime)
+WEATHER_UPDATE_INTERVAL = int(os.getenv("WEATHER_UPDATE_INTERVAL", 3900))
+# Minsta tid mellan två frågor till SMHI för samma koordinat (sekunder)
+WEATHER_MIN_RECHECK = int(os.getenv("WEATHER_MIN_RECHECK", 300))
+# Platser vars prognos hämtas i förväg (namn -> (lat, lon)). Den första är standard.
+WEATHER_LOCATIONS = {
+    "hemma": (LATITUDE, LONGITUDE),
+    # "stugan": (60.1234, 15.5678),
+}
+# Sekunder mellan förhämtningar (SMHI frågas bara när cachad prognos gått ut)
+WEATHER_PREFETCH_INTERVAL = int(os.getenv("WEATHER_PREFETCH_INTERVAL", 600))
 
 # ==============================================================================
 # GARMIN SETTINGS
@@ -80,6 +214,26 @@ LONGITUDE = float(os.getenv("LONGITUDE", xx.xxxx))
 # GARMIN CONFIGURATION
 GARMIN_EMAIL = ""
 GARMIN_PASSWORD = ""
+# Hur ofta hälsodatan förnyas i bakgrunden (sekunder)
+GARMIN_REFRESH_INTERVAL = int(os.getenv("GARMIN_REFRESH_INTERVAL", 900))
+
+# ==============================================================================
+# STRAVA SETTINGS
+# ==============================================================================
+# Refresh token hämtas med setup_strava.py
+STRAVA_CLIENT_ID = ""
+STRAVA_CLIENT_SECRET = ""
+STRAVA_REFRESH_TOKEN = ""
+# Antal anrop kvar i Stravas 15-minutersfönster då synken pausar
+STRAVA_RATE_MARGIN = int(os.getenv("STRAVA_RATE_MARGIN", 5))
+
+# ==============================================================================
+# TRÄNINGS- & HÄLSOHISTORIK (lokal tidsserie)
+# ==============================================================================
+# Hur ofta Garmin/Strava-historiken synkas till databasen (sekunder)
+METRICS_SYNC_INTERVAL = int(os.getenv("METRICS_SYNC_INTERVAL", 3600))
+# Antal dagar bakåt som Garmin-dagar fylls i vid första synk
+METRICS_BACKFILL_DAYS = int(os.getenv("METRICS_BACKFILL_DAYS", 56))
 
 # ==============================================================================
 # EXPORT
@@ -98,15 +252,71 @@ def get_config():
         "ANTHROPIC_API_KEY": ANTHROPIC_API_KEY,
         "GROQ_API_KEY": GROQ_API_KEY,
         "DEEPSEEK_API_KEY": DEEPSEEK_API_KEY,
+        "GROQ_BASE_URL": GROQ_BASE_URL,
+        "DEEPSEEK_BASE_URL": DEEPSEEK_BASE_URL,
         "SERVICE_ACCOUNT_FILE": SERVICE_ACCOUNT_FILE,
         "OLLAMA_URL": OLLAMA_URL,
         "OLLAMA_DEFAULT_MODEL": OLLAMA_DEFAULT_MODEL,
+        "FALLBACK_CHAIN": FALLBACK_CHAIN,
+        "PROVIDER_FIRST_TOKEN_TIMEOUT": PROVIDER_FIRST_TOKEN_TIMEOUT,
+        "PROVIDER_IDLE_TIMEOUT": PROVIDER_IDLE_TIMEOUT,
+        "HEDGE_AFTER_MS": HEDGE_AFTER_MS,
+        "CIRCUIT_FAILURE_THRESHOLD": CIRCUIT_FAILURE_THRESHOLD,
+        "CIRCUIT_RESET_SECONDS": CIRCUIT_RESET_SECONDS,
         "HA_BASE_URL": HA_BASE_URL,
         "HA_TOKEN": HA_TOKEN,
+        "HA_WS_RECONNECT_MAX": HA_WS_RECONNECT_MAX,
+        "HA_WS_CALL_TIMEOUT": HA_WS_CALL_TIMEOUT,
+        "HA_CONFIRM_TIMEOUT": HA_CONFIRM_TIMEOUT,
+        "HA_CONTEXT_ENTITIES": HA_CONTEXT_ENTITIES,
         "MQTT_BROKER_IP": MQTT_BROKER_IP,
         "MQTT_PORT": MQTT_PORT,
         "MQTT_TOPIC_BASE": MQTT_TOPIC_BASE,
+        "MQTT_STALE_AFTER": MQTT_STALE_AFTER,
+        "SENSOR_BUFFER_SIZE": SENSOR_BUFFER_SIZE,
+        "SENSOR_MAX_SERIES": SENSOR_MAX_SERIES,
+        "SENSOR_ROLLUP_INTERVAL": SENSOR_ROLLUP_INTERVAL,
+        "SENSOR_MINUTE_RETENTION_DAYS": SENSOR_MINUTE_RETENTION_DAYS,
+        "SENSOR_HOUR_RETENTION_DAYS": SENSOR_HOUR_RETENTION_DAYS,
+        "GARMIN_REFRESH_INTERVAL": GARMIN_REFRESH_INTERVAL,
+        "STRAVA_CLIENT_ID": STRAVA_CLIENT_ID,
+        "STRAVA_CLIENT_SECRET": STRAVA_CLIENT_SECRET,
+        "STRAVA_REFRESH_TOKEN": STRAVA_REFRESH_TOKEN,
+        "STRAVA_RATE_MARGIN": STRAVA_RATE_MARGIN,
+        "METRICS_SYNC_INTERVAL": METRICS_SYNC_INTERVAL,
+        "METRICS_BACKFILL_DAYS": METRICS_BACKFILL_DAYS,
         "BASE_DIR": BASE_DIR,
         "LOG_DIR": LOG_PATH,
-        "DB_PATH": DB_PATH
+        "DB_PATH": DB_PATH,
+        "DB_POOL_SIZE": DB_POOL_SIZE,
+        "DB_CACHE_SIZE_KB": DB_CACHE_SIZE_KB,
+        "DB_BUSY_TIMEOUT_MS": DB_BUSY_TIMEOUT_MS,
+        "HISTORY_SESSION_CACHE": HISTORY_SESSION_CACHE,
+        "CONTEXT_TOKEN_BUDGETS": CONTEXT_TOKEN_BUDGETS,
+        "CONTEXT_RESPONSE_RESERVE": CONTEXT_RESPONSE_RESERVE,
+        "SUMMARY_ENABLED": SUMMARY_ENABLED,
+        "SUMMARY_INTERVAL": SUMMARY_INTERVAL,
+        "SUMMARY_CHUNK_SIZE": SUMMARY_CHUNK_SIZE,
+        "SUMMARY_KEEP_RECENT": SUMMARY_KEEP_RECENT,
+        "SUMMARY_TOKEN_SHARE": SUMMARY_TOKEN_SHARE,
+        "SUMMARY_MODEL": SUMMARY_MODEL,
+        "BLOCKING_POOL_SIZE": BLOCKING_POOL_SIZE,
+        "MODELS_CACHE_TTL": MODELS_CACHE_TTL,
+        "MODELS_PROVIDER_TIMEOUT": MODELS_PROVIDER_TIMEOUT,
+        "MODEL_ALIASES": MODEL_ALIASES,
+        "CONTEXT_DEADLINE": CONTEXT_DEADLINE,
+        "CONTEXT_PROVIDER_TIMEOUTS": CONTEXT_PROVIDER_TIMEOUTS,
+        "CONTEXT_CACHE_TTL": CONTEXT_CACHE_TTL,
+        "WEATHER_COORD_PRECISION": WEATHER_COORD_PRECISION,
+        "WEATHER_UPDATE_INTERVAL": WEATHER_UPDATE_INTERVAL,
+        "WEATHER_MIN_RECHECK": WEATHER_MIN_RECHECK,
+        "WEATHER_LOCATIONS": WEATHER_LOCATIONS,
+        "WEATHER_PREFETCH_INTERVAL": WEATHER_PREFETCH_INTERVAL,
+        "CALENDAR_ID": CALENDAR_ID,
+        "CALENDAR_SYNC_INTERVAL": CALENDAR_SYNC_INTERVAL,
+        "CALENDAR_SYNC_PAST_DAYS": CALENDAR_SYNC_PAST_DAYS,
+        "TOOL_MAX_ROUNDS": TOOL_MAX_ROUNDS,
+        "TOOL_TIMEOUTS": TOOL_TIMEOUTS,
+        "TOOL_CACHE_TTL": TOOL_CACHE_TTL,
+        "TOOL_CACHE_SIZE": TOOL_CACHE_SIZE
     }
@@ -1,16 +1,68 @@
+import asyncio
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.interface.api import router as api_router
 from app.interface.web_ui import router as ui_router
-from app.core.database import init_db  # <--- Importera denna
+from app.core.database import init_db_async, close_db
+from app.core.summarizer import summary_loop
+from app.services.clients import registry
+from app.services.model_catalog import catalog
+from app.services.ha_client import ha_client
+from app.services.sensor_cache import sensor_cache
+from app.core.sensor_history import sensor_history, rollup_loop
+from app.services.snapshots import garmin_snapshot, metrics_snapshot
+from app.services.weather_service import weather_service
+from app.services.calendar_mirror import calendar_mirror
+from config.settings import SUMMARY_ENABLED
 
 app = FastAPI(title="DAA HTTP Server")
 
+# Bakgrundsjobb som ska avbrytas vid nedstängning
+background_tasks = []
+
 # Kör databas-initiering vid start
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    await init_db_async()
+    # Långlivade leverantörsklienter (delade anslutningar)
+    registry.startup()
+    # Värm modellistan så att första /api/models svarar direkt
+    background_tasks.append(asyncio.create_task(catalog.refresh()))
+    # Garmin-data förnyas i bakgrunden (hämtas direkt vid start)
+    if garmin_snapshot.enabled:
+        background_tasks.append(garmin_snapshot.start())
+    # Lokal tidsserie (Garmin/Strava) synkas inkrementellt för trendfrågor
+    if metrics_snapshot.enabled:
+        background_tasks.append(metrics_snapshot.start())
+    # SMHI-prognoser för alla platser förhämtas så att väderfrågor svarar ur minnet
+    if weather_service.locations:
+        background_tasks.append(weather_service.start())
+    # Google Kalender speglas lokalt (full synk vid start, sedan bara ändringar)
+    if calendar_mirror.enabled:
+        background_tasks.append(calendar_mirror.start())
+    # Home Assistant: WebSocket-spegel av alla entiteter
+    if ha_client.enabled:
+        background_tasks.append(ha_client.start())
+    # Zigbee2MQTT: en prenumeration på alla enheter, värdena hålls i minnet
+    if sensor_cache.enabled:
+        # Historik per sensor (ringbuffertar + minut/tim-sammanställningar)
+        sensor_cache.listeners.append(sensor_history.record)
+        background_tasks.append(asyncio.create_task(rollup_loop()))
+        sensor_cache.start()
+    if SUMMARY_ENABLED:
+        background_tasks.append(asyncio.create_task(summary_loop()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await ha_client.stop()
+    sensor_cache.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await registry.shutdown()
+    close_db()
 
 app.add_middleware(
     CORSMiddleware,
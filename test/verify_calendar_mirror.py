@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.services.calendar_mirror import CalendarMirror
+from app.tools.gcal_core import format_events
+
+"""
+Testar kalenderspegeln (app/services/calendar_mirror.py) mot ett låtsas-API
+med samma gränssnitt som googleapiclient (events().list(...).execute()),
+inklusive sidor, syncToken, borttagna händelser och 410 Gone.
+Kör: python test/verify_calendar_mirror.py
+"""
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Resp", (), {"status": status})()
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeCalendar:
+    """Händelser med versionsnummer; en syncToken är versionen vid senaste listning."""
+
+    PAGE_SIZE = 3
+
+    def __init__(self):
+        self.version = 0
+        self.store = {}  # id -> (version, händelse)
+        self.calls = []
+        self.expired_before = 0
+
+    def put(self, event):
+        self.version += 1
+        self.store[event["id"]] = (self.version, event)
+
+    def delete(self, event_id):
+        self.version += 1
+        _, event = self.store[event_id]
+        self.store[event_id] = (self.version, dict(event, status="cancelled"))
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.calls.append(params)
+        if "syncToken" in params:
+            since = int(params["syncToken"])
+            if since < self.expired_before:
+                raise FakeHttpError(410)
+            items = [e for v, e in self.store.values() if v > since]
+        else:
+            assert "timeMin" in params
+            items = [e for v, e in self.store.values() if e.get("status") != "cancelled"]
+        offset = int(params.get("pageToken", 0))
+        page = items[offset:offset + self.PAGE_SIZE]
+        result = {"items": page}
+        if offset + self.PAGE_SIZE < len(items):
+            result["nextPageToken"] = str(offset + self.PAGE_SIZE)
+        else:
+            result["nextSyncToken"] = str(self.version)
+        return FakeRequest(result)
+
+
+def event(event_id, summary, start, hours=1):
+    end = start + timedelta(hours=hours)
+    return {
+        "id": event_id, "status": "confirmed", "summary": summary,
+        "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()},
+    }
+
+
+def main():
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    api = FakeCalendar()
+    api.put(event("a", "Igår", now - timedelta(days=1)))
+    api.put(event("b", "Tandläkare", now + timedelta(hours=2)))
+    api.put(event("c", "Löpning", now + timedelta(hours=5)))
+    api.put(event("d", "Middag", now + timedelta(days=1)))
+    api.put(event("e", "Pågående möte", now - timedelta(minutes=30)))
+    api.put({"id": "f", "status": "confirmed", "summary": "Semester",
+             "start": {"date": (now + timedelta(days=3)).strftime("%Y-%m-%d")},
+             "end": {"date": (now + timedelta(days=5)).strftime("%Y-%m-%d")}})
+
+    mirror = CalendarMirror("primary", service_factory=lambda: api, interval=60, past_days=7)
+    assert mirror.sync() == 6 and len(api.calls) == 2, "full synk över två sidor väntades"
+    assert mirror.sync_token == str(api.version)
+    print(f"✅ Full synk: {len(mirror.events)} händelser, {len(api.calls)} sidor")
+
+    upcoming = [e["summary"] for e in mirror.upcoming(4)]
+    assert upcoming == ["Pågående möte", "Tandläkare", "Löpning", "Middag"], upcoming
+    print(f"✅ Kommande: {upcoming}")
+
+    # Inkrementellt: en ändrad, en ny, en borttagen
+    api.put(event("c", "Löpning (flyttad)", now + timedelta(hours=6)))
+    api.put(event("g", "Nytt möte", now + timedelta(hours=1)))
+    api.delete("b")
+    calls = len(api.calls)
+    assert mirror.sync() == 3
+    assert "syncToken" in api.calls[calls]
+    names = [e["summary"] for e in mirror.upcoming(4)]
+    assert names == ["Pågående möte", "Nytt möte", "Löpning (flyttad)", "Middag"], names
+    print(f"✅ Inkrementell synk (3 ändringar): {names}")
+
+    # Läsning ur spegeln: inga API-anrop
+    calls = len(api.calls)
+    start = time.perf_counter()
+    text = format_events(mirror.upcoming(5))
+    elapsed = (time.perf_counter() - start) * 1e6
+    assert len(api.calls) == calls
+    print(f"✅ Svar ur spegeln på {elapsed:.0f} µs: {text}")
+
+    # Utgången token -> full synk
+    api.expired_before = api.version + 1
+    api.put(event("h", "Efter 410", now + timedelta(hours=3)))
+    mirror.sync()
+    assert "timeMin" in api.calls[-1] and "h" in mirror.events and "b" not in mirror.events
+    print("✅ 410 Gone ger ny full synk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import sys
+import time
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.services import failover
+from app.services.providers import Provider, PROVIDERS_BY_NAME
+
+"""
+Testar reservkedjan (app/services/failover.py) med låtsas-leverantörer som
+dröjer före första token, fallerar direkt eller avbryts mitt i svaret:
+hedging, tidsgräns till första token, circuit breakers och meddelandet när
+hela kedjan är öppen. Kör: python test/verify_failover.py
+"""
+
+
+class StubProvider(Provider):
+    """Låtsas-leverantör. Registreras i routern och nås som 'namn:modell'."""
+
+    def __init__(self, name, delay=0.0, fail=False, fail_after=None, text="Hej från "):
+        self.name = name
+        self.label = name
+        self.delay = delay
+        self.fail = fail
+        self.fail_after = fail_after
+        self.text = text + name
+        self.calls = []
+        self.cancelled = 0
+        PROVIDERS_BY_NAME[name] = self
+
+    async def _generate(self):
+        self.calls.append(time.monotonic())
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError(f"{self.name} är nere")
+            for i, word in enumerate(self.text.split()):
+                if self.fail_after is not None and i >= self.fail_after:
+                    raise ConnectionError("anslutningen bröts")
+                yield word + " "
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+
+    def stream(self, model_id, history, new_message, system_prompt=None, strict=False):
+        return self._generate()
+
+
+def configure(chain, hedge_ms=0, first_token=2.0, threshold=2, reset=0.5):
+    failover.cfg["FALLBACK_CHAIN"] = [f"{name}:m" for name in chain[1:]]
+    failover.cfg["HEDGE_AFTER_MS"] = hedge_ms
+    failover.cfg["PROVIDER_FIRST_TOKEN_TIMEOUT"] = {"default": first_token}
+    failover.cfg["PROVIDER_IDLE_TIMEOUT"] = 1.0
+    failover.cfg["CIRCUIT_FAILURE_THRESHOLD"] = threshold
+    failover.cfg["CIRCUIT_RESET_SECONDS"] = reset
+    failover._breakers.clear()
+    return f"{chain[0]}:m"
+
+
+async def collect(model_id):
+    started = time.monotonic()
+    text = "".join([chunk async for chunk in failover.stream_with_failover(model_id, [], "Hej")])
+    return text, time.monotonic() - started
+
+
+async def test_hedging():
+    slow = StubProvider("slow", delay=2.0)
+    fast = StubProvider("fast")
+    model_id = configure(["slow", "fast"], hedge_ms=200)
+
+    text, elapsed = await collect(model_id)
+    assert text.strip() == "Hej från fast", text
+    hedge_delay = fast.calls[0] - slow.calls[0]
+    assert 0.18 <= hedge_delay < 0.5, f"hedge startade efter {hedge_delay:.2f}s"
+    assert elapsed < 1.0, f"väntade på den långsamma leverantören ({elapsed:.2f}s)"
+    assert slow.cancelled == 1, "förloraren avbröts inte"
+    assert not failover.get_breaker("slow").failures, "en avbruten förlorare ska inte räknas som fel"
+    print(f"✅ Hedge efter {hedge_delay * 1000:.0f} ms, förloraren avbruten.")
+
+
+async def test_first_token_timeout():
+    stall = StubProvider("stall", delay=5.0)
+    backup = StubProvider("backup")
+    model_id = configure(["stall", "backup"], first_token=0.3)
+
+    text, elapsed = await collect(model_id)
+    assert text.strip() == "Hej från backup", text
+    assert 0.3 <= elapsed < 1.0, f"{elapsed:.2f}s"
+    assert stall.cancelled == 1
+    assert failover.get_breaker("stall").failures == 1
+    print(f"✅ Tidsgräns till första token: bytte leverantör efter {elapsed:.2f}s.")
+
+
+async def test_circuit_breaker():
+    broken = StubProvider("broken", fail=True)
+    spare = StubProvider("spare")
+    model_id = configure(["broken", "spare"], threshold=2, reset=0.5)
+
+    # Två fel i rad öppnar brytaren
+    for _ in range(2):
+        text, _ = await collect(model_id)
+        assert text.strip() == "Hej från spare", text
+    assert len(broken.calls) == 2
+    assert failover.get_provider_status()["broken"]["open"]
+
+    # Öppen: hoppas över utan anrop
+    await collect(model_id)
+    assert len(broken.calls) == 2, "öppen brytare släppte igenom ett anrop"
+
+    # Efter återställningstiden släpps ett provförsök igenom (halvöppen)
+    await asyncio.sleep(0.55)
+    await collect(model_id)
+    assert len(broken.calls) == 3, "inget provförsök efter återställningstiden"
+    # Provet misslyckades: öppen igen, nästa anrop hoppas över
+    await collect(model_id)
+    assert len(broken.calls) == 3
+
+    # Lyckat provförsök stänger brytaren
+    await asyncio.sleep(0.55)
+    broken.fail = False
+    text, _ = await collect(model_id)
+    assert text.strip() == "Hej från broken", text
+    assert not failover.get_provider_status()["broken"]["open"]
+    assert failover.get_breaker("broken").failures == 0
+    print("✅ Circuit breaker: öppnas efter N fel, ett provförsök efter återställningstiden, stängs vid lyckat prov.")
+
+
+async def test_mid_stream_failure():
+    flaky = StubProvider("flaky", fail_after=2, text="ett två tre ")
+    spare = StubProvider("spare2")
+    model_id = configure(["flaky", "spare2"], threshold=1)
+
+    text, _ = await collect(model_id)
+    # Svaret har börjat: ingen ny leverantör, men användaren får veta att det bröts
+    assert text.startswith("ett två "), text
+    assert "avbröts" in text and not spare.calls
+    assert failover.get_provider_status()["flaky"]["open"]
+    print("✅ Fel mitt i svaret: texten behålls, felet rapporteras och räknas i brytaren.")
+
+
+async def test_whole_chain_open():
+    down1 = StubProvider("down1", fail=True)
+    down2 = StubProvider("down2", fail=True)
+    model_id = configure(["down1", "down2"], threshold=1, reset=60)
+
+    text, _ = await collect(model_id)
+    assert text == failover.NO_PROVIDER_MESSAGE, text
+    # Båda brytarna är nu öppna: inget anrop görs alls
+    text, elapsed = await collect(model_id)
+    assert text == failover.NO_PROVIDER_MESSAGE, text
+    assert len(down1.calls) == 1 and len(down2.calls) == 1
+    assert elapsed < 0.1
+    print("✅ Hela kedjan öppen: NO_PROVIDER_MESSAGE utan anrop.")
+
+
+async def main():
+    await test_hedging()
+    await test_first_token_timeout()
+    await test_circuit_breaker()
+    await test_mid_stream_failure()
+    await test_whole_chain_open()
+    print("\nAlla tester OK.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
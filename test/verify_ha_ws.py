@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import sys
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import websockets
+from app.services.ha_client import HomeAssistantClient
+
+"""
+Testar WebSocket-spegeln (app/services/ha_client.py) mot en lokal låtsas-HA.
+Kör: python test/verify_ha_ws.py
+"""
+
+TOKEN = "test-token"
+STATES = {
+    "light.kontor_2": {"entity_id": "light.kontor_2", "state": "off", "attributes": {}},
+    "light.hall": {"entity_id": "light.hall", "state": "on", "attributes": {}},
+    # Svarar på anrop men byter aldrig tillstånd (t.ex. en enhet som är offline)
+    "light.trasig": {"entity_id": "light.trasig", "state": "on", "attributes": {}},
+    "switch.kaffe": {"entity_id": "switch.kaffe", "state": "on", "attributes": {}},
+    "sensor.ute_temperature_2": {
+        "entity_id": "sensor.ute_temperature_2", "state": "4.5",
+        "attributes": {"unit_of_measurement": "°C"}
+    },
+}
+service_calls = []
+
+
+async def fake_ha(ws):
+    """Minimal implementation av HA:s WebSocket-protokoll."""
+    await ws.send(json.dumps({"type": "auth_required"}))
+    auth = json.loads(await ws.recv())
+    if auth.get("access_token") != TOKEN:
+        await ws.send(json.dumps({"type": "auth_invalid", "message": "fel token"}))
+        return
+    await ws.send(json.dumps({"type": "auth_ok"}))
+
+    async for raw in ws:
+        msg = json.loads(raw)
+        if msg["type"] == "subscribe_events":
+            await ws.send(json.dumps({"id": msg["id"], "type": "result", "success": True, "result": None}))
+        elif msg["type"] == "get_states":
+            await ws.send(json.dumps({"id": msg["id"], "type": "result", "success": True, "result": list(STATES.values())}))
+        elif msg["type"] == "call_service":
+            service_calls.append(msg)
+            entity_ids = msg["target"].get("entity_id", [])
+            if isinstance(entity_ids, str):
+                entity_ids = [entity_ids]
+            missing = [e for e in entity_ids if e not in STATES]
+            if missing:
+                await ws.send(json.dumps({
+                    "id": msg["id"], "type": "result", "success": False,
+                    "error": {"code": "not_found", "message": f"{missing[0]} finns inte"}
+                }))
+                continue
+            # Svara och skicka sedan state_changed som HA gör
+            await ws.send(json.dumps({"id": msg["id"], "type": "result", "success": True, "result": {}}))
+            for entity_id in entity_ids:
+                if entity_id == "light.trasig":
+                    continue
+                new_state = dict(STATES[entity_id], state="on" if msg["service"] == "turn_on" else "off")
+                STATES[entity_id] = new_state
+                await ws.send(json.dumps({
+                    "type": "event",
+                    "event": {"event_type": "state_changed", "data": {"entity_id": entity_id, "new_state": new_state}}
+                }))
+
+
+async def main():
+    async with websockets.serve(fake_ha, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = HomeAssistantClient(f"http://127.0.0.1:{port}", TOKEN, reconnect_max=1, call_timeout=2)
+        client.start()
+
+        for _ in range(50):
+            if client.ready:
+                break
+            await asyncio.sleep(0.05)
+        assert client.ready, "spegeln blev aldrig klar"
+        assert client.get_state("sensor.ute_temperature_2")["state"] == "4.5"
+        print(f"✅ Spegel laddad: {len(client.states)} entiteter")
+
+        await client.call_service("light", "turn_on", "light.kontor_2")
+        await asyncio.sleep(0.05)
+        assert client.get_state("light.kontor_2")["state"] == "on"
+        print("✅ call_service över socketen, state_changed uppdaterade spegeln")
+
+        # Från en tråd, som när Gemini anropar verktygen
+        await asyncio.to_thread(client.call_service_threadsafe, "light", "turn_off", "light.kontor_2")
+        await asyncio.sleep(0.05)
+        assert client.get_state("light.kontor_2")["state"] == "off"
+        print("✅ Trådsäkert anrop från trådpoolen")
+
+        try:
+            await client.call_service("light", "turn_on", "light.finns_inte")
+            print("❌ Fel från HA kastades inte")
+        except Exception as e:
+            print(f"✅ Fel från HA kastas: {e}")
+
+        # Batchat anrop: ett anrop per domän, resultat per entitet
+        from app.tools import ha_core
+        ha_core.ha_client = client
+        before = len(service_calls)
+        results = await ha_core.control_devices_async(
+            "off", ["light.kontor_2", "light.hall", "light.trasig", "switch.kaffe", "light.okand"]
+        )
+        print(f"   Resultat: {results}")
+        assert len(service_calls) - before == 2, "ett anrop per domän väntades"
+        assert results["light.hall"] == "ok" and results["switch.kaffe"] == "ok"
+        assert results["light.trasig"] != "ok" and results["light.okand"].startswith("fel")
+        print("✅ Batchat anrop: ett per domän, resultat per entitet")
+
+        # Okänd åtgärd: fel per entitet och område, inget anrop till HA
+        before = len(service_calls)
+        results = await ha_core.control_devices_async("dim", [], ["kontor"])
+        assert results == {"area:kontor": "fel: okänd åtgärd 'dim'"}, results
+        assert "okänd åtgärd" in ha_core.format_results("dim", results)
+        assert len(service_calls) == before
+        print("✅ Okänd åtgärd rapporteras även för områden")
+
+        await client.stop()
+        print(f"Tjänsteanrop mottagna av låtsas-HA: {len(service_calls)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.core.intents import classify
+
+"""
+Märkt testdata och prestandamätning för avsiktsklassningen (app/core/intents.py).
+Kör: python test/verify_intents.py
+"""
+
+LABELLED = [
+    # Hälsa
+    ("Hur har jag sovit i natt?", {"health"}),
+    ("Vad var min vilopuls imorse?", {"health"}),
+    ("Hur stressad har jag varit idag?", {"health"}),
+    ("Hur mår jag egentligen?", {"health"}),
+    ("Vad säger Garmin om min body battery?", {"health"}),
+    ("Känner mig trött, hur var sömnen?", {"health"}),
+    ("Hur många steg har jag gått idag? Antal steg alltså", {"health"}),
+    ("Är jag utvilad nog för ett hårt pass?", {"health", "training"}),
+    ("Hur var min återhämtning efter helgen?", {"health"}),
+    # Träning
+    ("Hur gick löpningen igår?", {"training"}),
+    ("Visa mitt senaste pass på Strava", {"training"}),
+    ("Hur långt cyklade jag i söndags?", {"training"}),
+    ("Vilka aktiviteter har jag gjort denna vecka?", {"training"}),
+    ("Ge mig feedback på dagens intervaller", {"training"}),
+    ("Borde jag träna idag?", {"training"}),
+    ("Hur gick löprundan?", {"training"}),
+    # Trender
+    ("Hur har min vilopuls utvecklats senaste månaden?", {"health", "trends"}),
+    ("Visa trenden för sömnen", {"health", "trends"}),
+    ("Har jag tränat mer än vanligt jämfört med förra månaden?", {"training", "trends"}),
+    ("Hur ser formkurvan ut?", {"trends"}),
+    # Trendblocket innehåller själv träningsbelastningen
+    ("Är min träningsbelastning för hög?", {"trends"}),
+    # Väder
+    ("Hur blir vädret imorgon?", {"weather"}),
+    ("Kommer det regna i eftermiddag?", {"weather"}),
+    ("Behöver jag paraply?", {"weather"}),
+    ("Hur många grader är det ute?", {"weather"}),
+    ("Vad säger SMHI om helgen?", {"weather"}),
+    ("Blir det bra väder för en löptur ikväll?", {"weather", "training"}),
+    # Hemmet
+    ("Tänd lampan i vardagsrummet", {"home"}),
+    ("Släck alla lampor", {"home"}),
+    ("Starta dammsugaren", {"home"}),
+    ("Vad är luftfuktigheten inomhus?", {"home"}),
+    ("Är ytterdörren låst? Kolla dörren", {"home"}),
+    ("Sätt termostaten på 21", {"home"}),
+    # Kalender
+    ("Vad har jag för möten idag?", {"calendar"}),
+    ("Vad står i kalendern imorgon?", {"calendar"}),
+    ("Boka tandläkaren på fredag kl 10", {"calendar"}),
+    ("Är jag ledig på torsdag eftermiddag?", {"calendar"}),
+    ("Påminn mig om att ringa mamma", {"calendar"}),
+    ("Vad händer imorgon?", {"calendar"}),
+    # Ingen extra kontext (tidigare fel: "status", "pass", "kropp")
+    ("Vad är status på projektet?", set()),
+    ("Hej! Hur är läget?", set()),
+    ("Skriv en dikt om hösten", set()),
+    ("Kan du förklara hur en kompilator fungerar?", set()),
+    ("Vad är huvudstaden i Australien?", set()),
+    ("Översätt 'god morgon' till franska", set()),
+    ("Jag behöver förnya mitt pass till resan", set()),
+    ("Vilken statusrapport ska jag skicka?", set()),
+    ("Räkna ut 17 gånger 23", set()),
+    ("Sammanfatta vårt samtal", set()),
+]
+
+
+def evaluate():
+    tp = fp = fn = exact = 0
+    misses = []
+    for text, expected in LABELLED:
+        got = classify(text)
+        tp += len(got & expected)
+        fp += len(got - expected)
+        fn += len(expected - got)
+        if got == expected:
+            exact += 1
+        else:
+            misses.append((text, expected, got))
+
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    print(f"--- AVSIKTSKLASSNING ({len(LABELLED)} exempel) ---")
+    print(f"Exakt rätt: {exact}/{len(LABELLED)}  Precision: {precision:.2f}  Recall: {recall:.2f}")
+    for text, expected, got in misses:
+        print(f"   ❌ {text!r}: väntat {sorted(expected)}, fick {sorted(got)}")
+    return precision, recall
+
+
+def benchmark(rounds=200):
+    texts = [text for text, _ in LABELLED]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            classify(text)
+    per_call = (time.perf_counter() - start) / (rounds * len(texts))
+
+    # Värsta fallet: inget nyckelord, trigram-lagret körs
+    start = time.perf_counter()
+    for _ in range(rounds):
+        classify("Kan du förklara hur en kompilator fungerar?")
+    fallback = (time.perf_counter() - start) / rounds
+
+    print(f"Snitt per anrop: {per_call * 1e6:.1f} µs  (utan träff, med trigram: {fallback * 1e6:.1f} µs)")
+    return per_call
+
+
+if __name__ == "__main__":
+    precision, recall = evaluate()
+    per_call = benchmark()
+    ok = precision >= 0.9 and recall >= 0.9 and per_call < 0.001
+    print("✅ OK" if ok else "⚠️ Under målet (precision/recall 0.9, < 1 ms)")
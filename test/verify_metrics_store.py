@@ -0,0 +1,105 @@
+import datetime
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.core import database, metrics_store
+from app.core.metrics_store import rolling_mean, rolling_sum
+
+"""
+Testar tidsserien (app/core/metrics_store.py): glidande medel/summa med
+saknade dagar, samt att Garmin-synken inte hämtar tomma dagar igen.
+Kör: python test/verify_metrics_store.py
+"""
+
+
+class StubCoach:
+    """Låtsas-GarminCoach: data bara för udda dagar i månaden."""
+
+    def __init__(self):
+        self.client = object()
+        self.fetched = []
+
+    def get_daily_summary(self, day):
+        self.fetched.append(day)
+        # Som GarminCoach: None både utan inloggning och utan data
+        if self.client is None or int(day[-2:]) % 2 == 0:
+            return None
+        return {"datum": day, "steg": 8000, "vilopuls": 52, "stress_snitt": "Ingen data", "sömn_timmar": 7.5}
+
+
+def same(a, b):
+    return np.allclose(a, b, equal_nan=True)
+
+
+def test_rolling():
+    nan = np.nan
+    values = np.array([1.0, nan, 3.0, nan, nan, nan, 5.0])
+
+    # Korta fönster i början räknas på de dagar som finns
+    assert same(rolling_mean(values, 3), [1.0, 1.0, 2.0, 3.0, 3.0, nan, 5.0])
+    # Fönster större än serien
+    assert same(rolling_mean(values, 30), [1.0, 1.0, 2.0, 2.0, 2.0, 2.0, 3.0])
+    # Bara NaN, tom serie och listor som indata
+    assert same(rolling_mean(np.full(4, nan), 2), [nan] * 4)
+    assert rolling_mean(np.array([]), 7).shape == (0,)
+    assert same(rolling_mean([2, 4, 6], 2), [2.0, 3.0, 5.0])
+
+    # Summan räknar NaN som 0 och blir aldrig NaN
+    assert same(rolling_sum(values, 3), [1.0, 1.0, 4.0, 3.0, 3.0, 0.0, 5.0])
+    assert same(rolling_sum(np.full(3, nan), 7), [0.0, 0.0, 0.0])
+    assert rolling_sum([], 7).shape == (0,)
+    print("✅ rolling_mean/rolling_sum hanterar NaN-fönster, korta fönster och tom serie.")
+
+
+def test_garmin_sync():
+    tmp = tempfile.mkdtemp()
+    database.close_db()
+    database.DB_PATH = os.path.join(tmp, "daa_memory.db")
+    metrics_store.init_metrics()
+
+    days = 10
+    coach = StubCoach()
+    saved = metrics_store.sync_garmin(coach, days)
+    assert len(coach.fetched) == days
+    with_data = [d for d in coach.fetched if int(d[-2:]) % 2]
+    assert saved == len(with_data)
+
+    # Andra synken: bara idag och igår hämtas om, inte de tomma dagarna
+    coach.fetched.clear()
+    metrics_store.sync_garmin(coach, days)
+    today = datetime.date.today()
+    recent = [(today - datetime.timedelta(days=i)).isoformat() for i in (1, 0)]
+    assert coach.fetched == recent, f"hämtade igen: {coach.fetched}"
+    print("✅ Dagar utan data sparas som tomma rader och hämtas inte igen.")
+
+    # Tomma rader räknas inte som data i trenderna
+    trends = metrics_store.get_trends(days)
+    assert trends["dagar_med_data"] == len(with_data)
+    assert trends["vilopuls_7d"] == 52.0 and trends["stress_7d"] is None
+    print("✅ Trenderna ignorerar de tomma raderna.")
+
+    # Misslyckad inloggning ger None utan att dagarna markeras som tomma
+    with database.get_pool().transaction() as conn:
+        conn.execute("DELETE FROM garmin_daily")
+    coach.client = None
+    coach.fetched.clear()
+    assert metrics_store.sync_garmin(coach, days) == 0
+    assert len(coach.fetched) == 1, "fortsatte trots utloggad klient"
+    assert metrics_store.missing_garmin_days(days) == [
+        (today - datetime.timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)
+    ]
+    print("✅ Utloggad klient markerar inga dagar som tomma.")
+    database.close_db()
+
+
+if __name__ == "__main__":
+    test_rolling()
+    test_garmin_sync()
+    print("\nAlla tester OK.")
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import paho.mqtt.publish as publish
+from app.services.sensor_cache import SensorCache
+
+"""
+Testar MQTT-cachen (app/services/sensor_cache.py) mot en minimal lokal broker
+(MQTT 3.1.1, QoS 0, retained-meddelanden). Kör: python test/verify_mqtt_cache.py
+"""
+
+
+class MiniBroker:
+    """Räcker för paho: CONNECT, SUBSCRIBE, PUBLISH, PINGREQ, DISCONNECT."""
+
+    def __init__(self):
+        self.subscribers = {}  # writer -> [filter]
+        self.retained = {}
+
+    @staticmethod
+    def matches(pattern, topic):
+        p, t = pattern.split("/"), topic.split("/")
+        for i, part in enumerate(p):
+            if part == "#":
+                return True
+            if i >= len(t) or (part != "+" and part != t[i]):
+                return False
+        return len(p) == len(t)
+
+    @staticmethod
+    def packet(header, body):
+        length, encoded = len(body), bytearray()
+        while True:
+            byte = length % 128
+            length //= 128
+            encoded.append(byte | 0x80 if length else byte)
+            if not length:
+                return bytes([header]) + bytes(encoded) + body
+
+    def publish_packet(self, topic, payload, retain=False):
+        t = topic.encode()
+        return self.packet(0x30 | int(retain), len(t).to_bytes(2, "big") + t + payload)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length, shift = 0, 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                kind = header >> 4
+
+                if kind == 1:  # CONNECT
+                    writer.write(self.packet(0x20, b"\x00\x00"))
+                elif kind == 8:  # SUBSCRIBE
+                    pid, pos, filters = body[:2], 2, []
+                    while pos < len(body):
+                        n = int.from_bytes(body[pos:pos + 2], "big")
+                        filters.append(body[pos + 2:pos + 2 + n].decode())
+                        pos += 3 + n
+                    self.subscribers.setdefault(writer, []).extend(filters)
+                    writer.write(self.packet(0x90, pid + b"\x00" * len(filters)))
+                    for topic, payload in self.retained.items():
+                        if any(self.matches(f, topic) for f in filters):
+                            writer.write(self.publish_packet(topic, payload, retain=True))
+                elif kind == 3:  # PUBLISH (QoS 0)
+                    n = int.from_bytes(body[:2], "big")
+                    topic, payload = body[2:2 + n].decode(), body[2 + n:]
+                    if header & 0x01:
+                        self.retained[topic] = payload
+                    for sub, filters in self.subscribers.items():
+                        if any(self.matches(f, topic) for f in filters):
+                            sub.write(self.publish_packet(topic, payload))
+                elif kind == 12:  # PINGREQ
+                    writer.write(self.packet(0xD0, b""))
+                elif kind == 14:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subscribers.pop(writer, None)
+            writer.close()
+
+
+async def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def main():
+    broker = MiniBroker()
+    server = await asyncio.start_server(broker.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    def pub(topic, data, retain=False):
+        return asyncio.to_thread(publish.single, topic, json.dumps(data), hostname="127.0.0.1", port=port, retain=retain)
+
+    # Retained innan cachen startar
+    await pub("zigbee2mqtt/Balkong", {"temperature": 3.2, "humidity": 81, "linkquality": 120}, retain=True)
+
+    cache = SensorCache("127.0.0.1", port, "zigbee2mqtt")
+    cache.start()
+    assert await wait_for(lambda: cache.get("Balkong")[0] is not None), "retained-värdet kom aldrig"
+    print(f"✅ Retained-värde: {cache.get('Balkong')[0]}")
+
+    # Enhet som inte använder retain
+    await pub("zigbee2mqtt/Sovrum/Fönster", {"contact": False, "battery": 90})
+    await pub("zigbee2mqtt/bridge/state", {"state": "online"})
+    assert await wait_for(lambda: cache.get("Sovrum/Fönster")[0] is not None), "icke-retained värde saknas"
+    print(f"✅ Icke-retained värde: {cache.get('Sovrum/Fönster')[0]}")
+    assert "bridge/state" not in cache.names()
+
+    # Läsning ur minnet
+    start = time.perf_counter()
+    data, age = cache.get("Balkong")
+    print(f"✅ Läsning ur minnet: {(time.perf_counter() - start) * 1e6:.1f} µs, ålder {age:.2f}s")
+
+    cache.stop()
+    # Låt brokern se DISCONNECT innan den stängs
+    await asyncio.sleep(0.2)
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.core.prompts import get_system_prompt, STATIC_PROMPT
+from app.services import llm_handler
+
+"""
+Testar uppdelningen av system-prompten (app/core/prompts.py) i en statisk,
+cachebar del och en föränderlig del, samt hur llm_handler skickar delarna till
+OpenAI och Anthropic (låtsasklienter). Kör: python test/verify_prompt_cache.py
+"""
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+
+        async def gen():
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="Ok.", tool_calls=None))])
+        return gen()
+
+
+class FakeAnthropicStream:
+    def __init__(self):
+        self.text_stream = self._text()
+
+    async def _text(self):
+        yield "Ok."
+
+    async def get_final_message(self):
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text="Ok.")])
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeAnthropic:
+    def __init__(self):
+        self.requests = []
+        self.messages = self
+
+    def stream(self, **kwargs):
+        self.requests.append(kwargs)
+        return FakeAnthropicStream()
+
+
+async def main():
+    # --- Statisk del oförändrad mellan anrop ---
+    first = get_system_prompt()
+    time.sleep(1.1)
+    second = get_system_prompt().extend("[VÄDER (SMHI)]:\nSol.")
+    assert first != second and first.static == second.static == STATIC_PROMPT
+    assert "Tid:" not in STATIC_PROMPT and second.dynamic.endswith("Sol.")
+    assert str(second).startswith(STATIC_PROMPT)
+    print(f"✅ Statisk del identisk mellan anrop ({len(STATIC_PROMPT)} tecken), föränderlig del {len(second.dynamic)} tecken")
+
+    history = [{"role": "user", "content": "Hej"}, {"role": "assistant", "content": "Hej Anders."}]
+
+    # --- OpenAI: statisk prompt och historik först ---
+    openai = FakeOpenAI()
+    llm_handler.registry.openai = lambda *args, **kwargs: openai
+    answer = "".join([c async for c in llm_handler.stream_openai_compatible(
+        "nyckel", None, "gpt-4o", history, "Vädret?", system_prompt=second, strict=True
+    )])
+    messages = openai.requests[0]["messages"]
+    assert messages[0] == {"role": "system", "content": STATIC_PROMPT}
+    assert [m["content"] for m in messages[1:]] == ["Hej", "Hej Anders.", second.dynamic, "Vädret?"]
+    print(f"✅ OpenAI: {[m['role'] for m in messages]} (föränderlig del efter historiken), svar: {answer}")
+
+    # --- Anthropic: cache_control på den statiska delen ---
+    anthropic = FakeAnthropic()
+    llm_handler.registry.anthropic = lambda *args, **kwargs: anthropic
+    answer = "".join([c async for c in llm_handler.stream_anthropic(
+        "nyckel", "claude-sonnet-4-5", history, "Vädret?", system_prompt=second, strict=True
+    )])
+    system = anthropic.requests[0]["system"]
+    assert system[0]["text"] == STATIC_PROMPT and system[0]["cache_control"] == {"type": "ephemeral"}
+    assert system[1] == {"type": "text", "text": second.dynamic}
+    print(f"✅ Anthropic: cache_control på statisk del, föränderlig del i eget block, svar: {answer}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
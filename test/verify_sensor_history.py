@@ -0,0 +1,161 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.core import database
+from app.core import sensor_history as sh
+from app.core.sensor_history import RingBuffer, SensorHistory, downsample, get_history_stats
+
+"""
+Testar sensorhistoriken (app/core/sensor_history.py) mot en temporär databas:
+ringbuffertens omslag, hinkgränser för minuter och timmar, omräkning och
+rensning av sammanställningarna, minnesgränsen och min/max/snitt över både
+minnet och databasen. Kör: python test/verify_sensor_history.py
+"""
+
+
+def rollup(device, metric, resolution):
+    with database.get_pool().connection() as conn:
+        rows = conn.execute(
+            "SELECT bucket, n, min, max, avg FROM sensor_rollup "
+            "WHERE device = ? AND metric = ? AND resolution = ? ORDER BY bucket",
+            (device, metric, resolution)
+        ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def test_ring_buffer():
+    buf = RingBuffer(5)
+    for t in range(3):
+        buf.append(float(t), t * 10)
+    ts, values = buf.window()
+    assert ts.tolist() == [0, 1, 2] and values.tolist() == [0, 10, 20]
+
+    # Förbi kapaciteten: de äldsta skrivs över, ordningen behålls
+    for t in range(3, 8):
+        buf.append(float(t), t * 10)
+    assert buf.count == 5 and buf.pos == 3
+    ts, values = buf.window()
+    assert ts.tolist() == [3, 4, 5, 6, 7], ts
+    assert values.tolist() == [30, 40, 50, 60, 70]
+    assert buf.window(since=5)[0].tolist() == [5, 6, 7]
+    assert buf.window(since=4, until=6)[0].tolist() == [4, 5]
+    # Exakt ett varv till
+    for t in range(8, 13):
+        buf.append(float(t), t)
+    assert buf.pos == 3 and buf.window()[0].tolist() == [8, 9, 10, 11, 12]
+    print("✅ Ringbufferten slår om i tidsordning förbi kapaciteten.")
+
+
+def test_downsample_edges():
+    ts = np.array([0.0, 59.999, 60.0, 119.0, 120.0, 3599.0, 3600.0])
+    values = np.array([1, 3, 5, 7, 9, 11, 13], dtype=np.float32)
+
+    minutes = downsample(ts, values, 60)
+    assert [m[:2] for m in minutes] == [(0, 2), (60, 2), (120, 1), (3540, 1), (3600, 1)], minutes
+    assert minutes[0][2:] == (1.0, 3.0, 2.0)
+    assert minutes[1][2:] == (5.0, 7.0, 6.0)
+
+    hours = downsample(ts, values, 3600)
+    assert [h[:2] for h in hours] == [(0, 6), (3600, 1)], hours
+    assert hours[0][2:] == (1.0, 11.0, 6.0)
+    assert downsample(np.empty(0), np.empty(0), 60) == []
+    print("✅ Minut- och timhinkar delas exakt på hinkgränsen.")
+
+
+def test_memory_bound():
+    history = SensorHistory(capacity=4, max_series=10)
+    for i in range(50):
+        history.record(f"sensor_{i}", {"temperature": 20.0 + i, "linkquality": 90, "contact": True, "battery": "ok"}, i)
+        # sensor_0 uppdateras hela tiden och ska aldrig trängas undan
+        history.record("sensor_0", {"temperature": 21.0}, i)
+
+    series = history.series()
+    assert len(series) == 10, len(series)
+    assert ("sensor_0", "temperature") in series
+    assert all(metric == "temperature" for _, metric in series), "icke-mätvärden sparades"
+    assert series[-2:] == [("sensor_49", "temperature"), ("sensor_0", "temperature")]
+    nbytes = sum(b.ts.nbytes + b.values.nbytes for b in history._series.values())
+    assert nbytes == 10 * 4 * (8 + 4), nbytes
+    print(f"✅ Minnet är begränsat: {len(series)} serier, {nbytes} byte för 50 enheter.")
+
+
+def test_flush_and_stats():
+    now = time.time()
+    base = (int(now) // 3600) * 3600 - 2 * 3600
+    history = SensorHistory(capacity=16, max_series=8)
+    points = [
+        (base + 10, 1.0),
+        (base + 70, 3.0),
+        (base + 3590, 25.0),
+        (base + 3600, 7.0),
+        (base + 3660, 9.0),
+        (now - 30, -2.0),
+    ]
+    for ts, value in points:
+        history.record("vardagsrum", {"temperature": value}, ts)
+
+    # Första flush: bara hela minuter före base + 3660
+    assert history.flush(now=base + 3700) == 4
+    assert [r[:2] for r in rollup("vardagsrum", "temperature", 60)] == [
+        (base, 1), (base + 60, 1), (base + 3540, 1), (base + 3600, 1)
+    ]
+    assert rollup("vardagsrum", "temperature", 3600) == [
+        (base, 3, 1.0, 25.0, 29.0 / 3), (base + 3600, 1, 7.0, 7.0, 7.0)
+    ]
+
+    # Min i minnet, max i databasen
+    expected = {
+        "min": -2.0,
+        "min_at": int(now - 30) // 60 * 60,
+        "max": 25.0,
+        "max_at": base + 3540,
+        "avg": round(sum(v for _, v in points) / len(points), 1),
+        "samples": len(points),
+    }
+    stats = get_history_stats("vardagsrum", "temperature", hours=3, history=history)
+    assert stats == expected, stats
+
+    # Andra flush: timmen räknas om från minuterna (ersätts, läggs inte till)
+    assert history.flush(now=base + 3720) == 1
+    assert rollup("vardagsrum", "temperature", 3600)[1] == (base + 3600, 2, 7.0, 9.0, 8.0)
+    stats = get_history_stats("vardagsrum", "temperature", hours=3, history=history)
+    assert stats == expected, f"dubbelräknade minne + databas: {stats}"
+
+    # Långa perioder läser timrader; max_at blir timmens start
+    stats = get_history_stats("vardagsrum", "temperature", hours=72, history=history)
+    assert stats["samples"] == len(points) and stats["min"] == -2.0 and stats["avg"] == expected["avg"]
+    assert stats["max"] == 25.0 and stats["max_at"] == base
+    assert get_history_stats("okänd", "temperature", hours=3, history=history) is None
+    print("✅ min/max/snitt med min_at/max_at över både ringbuffert och sammanställning.")
+
+    # Rensning: minutrader äldre än ett dygn, timrader kvar
+    sh.cfg["SENSOR_MINUTE_RETENTION_DAYS"] = 1
+    sh.cfg["SENSOR_HOUR_RETENTION_DAYS"] = 30
+    history.prune(now=base + 2 * 86400)
+    assert rollup("vardagsrum", "temperature", 60) == []
+    assert len(rollup("vardagsrum", "temperature", 3600)) == 2
+    history.prune(now=base + 31 * 86400)
+    assert rollup("vardagsrum", "temperature", 3600) == []
+    print("✅ Minut- och timrader rensas efter sina gränser.")
+
+
+if __name__ == "__main__":
+    tmp = tempfile.mkdtemp()
+    database.close_db()
+    database.DB_PATH = os.path.join(tmp, "daa_memory.db")
+    sh.init_sensor_history()
+
+    test_ring_buffer()
+    test_downsample_edges()
+    test_memory_bound()
+    test_flush_and_stats()
+    database.close_db()
+    print("\nAlla tester OK.")
@@ -0,0 +1,171 @@
+import calendar
+import os
+import sys
+import tempfile
+import time
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.core import database, metrics_store
+from app.services import snapshots
+from app.tools.strava_core import StravaTool, StravaRateLimited
+
+"""
+Testar den inkrementella Strava-synken (app/tools/strava_core.py +
+app/core/metrics_store.sync_strava) mot en låtsas-Session som svarar sida för
+sida, sedan med 429 och rate limit-headers, och till sist med 500.
+Kör: python test/verify_strava_sync.py
+"""
+
+NOW = int(time.time())
+
+
+def activity(i):
+    start = NOW - (10 - i) * 86400
+    return {
+        "id": 1000 + i,
+        "type": "Run",
+        "start_date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
+        "start_date_local": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start)),
+        "distance": 5000.0 + i,
+        "moving_time": 1800,
+        "suffer_score": 20 + i,
+    }
+
+
+def epoch(act):
+    return calendar.timegm(time.strptime(act["start_date"], "%Y-%m-%dT%H:%M:%SZ"))
+
+
+class StubResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+class StubSession:
+    """Som Stravas /athlete/activities med 'after': stigande starttid, sidindelat."""
+
+    def __init__(self, activities):
+        self.activities = activities
+        self.requests = []
+        self.fail_on = set()
+        self.usage = "10,100"
+        self.down = False
+
+    def post(self, url, data=None, timeout=None):
+        return StubResponse(200, {"access_token": "token", "expires_at": NOW + 3600})
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.requests.append(dict(params))
+        headers = {"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": self.usage}
+        if len(self.requests) in self.fail_on:
+            return StubResponse(429, {"message": "Rate Limit Exceeded"}, headers)
+        if self.down:
+            return StubResponse(500, {"message": "Internal Server Error"}, headers)
+        after, size, page = params["after"], params["per_page"], params["page"]
+        newer = [a for a in self.activities if epoch(a) > after]
+        return StubResponse(200, newer[(page - 1) * size:page * size], headers)
+
+
+def stored_ids():
+    with database.get_pool().connection() as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM strava_activities ORDER BY start_epoch")]
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    database.close_db()
+    database.DB_PATH = os.path.join(tmp, "daa_memory.db")
+    metrics_store.init_metrics()
+
+    activities = [activity(i) for i in range(5)]
+    tool = StravaTool()
+    tool.refresh_token = "test"
+    tool.session = session = StubSession(activities)
+    # Små sidor så att fem aktiviteter kräver flera sidor
+    per_page = 2
+    original_pages = tool.iter_activity_pages
+    tool.iter_activity_pages = lambda after: original_pages(after, per_page=per_page)
+
+    # 1. Första synken: sida 1 sparas, sida 2 får 429
+    session.fail_on = {2}
+    saved = metrics_store.sync_strava(tool, days=30)
+    assert saved == 2, saved
+    assert stored_ids() == [1000, 1001]
+    assert abs(session.requests[0]["after"] - (NOW - 30 * 86400)) < 5, "första synken ska gå 'days' dagar bakåt"
+    assert tool.retry_at > time.time(), "429 satte ingen paus"
+    print("✅ 429 avbryter synken efter sparad sida och sätter retry_at.")
+
+    # 2. Under pausen görs inga anrop alls
+    before = len(session.requests)
+    assert metrics_store.sync_strava(tool, days=30) == 0
+    assert len(session.requests) == before, "anropade Strava under pausen"
+    try:
+        tool._get("/athlete/activities")
+        raise AssertionError("StravaRateLimited kastades inte")
+    except StravaRateLimited as e:
+        assert e.retry_at == tool.retry_at
+    print("✅ Under pausen kastas StravaRateLimited utan nätverksanrop.")
+
+    # 3. Efter pausen fortsätter synken från latest_strava_epoch()
+    tool.retry_at = 0
+    latest = metrics_store.latest_strava_epoch()
+    saved = metrics_store.sync_strava(tool, days=30)
+    assert latest == epoch(activities[1])
+    assert session.requests[before]["after"] == latest, "fortsatte inte från senast sparade"
+    assert saved == 3, saved
+    assert stored_ids() == [a["id"] for a in activities], "sidor förlorades eller dubblerades"
+    print("✅ Synken fortsätter från latest_strava_epoch() utan att förlora sidor.")
+
+    # 4. Inget nytt: en sida, inga sparade
+    assert metrics_store.sync_strava(tool, days=30) == 0
+    assert session.requests[-1]["after"] == metrics_store.latest_strava_epoch()
+
+    # 5. Headers nära gränsen ger paus även vid 200
+    tool.retry_at = 0
+    session.usage = "97,100"
+    tool._get("/athlete/activities", {"after": NOW, "per_page": 2, "page": 1})
+    assert tool.retry_at == tool._next_window(), "15-minutersgränsen gav ingen paus"
+    tool.retry_at = 0
+    session.usage = "10,996"
+    tool._get("/athlete/activities", {"after": NOW, "per_page": 2, "page": 1})
+    assert tool.retry_at % 86400 == 0 and tool.retry_at > time.time(), "dagsgränsen ska pausa till midnatt UTC"
+    print("✅ X-RateLimit-Usage nära gränsen backar av till nästa fönster/dygn.")
+
+    # 6. Strava nere (500): synken kastar, men passen läses ändå ur tabellen
+    tool.retry_at = 0
+    session.usage = "10,100"
+    session.down = True
+    failed = False
+    try:
+        metrics_store.sync_strava(tool, days=30)
+    except Exception:
+        failed = True
+    assert failed, "HTTP 500 gav inget fel"
+    snapshots._strava_tool = tool
+    recent = snapshots.get_recent_strava(limit=3)
+    assert [r["distans_km"] for r in recent] == [5.0, 5.0, 5.0] and len(recent) == 3
+    assert recent[0]["ansträngning"] == 24, recent
+    snapshots.STRAVA_ENABLED = True
+    trends = snapshots._sync_metrics()
+    assert trends["pass_28d"] == len(activities), trends
+    print("✅ Strava nere: senaste passen och trenderna räknas ur lokalt sparad data.")
+
+    database.close_db()
+    print("\nAlla tester OK.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.core import database, summarizer
+from app.core.context import build_context
+
+"""
+Testar den rullande sammanfattningen (app/core/summarizer.py) mot en temporär
+databas och en låtsas-LLM i stället för Ollama.
+Kör: python test/verify_summarizer.py
+"""
+
+CHUNK = 5
+KEEP = 4
+
+transcripts = []
+
+
+async def stub_llm(transcript):
+    transcripts.append(transcript)
+    return f"Sammanfattning {len(transcripts)}"
+
+
+def add_messages(count, start):
+    for i in range(start, start + count):
+        database.save_message("test", "user" if i % 2 else "assistant", f"meddelande {i}")
+
+
+async def main():
+    tmp = tempfile.mkdtemp()
+    database.close_db()
+    database.DB_PATH = os.path.join(tmp, "daa_memory.db")
+    database.init_db()
+    summarizer.cfg["SUMMARY_CHUNK_SIZE"] = CHUNK
+    summarizer.cfg["SUMMARY_KEEP_RECENT"] = KEEP
+
+    # 1. För få rader: svansen får inte röras
+    add_messages(CHUNK + KEEP - 1, 1)
+    created = await summarizer.summarize_pending(stub_llm)
+    assert created == 0 and not transcripts, "sammanfattade trots att svansen inte räckte"
+    print("✅ Inget sammanfattas när bara svansen finns.")
+
+    # 2. CHUNK + KEEP + 2 rader: ett block, resten räcker inte till ett till
+    total = CHUNK + KEEP + 2
+    add_messages(3, CHUNK + KEEP)
+    created = await summarizer.summarize_pending(stub_llm)
+    assert created == 1, f"väntade 1 sammanfattning, fick {created}"
+    rows = database.get_messages_after(0)
+    assert len(rows) == total
+    summaries = database.get_summaries()
+    assert [(s["start_id"], s["end_id"]) for s in summaries] == [(rows[0]["id"], rows[CHUNK - 1]["id"])]
+    assert transcripts[0].count("\n") == CHUNK - 1, "blocket ska vara SUMMARY_CHUNK_SIZE rader"
+    print("✅ Block om SUMMARY_CHUNK_SIZE rader, svansen lämnas.")
+
+    # 3. Andra körningen utan nya rader gör ingenting
+    assert await summarizer.summarize_pending(stub_llm) == 0
+    assert len(transcripts) == 1
+
+    # 4. Nya rader: bara det som ligger efter MAX(end_id) sammanfattas
+    add_messages(CHUNK, total + 1)
+    total += CHUNK
+    created = await summarizer.summarize_pending(stub_llm)
+    assert created == 1
+    rows = database.get_messages_after(0)
+    summaries = database.get_summaries()
+    assert summaries[1]["start_id"] == summaries[0]["end_id"] + 1, "andra körningen började om"
+    assert summaries[1]["end_id"] == rows[2 * CHUNK - 1]["id"]
+    assert f"meddelande {CHUNK}\n" not in transcripts[1] and f"meddelande {CHUNK + 1}" in transcripts[1]
+    print("✅ Andra körningen fortsätter efter MAX(end_id).")
+
+    # 5. De KEEP senaste raderna är aldrig sammanfattade
+    checkpoint = database.get_summary_checkpoint()
+    assert checkpoint == summaries[-1]["end_id"]
+    unsummarised = [r for r in rows if r["id"] > checkpoint]
+    assert len(unsummarised) >= KEEP
+    assert all(r["id"] > checkpoint for r in rows[-KEEP:])
+    print(f"✅ De {KEEP} senaste raderna är orörda ({len(unsummarised)} kvar efter checkpoint).")
+
+    # 6. Promptens sammanfattning och checkpoint, och att build_context respekterar den
+    text, context_checkpoint = summarizer.get_summary_context("gpt-4o")
+    assert context_checkpoint == checkpoint
+    assert "Sammanfattning 1" in text and "Sammanfattning 2" in text
+    history = database.get_history(limit=100)
+    selected = build_context(history, "gpt-4o", after_id=context_checkpoint)
+    assert [m["id"] for m in selected] == [r["id"] for r in unsummarised], "build_context skickade sammanfattade rader"
+    print("✅ get_summary_context ger checkpointen som build_context(after_id=...) använder.")
+
+    database.close_db()
+    print("\nAlla tester OK.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
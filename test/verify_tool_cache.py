@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import time
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from app.tools.cache import cached, invalidates, get_cache_stats
+
+"""
+Testar verktygscachen (app/tools/cache.py): tidsgräns, LRU, delade samtidiga
+anrop (single-flight) och rensning från åtgärder. Kör: python test/verify_tool_cache.py
+"""
+
+executions = []
+
+
+@cached(ttl=0.3, entity="entity_id", maxsize=3)
+def read_state(entity_id: str):
+    executions.append(entity_id)
+    time.sleep(0.1)
+    return f"{entity_id}: on"
+
+
+@invalidates("entity_id")
+def switch(entity_id: str, action: str):
+    return f"{entity_id} {action}"
+
+
+@invalidates("entity_ids", tools=("read_state",))
+def switch_many(entity_ids: list, action: str):
+    return action
+
+
+def main():
+    cache = read_state.cache
+
+    # --- Träff och tidsgräns ---
+    read_state("light.a")
+    read_state(entity_id="light.a")
+    assert executions == ["light.a"] and cache.stats["hits"] == 1
+    time.sleep(0.35)
+    read_state("light.a")
+    assert executions == ["light.a", "light.a"]
+    print("✅ Träff inom TTL (även med nyckelordsargument), ny körning efter TTL")
+
+    # --- Single-flight: tio samtidiga identiska anrop, en körning ---
+    executions.clear()
+    threads = [threading.Thread(target=read_state, args=("light.b",)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert executions == ["light.b"], executions
+    print(f"✅ Single-flight: 10 samtidiga anrop, 1 körning ({cache.stats['shared']} delade)")
+
+    # --- LRU ---
+    for entity in ("light.c", "light.d", "light.e"):
+        read_state(entity)
+    assert cache.stats["evictions"] >= 1 and len(cache._entries) == 3
+    print(f"✅ LRU: max 3 poster, {cache.stats['evictions']} utkastade")
+
+    # --- Rensning från åtgärder ---
+    executions.clear()
+    switch("light.e", "off")
+    read_state("light.d")
+    read_state("light.e")
+    assert executions == ["light.e"], executions
+    switch_many(["light.x"], "off")
+    read_state("light.d")
+    assert executions == ["light.e", "light.d"], executions
+    print("✅ @invalidates rensar samma entitet; tools= rensar hela verktyget")
+
+    print(f"   Statistik: {get_cache_stats()['read_state']}")
+
+
+if __name__ == "__main__":
+    main()
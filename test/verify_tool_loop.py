@@ -0,0 +1,158 @@
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from config.settings import get_config
+from app.services import llm_handler
+from app.services.tool_runner import ToolRegistry, tools as real_tools
+from app.tools.cache import cached, invalidates
+
+"""
+Testar verktygsloopen (app/services/tool_runner.py + llm_handler) med låtsas-
+verktyg och en låtsas-OpenAI-klient som strömmar verktygsanrop i bitar.
+Kör: python test/verify_tool_loop.py
+"""
+
+calls = []
+
+
+@cached()
+def get_weather(location: str = None):
+    """Väder."""
+    calls.append(("get_weather", location))
+    time.sleep(0.3)
+    return f"Sol i {location or 'hemma'}"
+
+
+# Låtsas-HA: control_light ändrar, get_ha_state läser
+states = {}
+
+
+@cached(entity="entity_id")
+def get_ha_state(entity_id: str):
+    """Status."""
+    calls.append(("get_ha_state", entity_id))
+    state = states.get(entity_id, "21 grader")
+    time.sleep(0.3)
+    return f"{entity_id}: {state}"
+
+
+@invalidates("entity_id")
+def control_light(entity_id: str, action: str):
+    """Ljus."""
+    calls.append(("control_light", entity_id))
+    states[entity_id] = action
+    return f"Ljuset är nu {action}."
+
+
+def get_sensor_data(friendly_name: str):
+    """Hänger sig."""
+    time.sleep(1.0)
+    return "för sent"
+
+
+def chunk(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def tool_delta(index, call_id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class FakeCompletions:
+    """Första svaret: tre verktygsanrop (argumenten i bitar). Andra: text."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if len(self.requests) == 1:
+            chunks = [
+                chunk(tool_calls=[tool_delta(0, "c1", "get_weather", '{"loca'), tool_delta(1, "c2", "get_ha_state", "")]),
+                chunk(tool_calls=[tool_delta(0, arguments='tion": "stugan"}'), tool_delta(1, arguments='{"entity_id": "sensor.ute"}')]),
+                chunk(tool_calls=[tool_delta(2, "c3", "control_light", '{"entity_id": "light.kontor_2", "action": "on"}')]),
+            ]
+        else:
+            chunks = [chunk("Det är sol "), chunk("och 21 grader.")]
+
+        async def gen():
+            for c in chunks:
+                yield c
+        return gen()
+
+
+async def main():
+    # --- Scheman för de riktiga verktygen ---
+    schema = next(s for s in real_tools.schemas if s["name"] == "control_devices")
+    params = schema["parameters"]
+    assert params["required"] == ["entity_ids", "action"]
+    assert params["properties"]["area_ids"] == {"type": "array", "items": {"type": "string"}}
+    print(f"✅ {len(real_tools.schemas)} scheman byggda en gång (OpenAI, Anthropic, Gemini)")
+
+    registry = ToolRegistry([get_weather, get_ha_state, control_light, get_sensor_data])
+    cfg = get_config()
+    cfg["TOOL_TIMEOUTS"]["get_sensor_data"] = 0.2
+
+    # --- Parallella läsningar, cache och tidsgräns ---
+    start = time.perf_counter()
+    results = await registry.run_calls([("get_weather", {}), ("get_ha_state", {"entity_id": "sensor.ute"})])
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.5, f"läsningarna kördes inte parallellt ({elapsed:.2f}s)"
+    print(f"✅ Två läsningar parallellt på {elapsed:.2f}s: {results}")
+
+    start = time.perf_counter()
+    await registry.run("get_weather", {})
+    assert time.perf_counter() - start < 0.05 and get_weather.cache.stats["hits"] == 1
+    print("✅ Upprepad läsning ur cachen")
+
+    await registry.run("control_light", {"entity_id": "sensor.ute", "action": "off"})
+    assert get_ha_state.cache.stats["invalidations"] == 1
+    print("✅ Åtgärd rensar cachad status för samma entitet")
+
+    # Åtgärden är en spärr: läsningen före ser gammal status, läsningen efter den nya
+    states["light.kontor_2"] = "off"
+    results = await registry.run_calls([
+        ("get_ha_state", {"entity_id": "light.kontor_2"}),
+        ("control_light", {"entity_id": "light.kontor_2", "action": "on"}),
+        ("get_ha_state", {"entity_id": "light.kontor_2"}),
+    ])
+    assert results == ["light.kontor_2: off", "Ljuset är nu on.", "light.kontor_2: on"], results
+    print(f"✅ Läsning efter åtgärd ser den nya statusen: {results}")
+
+    result = await registry.run("get_sensor_data", {"friendly_name": "Balkong"})
+    assert "svarade inte" in result and registry.stats["get_sensor_data"]["timeouts"] == 1
+    print(f"✅ Tidsgräns per verktyg: {result}")
+
+    # --- Hela loopen via OpenAI-adaptern ---
+    calls.clear()
+    get_weather.cache.invalidate()
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    llm_handler.registry.openai = lambda *args, **kwargs: client
+    llm_handler.tools = registry
+
+    start = time.perf_counter()
+    parts = [p async for p in llm_handler.stream_openai_compatible(
+        "nyckel", None, "gpt-4o", [], "Väder i stugan, temp ute och tänd kontoret", system_prompt="Test", strict=True
+    )]
+    elapsed = time.perf_counter() - start
+    answer = "".join(parts)
+    assert answer == "Det är sol och 21 grader.", answer
+    assert len(completions.requests) == 2 and "tools" in completions.requests[0]
+    follow_up = completions.requests[1]["messages"]
+    tool_messages = [m for m in follow_up if m["role"] == "tool"]
+    assert [m["tool_call_id"] for m in tool_messages] == ["c1", "c2", "c3"]
+    assert ("get_weather", "stugan") in calls and elapsed < 0.5
+    print(f"✅ Tre verktygsanrop i en runda ({elapsed:.2f}s), svar: {answer}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Fixa sökvägar
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import numpy as np
+from app.tools import weather_core
+from app.services.weather_service import LocationWeather, WeatherService, sun_times
+from app.tools.formatter import format_temp_for_speech
+
+"""
+Testar SMHI-cachen och den vektoriserade rapporten (app/tools/weather_core.py)
+samt vädertjänsten för flera platser (app/services/weather_service.py) mot en
+sparad prognos i SMHI:s format (test/fixtures/smhi_pmp3g.json).
+Inget nätverk behövs. Kör: python test/verify_weather_cache.py
+"""
+
+with open(os.path.join(current_dir, "fixtures", "smhi_pmp3g.json"), encoding="utf-8") as f:
+    FIXTURE = json.load(f)
+# Strax efter prognosens approvedTime
+FIXTURE_NOW = datetime(2024, 11, 18, 11, 30).timestamp()
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """Svarar som SMHI: 200 med ETag, 304 om klienten skickar samma ETag."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append((url, dict(headers or {})))
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return FakeResponse(304, headers={"Cache-Control": "max-age=600"})
+        return FakeResponse(200, FIXTURE, {"ETag": '"v1"', "Last-Modified": "Mon, 18 Nov 2024 10:05:00 GMT"})
+
+
+def reference_report(series, now):
+    """Den gamla loopen (en tidpunkt nära kl 12 per dag), för jämförelse."""
+    def find_p(p_list, name):
+        for p in p_list:
+            if p["name"] == name:
+                return p["values"][0]
+        return None
+
+    today = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+    daily = {}
+    for entry in series:
+        valid_time = datetime.strptime(entry["validTime"], "%Y-%m-%dT%H:%M:%SZ")
+        key = valid_time.strftime("%Y-%m-%d")
+        if key == today:
+            continue
+        if key not in daily or abs(valid_time.hour - 12) < abs(int(daily[key]["validTime"][11:13]) - 12):
+            daily[key] = entry
+    names = weather_core.DAY_NAMES
+    return ", ".join(
+        f"på {names[datetime.strptime(k, '%Y-%m-%d').weekday()]} blir det {format_temp_for_speech(find_p(daily[k]['parameters'], 't'))}"
+        for k in sorted(daily)[:5]
+    )
+
+
+def main():
+    # --- Tolkning ---
+    start = time.perf_counter()
+    forecast = weather_core.parse_forecast(FIXTURE)
+    parse_ms = (time.perf_counter() - start) * 1000
+    series = FIXTURE["timeSeries"]
+    assert len(forecast.times) == len(series)
+    assert float(forecast.temp[0]) == next(p["values"][0] for p in series[0]["parameters"] if p["name"] == "t")
+    print(f"✅ Tolkade {len(series)} tidpunkter på {parse_ms:.2f} ms")
+
+    # --- Rapport (jämförd med den gamla loopen) ---
+    now = FIXTURE_NOW
+    start = time.perf_counter()
+    report = weather_core.build_report(forecast, now=now)
+    build_us = (time.perf_counter() - start) * 1e6
+    assert reference_report(series, now) in report, report
+    print(f"✅ Rapport ({build_us:.0f} µs):\n{report}")
+
+    # --- Cache och villkorlig GET ---
+    session = FakeSession()
+    weather_core._session = session
+    weather_core._cache.clear()
+
+    first = weather_core.get_forecast(59.3293, 18.0686)
+    again = weather_core.get_forecast(59.3311, 18.0702)  # Närliggande punkt, samma cellnyckel
+    assert first is again and len(session.calls) == 1
+    print(f"✅ Cacheträff för närliggande koordinat ({session.calls[0][0].split('/lon/')[1]})")
+
+    # Tvinga fram en ny kontroll: SMHI svarar 304 och prognosen återanvänds
+    first.expires_at = 0
+    revalidated = weather_core.get_forecast(59.3293, 18.0686)
+    assert revalidated is first and len(session.calls) == 2
+    assert session.calls[1][1].get("If-None-Match") == '"v1"'
+    assert revalidated.expires_at > time.time() + 500
+    print("✅ 304 Not Modified förlänger cachen utan ny tolkning")
+
+    # --- Soltider (Stockholm, midsommar och vintersolstånd; Abisko vid polcirkeln) ---
+    dates = np.array(["2024-06-21", "2024-12-21"], dtype="datetime64[D]")
+    sun = sun_times(59.3293, 18.0686, dates)
+    utc = [time.strftime("%H:%M", time.gmtime(t)) for t in (*sun["sunrise"], *sun["sunset"])]
+    assert utc == ["01:30", "07:43", "20:08", "13:48"], utc
+    polar = sun_times(68.35, 18.83, dates)
+    assert np.isnan(polar["sunrise"]).all() and list(polar["daylight"]) == [24.0, 0.0]
+    print(f"✅ Soltider (UTC): upp {utc[:2]}, ner {utc[2:]}; midnattssol och polarnatt hanteras")
+
+    # --- Flera platser, förhämtning ---
+    service = WeatherService({"Hemma": (59.3293, 18.0686), "Stugan": (60.1234, 15.5678)}, interval=600)
+    asyncio.run(service.refresh())
+    calls = len(session.calls)
+    assert service.get() is not None and service.get("stugan") is not None
+    start = time.perf_counter()
+    text = service.report("stugan")
+    render_ms = (time.perf_counter() - start) * 1000
+    assert len(session.calls) == calls, "rapporten ska inte fråga SMHI"
+    print(f"✅ Förhämtade platser: {list(service.data)}; TTS ur minnet på {render_ms:.2f} ms")
+    print(f"   {text.splitlines()[-1]}")
+    assert service.report("månen").startswith("Okänd plats")
+
+    hourly = service.get().hourly(24, now=FIXTURE_NOW)
+    assert len(hourly["time"]) == 24 and None not in hourly["temp"]
+    assert set(service.get().as_dict()) >= {"hourly", "daily", "sun"}
+    print(f"✅ Timvärden: {hourly['temp'][:6]} ...")
+
+    # --- Tom prognos (ofullständigt svar från SMHI) ---
+    empty = LocationWeather("tom", 59.3293, 18.0686, weather_core.parse_forecast({"timeSeries": []}))
+    assert empty.hourly(24, now=FIXTURE_NOW)["time"] == [] and empty.hourly(24)["symbol"] == []
+    assert empty.daily() == {"date": [], "min": [], "max": []}
+    assert empty.as_dict()["hourly"]["temp"] == []
+    assert empty.render(now=FIXTURE_NOW).startswith("Ingen väderdata")
+    print("✅ Tom prognos ger tomma serier i stället för fel")
+
+
+if __name__ == "__main__":
+    main()